@@ -0,0 +1,250 @@
+"""
+页面操作基准
+
+本地 HTTP 服务提供 fixtures/ 下模拟 MetaMask 引导/解锁、推文点赞/转发/确认弹窗、用户关注的页面，
+无头 Chromium 中直接调用 MetaMask 和 HandlerBase 的方法，记录每个步骤的耗时，
+与 baselines/dom_flows.json 比较，超过阈值时返回 1。全程不访问外网。
+
+用法:
+    python benchmarks/dom_flows.py                  # 与基线比较
+    python benchmarks/dom_flows.py --update-baseline  # 生成/更新基线，需要提交
+    python benchmarks/dom_flows.py --case twitter_like --repeat 10
+
+推特页面使用 localhost.x.com 域名，通过 --host-resolver-rules 解析到本机，
+twitter_screen_name 等按域名判断推特页面的逻辑和线上一致。
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+FIXTURES = os.path.join(HERE, "fixtures")
+BASELINE = os.path.join(HERE, "baselines", "dom_flows.json")
+TWITTER_HOST = "localhost.x.com"
+
+# 不读写用户目录下的数据，等待时间从默认值开始
+os.environ["A9TOOLS_HOME"] = tempfile.mkdtemp(prefix="a9tools-bench-")
+os.environ["A9TOOLS_JOURNAL"] = "off"
+os.environ["A9TOOLS_REGISTRY"] = "off"
+sys.path.insert(0, os.path.join(os.path.dirname(HERE), "src"))
+
+from DrissionPage import ChromiumOptions, ChromiumPage  # noqa: E402
+
+from a9tools.base import HandlerBase  # noqa: E402
+from a9tools.metamask import MetaMask  # noqa: E402
+from a9tools.timeouts import AdaptiveTimeouts  # noqa: E402
+
+
+class FixtureHandler(SimpleHTTPRequestHandler):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, directory=FIXTURES, **kwargs)
+
+    def translate_path(self, path):
+        route = path.split("?", 1)[0]
+        if route.startswith("/metamask"):
+            name = "metamask.html"
+        elif "/status/" in route or route.startswith("/intent/"):
+            name = "tweet.html"
+        else:
+            name = "profile.html"
+        return os.path.join(FIXTURES, name)
+
+    def log_message(self, *args):
+        pass
+
+
+class BenchHandler(HandlerBase):
+    def start_url(self) -> str:
+        return "about:blank"
+
+
+def bench_handler() -> HandlerBase:
+    """
+    只使用页面操作方法，不需要钱包信息和浏览器数据目录
+    """
+    handler = BenchHandler.__new__(BenchHandler)
+    handler.timeouts = AdaptiveTimeouts()
+    handler.journal = None
+    return handler
+
+
+class Bench:
+    def __init__(self, page: ChromiumPage, port: int, delay: int) -> None:
+        self.page = page
+        self.delay = delay
+        self.metamask_url = f"http://127.0.0.1:{port}/metamask"
+        self.twitter_url = f"http://{TWITTER_HOST}:{port}"
+        self.handler = bench_handler()
+        self.wallet = MetaMask()
+
+    def open(self, url: str):
+        sep = "&" if "?" in url else "?"
+        tab = self.page.new_tab(f"{url}{sep}delay={self.delay}")
+        tab.wait.doc_loaded()
+        return tab
+
+    def timed(self, steps: dict, name: str, func, *args, **kwargs):
+        start = time.perf_counter()
+        func(*args, **kwargs)
+        steps[name] = time.perf_counter() - start
+
+    # 每个用例返回 步骤 -> 耗时(秒)
+
+    def metamask_onboarding(self) -> dict:
+        steps = {}
+        tab = self.open(self.metamask_url)
+        wallet = self.wallet
+        self.timed(steps, "init_wallet_extension", wallet.init_wallet_extension, tab)
+        self.timed(steps, "create_extension_pwd", wallet.create_extension_pwd, tab)
+        self.timed(steps, "into_home_page", wallet.into_home_page, tab)
+        tab.close()
+        return steps
+
+    def metamask_unlock(self) -> dict:
+        steps = {}
+        tab = self.open(f"{self.metamask_url}?screen=unlock")
+        # unlock_wallet 结束时会关闭标签
+        self.timed(steps, "unlock_wallet", self.wallet.unlock_wallet, tab)
+        return steps
+
+    def twitter_like(self) -> dict:
+        steps = {}
+        tab = self.open(f"{self.twitter_url}/bench/status/1")
+        self.timed(steps, "twitter_click_like", self.handler.twitter_click_like, tab)
+        tab.close()
+        return steps
+
+    def twitter_like_modal(self) -> dict:
+        steps = {}
+        tab = self.open(f"{self.twitter_url}/intent/like?tweet_id=1")
+        self.timed(steps, "twitter_click_like", self.handler.twitter_click_like, tab)
+        tab.close()
+        return steps
+
+    def twitter_retweet(self) -> dict:
+        steps = {}
+        tab = self.open(f"{self.twitter_url}/bench/status/1")
+        self.timed(steps, "twitter_retweet", self.handler.twitter_retweet, tab)
+        tab.close()
+        return steps
+
+    def twitter_follow(self) -> dict:
+        steps = {}
+        tab = self.open(f"{self.twitter_url}/bench_user")
+        follow = self.handler.twitter_follow_user
+        self.timed(steps, "twitter_follow_user", follow, tab)
+        # 只计时失败分支时基准没有意义
+        testid = tab.ele("#follow").attr("data-testid")
+        if "unfollow" not in testid:
+            raise AssertionError(f"twitter_follow 未关注成功 {testid}")
+        tab.close()
+        return steps
+
+
+CASES = [
+    "metamask_onboarding",
+    "metamask_unlock",
+    "twitter_like",
+    "twitter_like_modal",
+    "twitter_retweet",
+    "twitter_follow",
+]
+
+
+def start_server() -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FixtureHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def run(cases, repeat: int, delay: int) -> dict:
+    server = start_server()
+    opt = ChromiumOptions().auto_port().headless(True)
+    opt.set_argument("--host-resolver-rules", f"MAP {TWITTER_HOST} 127.0.0.1")
+    opt.set_timeouts(base=5)
+    page = ChromiumPage(opt)
+    bench = Bench(page, server.server_address[1], delay)
+    samples = {}
+    try:
+        for case in cases:
+            for _ in range(repeat):
+                for step, seconds in getattr(bench, case)().items():
+                    samples.setdefault(f"{case}/{step}", []).append(seconds)
+    finally:
+        page.quit()
+        server.shutdown()
+    results = {}
+    for key, values in samples.items():
+        values.sort()
+        p95 = values[min(len(values) - 1, int(0.95 * len(values)))]
+        results[key] = {
+            "median_ms": round(statistics.median(values) * 1000, 1),
+            "p95_ms": round(p95 * 1000, 1),
+            "n": len(values),
+        }
+    return results
+
+
+def compare(results: dict, baseline: dict, threshold: float, slack_ms: float) -> bool:
+    """
+    中位数超过 基线 * (1 + threshold) + slack_ms 视为变慢
+    """
+    ok = True
+    for key, result in sorted(results.items()):
+        base = baseline.get(key)
+        if base is None:
+            # 基线中没有的步骤同样需要 --update-baseline 后提交
+            ok = False
+            print(
+                f"NEW  {key}: {result['median_ms']:.1f}ms"
+                f" p95 {result['p95_ms']:.1f}ms"
+            )
+            continue
+        limit = base["median_ms"] * (1 + threshold) + slack_ms
+        passed = result["median_ms"] <= limit
+        ok &= passed
+        print(
+            f"{'OK  ' if passed else 'FAIL'} {key}: {result['median_ms']:.1f}ms"
+            f" (基线 {base['median_ms']:.1f}ms，上限 {limit:.1f}ms)"
+            f" p95 {result['p95_ms']:.1f}ms"
+        )
+    return ok
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--case", action="append", choices=CASES)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument(
+        "--delay", type=int, default=50, help="页面切换的模拟渲染时间(毫秒)"
+    )
+    parser.add_argument("--threshold", type=float, default=0.25)
+    parser.add_argument("--slack-ms", type=float, default=100)
+    parser.add_argument("--update-baseline", action="store_true")
+    args = parser.parse_args()
+
+    baseline = {}
+    if os.path.exists(BASELINE):
+        with open(BASELINE, "r") as f:
+            baseline = json.load(f)
+    if not baseline and not args.update_baseline:
+        print(f"没有基线 {BASELINE}，先运行 --update-baseline 生成并提交")
+        return 1
+    results = run(args.case or CASES, args.repeat, args.delay)
+    if args.update_baseline:
+        baseline.update(results)
+        os.makedirs(os.path.dirname(BASELINE), exist_ok=True)
+        with open(BASELINE, "w") as f:
+            json.dump(baseline, f, indent=2, ensure_ascii=False, sort_keys=True)
+        print(f"写入基线 {BASELINE}")
+    return 0 if compare(results, baseline, args.threshold, args.slack_ms) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
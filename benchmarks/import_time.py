@@ -0,0 +1,67 @@
+"""
+导入耗时基准
+
+在独立进程中导入轻量模块，检查没有顺带加载浏览器相关依赖，且耗时在阈值内
+用法: python benchmarks/import_time.py [--threshold-ms 300]
+"""
+import argparse
+import json
+import subprocess
+import sys
+
+# 这些依赖只允许在 HandlerBase/MetaMask 被访问时才加载
+HEAVY_MODULES = ["DrissionPage", "requests", "fake_useragent", "a9tools.base"]
+
+CASES = {
+    "a9tools": "import a9tools",
+    "a9tools.model": "import a9tools.model",
+    "a9tools.utils.evm": "import a9tools.utils.evm",
+}
+
+SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+{stmt}
+elapsed = time.perf_counter() - start
+print(json.dumps({{"ms": elapsed * 1000, "loaded": [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+
+def measure(stmt: str, repeat: int) -> dict:
+    best = None
+    for _ in range(repeat):
+        out = subprocess.run(
+            [sys.executable, "-c", SCRIPT.format(stmt=stmt, heavy=HEAVY_MODULES)],
+            capture_output=True,
+            text=True,
+        )
+        if out.returncode != 0:
+            return {"error": out.stderr.strip().splitlines()[-1]}
+        result = json.loads(out.stdout.strip().splitlines()[-1])
+        if best is None or result["ms"] < best["ms"]:
+            best = result
+    return best
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--threshold-ms", type=float, default=300)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    failed = False
+    for name, stmt in CASES.items():
+        result = measure(stmt, args.repeat)
+        if "error" in result:
+            print(f"SKIP {name}: {result['error']}")
+            continue
+        ok = not result["loaded"] and result["ms"] <= args.threshold_ms
+        failed |= not ok
+        loaded = ",".join(result["loaded"]) or "-"
+        print(
+            f"{'OK  ' if ok else 'FAIL'} {name}: {result['ms']:.1f}ms heavy:{loaded}"
+        )
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
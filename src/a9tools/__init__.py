@@ -1,4 +1,30 @@
-from .base import HandlerBase
+"""
+公开的名字在第一次访问时才导入，只用到 a9tools.model、a9tools.utils.evm
+等模块的进程不需要加载 DrissionPage 等浏览器相关依赖
+"""
+from importlib import import_module
+from typing import TYPE_CHECKING
 
+if TYPE_CHECKING:
+    from .base import HandlerBase
+    from .metamask import MetaMask
 
-__all__ = ["HandlerBase"]
+_LAZY_NAMES = {
+    "HandlerBase": ".base",
+    "MetaMask": ".metamask",
+}
+
+__all__ = ["HandlerBase", "MetaMask"]
+
+
+def __getattr__(name: str):
+    module = _LAZY_NAMES.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(import_module(module, __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
@@ -0,0 +1,152 @@
+"""
+asyncio 接口
+
+HandlerBase 的方法都是阻塞的，AsyncHandler 把它们放到线程中执行，
+同一个账号互不依赖的任务各自使用一个标签页同时进行，总耗时取决于最慢的任务。
+
+    async def daily(handler):
+        ah = AsyncHandler(handler, max_concurrency=3)
+        await ah.gather(
+            ah.twitter_click_like("https://x.com/a/status/1"),
+            ah.twitter_follow_user("https://x.com/b"),
+            ah.dc_login_by_token(dc_token),
+        )
+
+    asyncio.run(daily(handler))
+
+注意:
+- 每个任务在自己打开的标签中执行，不要在并发任务中操作 handler.driver 主窗口
+- 并发任务中等待弹窗时使用 wait_new_tab 的 url/extension_id 过滤，避免拿到别的任务打开的标签
+- 取消只在 await 处生效，已经在线程中执行的方法会执行完当前这一步
+"""
+import asyncio
+import functools
+from typing import Any, Awaitable, Callable, List, Optional
+
+from .base import HandlerBase, twitter_screen_name, twitter_tweet_key
+from .log import logger
+from .metamask import MetaMask
+
+
+class AsyncHandler:
+    def __init__(self, handler: HandlerBase, max_concurrency: int = 3) -> None:
+        """
+        handler: 已经 init_driver 的 HandlerBase
+        max_concurrency: 同一个账号同时执行的任务数(同时打开的标签数)
+        """
+        self.handler = handler
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def run(self, func: Callable, *args, **kwargs) -> Any:
+        """
+        在线程中执行阻塞方法，受并发数限制
+        """
+        async with self._semaphore:
+            return await asyncio.to_thread(func, *args, **kwargs)
+
+    async def in_new_tab(
+        self,
+        url: Optional[str],
+        func: Callable,
+        *args,
+        close: bool = True,
+        **kwargs,
+    ) -> Any:
+        """
+        打开新标签执行 func(*args, tab=tab, **kwargs)，结束后关闭标签
+        """
+        async with self._semaphore:
+            tab = await asyncio.to_thread(self._open_tab, url)
+            try:
+                return await asyncio.to_thread(
+                    functools.partial(func, *args, tab=tab, **kwargs)
+                )
+            finally:
+                if close:
+                    await asyncio.to_thread(_close_tab, tab)
+
+    def _open_tab(self, url: Optional[str]):
+        tab = self.handler.driver.new_tab(url)
+        # 自己打开的标签不应被 wait_new_tab 取走
+        self.handler.tab_watcher.claim(tab.tab_id)
+        if self.handler.resource_blocker:
+            self.handler.resource_blocker.attach(tab)
+        return tab
+
+    async def wait_new_tab(self, timeout: float = 10, **filters):
+        """
+        等待新标签，参数同 HandlerBase.wait_new_tab，不占用并发数
+        默认不关闭其他标签，其他任务的标签还在使用
+        """
+        filters.setdefault("close_others", False)
+        return await asyncio.to_thread(
+            functools.partial(self.handler.wait_new_tab, timeout=timeout, **filters)
+        )
+
+    def _skip(self, step: str, key: str = "") -> bool:
+        # 任务记录中已完成的步骤不再打开标签
+        return self.handler._skip_step(step, key)
+
+    async def twitter_click_like(self, url: str, **kwargs):
+        if self._skip("twitter_like", twitter_tweet_key(url)):
+            return None
+        return await self.in_new_tab(url, self.handler.twitter_click_like, **kwargs)
+
+    async def twitter_follow_user(self, url: str, **kwargs):
+        if self._skip("twitter_follow", twitter_screen_name(url)):
+            return None
+        return await self.in_new_tab(url, self.handler.twitter_follow_user, **kwargs)
+
+    async def twitter_retweet(self, url: str, **kwargs):
+        if self._skip("twitter_retweet", twitter_tweet_key(url)):
+            return None
+        return await self.in_new_tab(url, self.handler.twitter_retweet, **kwargs)
+
+    async def twitter_post_tweet(self, text: str = ""):
+        return await self.in_new_tab(
+            "https://x.com/compose/post", self.handler.twitter_post_tweet, text=text
+        )
+
+    async def twitter_login_by_token(self, tw_token: str):
+        return await self.in_new_tab(
+            None, self.handler.twitter_login_by_token, tw_token
+        )
+
+    async def dc_login_by_token(self, dc_token: str):
+        return await self.in_new_tab(None, self.handler.dc_login_by_token, dc_token)
+
+    async def metamask(self, wallet: MetaMask, action: str, *args, **kwargs):
+        """
+        在 MetaMask 弹窗中执行操作，例如 await ah.metamask(wallet, "click_sign")
+        弹窗按插件 id 过滤。和 wait_new_tab 一样不占用并发数，
+        触发弹窗的任务在等待签名时仍占着并发数，占用会导致互相等待直到超时
+        """
+        popup = await self.wait_new_tab(extension_id=wallet._get_extension_id())
+        return await asyncio.to_thread(
+            functools.partial(getattr(wallet, action), *args, tab=popup, **kwargs)
+        )
+
+    async def gather(self, *aws: Awaitable) -> List[Any]:
+        """
+        同时执行多个任务，任意一个失败时取消其余任务并抛出该异常
+        (Python 3.10 没有 TaskGroup)
+        """
+        tasks = [asyncio.ensure_future(aw) for aw in aws]
+        try:
+            return await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+            results = await asyncio.gather(*tasks, return_exceptions=True)
+            for result in results:
+                if isinstance(result, Exception):
+                    logger.debug(f"task failed {result!r}")
+            raise
+
+
+def _close_tab(tab) -> None:
+    try:
+        tab.close()
+    except Exception as e:
+        logger.debug(f"close tab failed {e}")
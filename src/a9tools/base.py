@@ -1,37 +1,106 @@
 import json
 import os
+import re
+import time
+from contextlib import contextmanager, nullcontext
 from datetime import datetime, timedelta
 from abc import ABC, abstractmethod
-from typing import List, Optional
+from typing import Dict, List, Optional
 from urllib.parse import urlparse, parse_qs
 
-import requests
 from DrissionPage import ChromiumOptions, ChromiumPage
 from DrissionPage._pages.chromium_tab import ChromiumTab
-from fake_useragent import UserAgent
 
+from .blocking import BlockConfig, ResourceBlocker
+from .extension import (
+    ExtensionInfo,
+    TOOLS_EXTENSION_NAMES,
+    get_extension_registry,
+    metamask_extension_path,
+)
 from .fingerprint import random_fingerprint, FingerprintModel
+from .journal import TaskJournal, get_journal, handler_project
 from .log import logger
+from .metamask_state import seed_state
+from .metrics import metrics, timed
 from .model import InputInfoBase
+from .probe import DomState, probe, testid
+from .profiler import LaunchProfiler, profiling_enabled
+from .proxy import ProxyPool
+from .registry import get_registry
+from .tabs import TabWatcher
+from .template import clone_template
+from .timeouts import AdaptiveTimeouts, get_timeouts
+from .useragent import get_catalog
 from .utils import get_2fa_code
+from .warm import WarmBrowserPool
+
+# twitter 任务跳转后的确认弹窗按钮
+TW_CONFIRM = testid("confirmationSheetConfirm")
+
+
+def twitter_tweet_key(url: str) -> str:
+    """
+    推文 id，作为任务记录的 key，支持 /status/<id> 和 intent 链接的 tweet_id
+    """
+    parsed = urlparse(url)
+    tweet_id = parse_qs(parsed.query).get("tweet_id")
+    if tweet_id:
+        return tweet_id[0]
+    match = re.search(r"/status/(\d+)", parsed.path)
+    return match.group(1) if match else url
+
+
+def twitter_screen_name(url: str) -> str:
+    """
+    用户页面或 intent/follow 链接中的用户名，不是 twitter 页面返回空
+    """
+    parsed = urlparse(url)
+    host = (parsed.hostname or "").lower()
+    if not any(
+        host == domain or host.endswith(f".{domain}")
+        for domain in ("x.com", "twitter.com")
+    ):
+        return ""
+    names = parse_qs(parsed.query).get("screen_name")
+    if names:
+        return names[0]
+    return parsed.path.strip("/").split("/")[0]
 
 
 class HandlerBase(ABC):
+    # 启动时是否需要等待指纹插件的 A9Tools 页面打开
+    expect_tools_tab: bool = False
+    # 是否记录启动各阶段的耗时，也可以设置环境变量 A9TOOLS_PROFILE_LAUNCH=1
+    profile_launch: bool = False
+
     def __init__(
         self,
         wallet_info_path: str | InputInfoBase,
         auto_load_extension: bool = True,
         fingerprint_info_path: Optional[str] = None,
+        template_path: Optional[str] = None,
+        metamask_state_path: Optional[str] = None,
     ) -> None:
         """
         user_data_path: 用户数据目录
         auto_load_extension: 是否自动加载 extensions 目录下的所有插件
         fingerprint_info_path: fingerprint.json 的路径
+        template_path: 模板数据目录，新账号的数据目录从模板复制，见 a9tools.template
+        metamask_state_path: MetaMask 初始数据目录，with_metamask 启动时写入还没有钱包数据的账号，
+            见 a9tools.metamask_state
         """
-        if isinstance(wallet_info_path, InputInfoBase):
-            self.input_info = wallet_info_path
-        else:
-            self.input_info = self._load_input(wallet_info_path)
+        # 启动阶段耗时，见 a9tools.profiler
+        self.launch_profiler: Optional[LaunchProfiler] = (
+            LaunchProfiler() if self.profile_launch or profiling_enabled() else None
+        )
+        with self._launch_phase("load_input"):
+            if isinstance(wallet_info_path, InputInfoBase):
+                self.input_info = wallet_info_path
+            else:
+                self.input_info = self._load_input(wallet_info_path)
+        if self.launch_profiler:
+            self.launch_profiler.report.profile = self.input_info.user_data_path
         logger.info(f"浏览器数据目录 {self.input_info.user_data_path}")
         if not fingerprint_info_path:
             fingerprint_info_path = os.path.join(
@@ -39,11 +108,44 @@ class HandlerBase(ABC):
             )
 
         self.fingerprint_info_path = fingerprint_info_path
+        user_data_path = self.input_info.user_data_path
+        if template_path and not (
+            os.path.isdir(user_data_path) and os.listdir(user_data_path)
+        ):
+            logger.info(f"从模板创建数据目录 {template_path}")
+            with self._launch_phase("clone_template"):
+                clone_template(template_path, user_data_path)
+        # init_driver 未指定端口时使用，批量运行时由 fleet 分配
+        self.local_port = 9222
+        self.metamask_state_path = metamask_state_path
+        self.warm_pool: Optional[WarmBrowserPool] = None
+        # 最近一次启动浏览器到就绪的耗时(秒)
+        self.launch_ready_time: Optional[float] = None
+        self._tab_watcher: Optional[TabWatcher] = None
+        # 按历史耗时决定元素等待时间，见 a9tools.timeouts
+        self.timeouts: AdaptiveTimeouts = get_timeouts()
+        self.resource_blocker: Optional[ResourceBlocker] = None
+        self.proxy_pool: Optional[ProxyPool] = None
+        # 任务记录，见 a9tools.journal
+        self.journal: Optional[TaskJournal] = get_journal()
+        self.task_name = self.__class__.__name__
+        # 不同项目的同名 Handler 分开记录
+        self.task_project = handler_project(self.__class__)
 
-        self.opt = self.get_chrome_options(self.input_info.user_data_path)
+        with self._launch_phase("chrome_options"):
+            self.opt = self.get_chrome_options(self.input_info.user_data_path)
         self.opt.set_timeouts(base=5)
         if auto_load_extension:
-            self.__add_extension(self.opt)
+            with self._launch_phase("add_extension"):
+                self.__add_extension(self.opt)
+
+    def _launch_phase(self, name: str):
+        """
+        记录启动阶段耗时，未开启时不做任何事
+        """
+        if self.launch_profiler is None:
+            return nullcontext()
+        return self.launch_profiler.phase(name)
 
     def _load_input(self, input_info: str) -> InputInfoBase:
         with open(input_info, "r") as f:
@@ -61,12 +163,13 @@ class HandlerBase(ABC):
         opt.set_pref("settings.language.preferred_languages", "en-US")
         opt.set_pref("intl.accept_languages", "en-US,en")
         opt.set_argument("--hide-crash-restore-bubble")
-        ua = UserAgent(browsers=["chrome"], os=["macos", "windows"], min_version=120)
-        user_agent = ua.getRandom
+        with self._launch_phase("useragent"):
+            user_agent = get_catalog().random()
         logger.info(f"generate user agent {user_agent}")
         opt.set_user_agent(user_agent.get("useragent", ""))
         opt.set_user_data_path(self.input_info.user_data_path)
-        self.__init_fingerpring(user_agent)
+        with self._launch_phase("fingerprint"):
+            self.__init_fingerpring(user_agent)
         return opt
 
     @abstractmethod
@@ -84,7 +187,8 @@ class HandlerBase(ABC):
         ini_path = f"{user_data_path}/config.ini"
         if os.path.exists(ini_path):
             opt = ChromiumOptions(ini_path=f"{user_data_path}/config.ini")
-            self.__load_fingerpring()
+            with self._launch_phase("fingerprint"):
+                self.__load_fingerpring()
         else:
             opt = self.__init_user_data_info()
         return opt
@@ -131,14 +235,61 @@ class HandlerBase(ABC):
         p = os.path.join(self.input_info.user_data_path, "tools_extension_url")
         with open(p, "w") as f:
             f.write(tab.url)
+        registry = get_registry()
+        if registry:
+            registry.save_tools_extension_url(self.input_info.user_data_path, tab.url)
 
     def _get_tools_extension_url(self) -> str:
         """获取指纹插件的选项 url"""
+        registry = get_registry()
+        if registry:
+            url = registry.get_tools_extension_url(self.input_info.user_data_path)
+            if url:
+                return url
         p = os.path.join(self.input_info.user_data_path, "tools_extension_url")
+        if not os.path.exists(p):
+            tools = self._tools_extension()
+            if tools and "options" in tools.pages:
+                return tools.pages["options"]
         with open(p, "r") as f:
             return f.read()
 
+    @property
+    def extensions(self) -> Dict[str, ExtensionInfo]:
+        """
+        当前启动项中所有插件的离线信息，按插件目录名索引
+        """
+        return get_extension_registry().resolve_all(self.opt.extensions)
+
+    def extension_url(self, name: str, page: str = "home.html") -> str:
+        """
+        插件页面地址，不需要打开浏览器查找
+        例如 self.extension_url("metamask") -> chrome-extension://<id>/home.html
+        """
+        info = self.extensions.get(name)
+        if not info:
+            raise Exception(f"未加载插件 {name}")
+        return info.url(page)
+
+    def _tools_extension(self) -> Optional[ExtensionInfo]:
+        extensions = self.extensions
+        for name in TOOLS_EXTENSION_NAMES:
+            if name in extensions:
+                return extensions[name]
+        return None
+
     def _check_a9tool_urls(self):
+        tools = self._tools_extension()
+        if tools:
+            target_id = self.tab_watcher.find(extension_id=tools.id)
+            if not target_id:
+                return False
+            tab = self.driver.get_tab(target_id)
+            logger.info("打开指纹插件 tab")
+            self._save_tools_extension_url(tab)
+            self._import_fingerprint_info(tab)
+            self.driver.close_tabs(tab)
+            return True
         for tab in self.driver.get_tabs():
             logger.info(f"_check_a9tool_urls title:{tab.title}")
             if tab.title == "A9Tools":
@@ -172,18 +323,62 @@ class HandlerBase(ABC):
         self.fingerprint = FingerprintModel.model_validate(data)
         logger.info(self.fingerprint)
 
+    @timed()
     def init_driver(
-        self, headless=False, with_metamask: bool = False, port: int = 9222
+        self,
+        headless=False,
+        with_metamask: bool = False,
+        port: Optional[int] = None,
+        ready_timeout: float = 15,
     ) -> None:
         """
         获取 Chrome 的操作 driver
+        port: 调试端口，默认使用 self.local_port
+        ready_timeout: 等待浏览器就绪的最长时间
+        """
+        if port is None:
+            port = self.local_port
+        reattach = False
+        if self.warm_pool:
+            browser = self.warm_pool.acquire(self.input_info.user_data_path)
+            if browser:
+                port = browser.port
+                reattach = True
+            else:
+                port = self.warm_pool.allocate_port(preferred=port)
+        try:
+            self._launch(port, reattach, headless, with_metamask, ready_timeout)
+        except BaseException:
+            if self.warm_pool:
+                # 端口锁和目录占用记录的是当前进程，不释放要等进程退出才能回收
+                self.warm_pool.abandon(
+                    self.input_info.user_data_path, None if reattach else port
+                )
+            raise
+
+    def _launch(
+        self,
+        port: int,
+        reattach: bool,
+        headless: bool,
+        with_metamask: bool,
+        ready_timeout: float,
+    ) -> None:
+        """
+        启动或重新连接浏览器，直到打开 start_url
         """
         if headless:
             self.opt.headless(True)
         else:
             self.opt.headless(False)
+        if self.proxy_pool and not reattach:
+            with self._launch_phase("check_proxy"):
+                self._check_proxy()
         if with_metamask:
             self.add_metamask_extension()
+            if self.metamask_state_path and not reattach:
+                with self._launch_phase("seed_metamask_state"):
+                    self._seed_metamask_state()
         # if self.input_info.proxy_host:
         #     self.opt.set_argument(
         #         "--proxy-server",
@@ -192,11 +387,180 @@ class HandlerBase(ABC):
         self.opt.set_local_port(port)
         self.opt.set_user_data_path(self.input_info.user_data_path)
         self.add_chrome_start_args()
-        self.driver = ChromiumPage(self.opt)
-        self.driver.wait(5)
+        profiler = self.launch_profiler
+        start = time.perf_counter()
+        with self._launch_phase("spawn"):
+            self.driver = ChromiumPage(self.opt)
+            self._tab_watcher = TabWatcher.for_page(self.driver)
+        if profiler:
+            profiler.report.reattach = reattach
+            if not reattach:
+                profiler.mark_process(self.driver.process_id)
+        if not reattach:
+            if self.warm_pool:
+                self.warm_pool.register(
+                    self.input_info.user_data_path, port, self.driver.process_id or 0
+                )
+            with self._launch_phase("ready"):
+                self.wait_browser_ready(ready_timeout)
+        self.launch_ready_time = time.perf_counter() - start
+        logger.info(f"浏览器就绪 {self.launch_ready_time:.2f}s")
         # self._check_a9tool_urls()
-        self.driver.get(self.start_url())
+        with self._launch_phase("first_get"):
+            self.driver.get(self.start_url())
         self.driver.set.activate()
+        if profiler:
+            profiler.collect_navigation(self.driver)
+            profiler.log()
+
+    def _required_extension_count(self) -> int:
+        """
+        需要后台页面/service worker 的插件数量
+        """
+        count = 0
+        for path in self.opt.extensions:
+            try:
+                with open(os.path.join(path, "manifest.json"), "r") as f:
+                    manifest = json.load(f)
+            except (OSError, ValueError):
+                continue
+            if manifest.get("background"):
+                count += 1
+        return count
+
+    def wait_browser_ready(self, timeout: float = 15, interval: float = 0.1) -> bool:
+        """
+        等待浏览器就绪，代替固定等待
+        1. CDP 可以正常响应
+        2. 所有带后台脚本的插件都已注册 service worker/后台页面
+        3. expect_tools_tab 为 True 时，指纹插件的 A9Tools 页面已打开
+        超时不抛异常，只记录日志后继续
+        """
+        required = self._required_extension_count()
+        deadline = time.perf_counter() + timeout
+        extensions, tools_tab = set(), False
+        while time.perf_counter() < deadline:
+            try:
+                targets = self.driver.browser.run_cdp("Target.getTargets")
+            except Exception as e:
+                logger.debug(f"CDP 未就绪 {e}")
+                time.sleep(interval)
+                continue
+            if self.launch_profiler:
+                self.launch_profiler.mark("cdp_first_response")
+            extensions, tools_tab = set(), False
+            for target in targets.get("targetInfos", []):
+                url = target.get("url", "")
+                if target.get("type") in (
+                    "service_worker",
+                    "background_page",
+                ) and url.startswith("chrome-extension://"):
+                    extensions.add(urlparse(url).netloc)
+                if target.get("type") == "page" and target.get("title") == "A9Tools":
+                    tools_tab = True
+            if self.launch_profiler:
+                if len(extensions) >= required:
+                    self.launch_profiler.mark("extensions_ready")
+                if tools_tab:
+                    self.launch_profiler.mark("tools_tab")
+            if len(extensions) >= required and (
+                tools_tab or not self.expect_tools_tab
+            ):
+                return True
+            time.sleep(interval)
+        logger.warning(
+            f"等待浏览器就绪超时 {timeout}s，插件 {len(extensions)}/{required}，"
+            f"指纹插件页面 {tools_tab}"
+        )
+        return False
+
+    @contextmanager
+    def log_context(self, step: Optional[str] = None, **extra):
+        """
+        范围内的日志带上 profile/task/step 字段，
+        配合 a9tools.log.configure_logging 按账号写入单独的文件
+        """
+        extra.setdefault("profile", self.input_info.user_data_path)
+        extra.setdefault("task", self.__class__.__name__)
+        if step:
+            extra["step"] = step
+        with logger.contextualize(**extra):
+            yield
+
+    def use_warm_pool(self, pool: Optional[WarmBrowserPool] = None) -> None:
+        """
+        开启常驻浏览器模式
+        finish 时不关闭浏览器，下次 init_driver 直接连接已经打开的浏览器
+        """
+        self.warm_pool = pool or WarmBrowserPool()
+
+    def use_proxy_pool(self, pool: ProxyPool) -> None:
+        """
+        启动浏览器前先通过代理池确认代理可用，不可用时直接抛出异常
+        代理由指纹插件设置，不在这里更换，需要换代理时修改钱包信息和指纹后重新导入
+        """
+        self.proxy_pool = pool
+
+    def _check_proxy(self) -> None:
+        info = self.input_info
+        key = self.proxy_pool.add(
+            info.proxy_scheme,
+            info.proxy_host,
+            info.proxy_port,
+            info.proxy_username,
+            info.proxy_password,
+        ).key
+        if not self.proxy_pool.ensure(key):
+            error = self.proxy_pool.proxies[key].last_error
+            raise Exception(f"代理不可用 {key} {error}".rstrip())
+
+    def step_done(
+        self, step: str, key: str = "", max_age: Optional[float] = None
+    ) -> bool:
+        """
+        当前账号的步骤是否已经完成，可以在打开页面之前判断
+        """
+        if not self.journal:
+            return False
+        return self.journal.done(
+            self.input_info.user_data_path,
+            self.task_name,
+            step,
+            key,
+            max_age,
+            project=self.task_project,
+        )
+
+    def record_step(self, step: str, key: str = "", result=None) -> None:
+        """
+        记录当前账号的步骤已完成
+        """
+        if self.journal:
+            self.journal.record(
+                self.input_info.user_data_path,
+                self.task_name,
+                step,
+                key,
+                result,
+                project=self.task_project,
+            )
+
+    def _skip_step(self, step: str, key: str = "") -> bool:
+        if self.step_done(step, key):
+            logger.info(f"跳过已完成的步骤 {step} {key}")
+            return True
+        return False
+
+    def run_step(self, step: str, func, *args, key: str = "", **kwargs):
+        """
+        步骤未完成时执行 func 并记录完成，已完成直接跳过返回 None
+            self.run_step("claim", self.claim, key=round_id)
+        """
+        if self._skip_step(step, key):
+            return None
+        result = func(*args, **kwargs)
+        self.record_step(step, key)
+        return result
 
     def open_fingerprint_info_page(self):
         """
@@ -228,33 +592,83 @@ class HandlerBase(ABC):
         """"""
         # return random_fingerprint()
 
+    @timed()
     def finish(self) -> None:
-        self.opt.save(f"{self.input_info.user_data_path}/config.ini")
+        ini_path = f"{self.input_info.user_data_path}/config.ini"
+        self.opt.save(ini_path)
         with open(self.fingerprint_info_path, "w") as f:
             json.dump(self.fingerprint.model_dump(), f)
+        registry = get_registry()
+        if registry:
+            with open(ini_path, "r") as f:
+                config_ini = f.read()
+            registry.save_profile(
+                self.input_info.user_data_path,
+                self.fingerprint.model_dump(),
+                config_ini,
+            )
+        if self.warm_pool:
+            self.warm_pool.release(self.input_info.user_data_path)
+        self.timeouts.save()
+        if self.resource_blocker:
+            logger.info(self.resource_blocker.summary())
 
     def override_fingerprint(self, fingerprint: FingerprintModel) -> None:
         pass
 
-    def wait_new_tab(self, timeout=10, close_others=True) -> ChromiumTab:
+    @property
+    def tab_watcher(self) -> TabWatcher:
+        """
+        当前浏览器的标签页监听
+        """
+        if self._tab_watcher is None or self._tab_watcher.page is not self.driver:
+            self._tab_watcher = TabWatcher.for_page(self.driver)
+        return self._tab_watcher
+
+    @timed()
+    def wait_new_tab(
+        self,
+        timeout=10,
+        close_others=True,
+        url: Optional[str] = None,
+        title: Optional[str] = None,
+        extension_id: Optional[str] = None,
+    ) -> ChromiumTab:
         """
         等待新的 tab 打开
+        url/title/extension_id: 只等待符合条件的 tab，例如 MetaMask 的签名弹窗
         close_others: 由于钱包的弹窗窗口有时候点击签名以后，会自己关闭，导致框架
             这边未及时释放窗口，导致获取新标签失败，所以等待之前，可关闭除主窗口
-            之外的其他标签
+            之外的其他标签。同时运行多个标签的任务(a9tools.aio)时需要设为 False
+        通过 self.driver.new_tab 自己打开的标签不会被当作新标签返回
         """
         if close_others:
             self.driver.close_tabs(self.driver.tab_id, others=True)
-        self.driver.wait(0.2, 0.5)
-        while timeout > 0:
-            tab = self.driver.wait.new_tab(1)
-            if tab:
-                logger.error(tab)
-                tab = self.driver.get_tab(tab)
-                return tab
-            timeout -= 1
-        raise Exception(f"等待新的 tab 超时 {timeout}s")
+        target_id = self.tab_watcher.wait(
+            url=url, title=title, extension_id=extension_id, timeout=timeout
+        )
+        if not target_id:
+            raise Exception(f"等待新的 tab 超时 {timeout}s")
+        logger.info(f"new tab {target_id}")
+        tab = self.driver.get_tab(target_id)
+        if self.resource_blocker and not tab.url.startswith("chrome-extension://"):
+            self.resource_blocker.attach(tab)
+        return tab
 
+    def block_resources(self, config: Optional[BlockConfig] = None) -> ResourceBlocker:
+        """
+        屏蔽图片、视频、字体等流程用不到的请求，减少代理流量和页面加载时间
+        在 init_driver 之后调用，主窗口和之后 wait_new_tab 得到的标签都会生效，
+        其他方式打开的标签使用 self.resource_blocker.attach(tab)
+        """
+        if not self.resource_blocker:
+            self.resource_blocker = ResourceBlocker(
+                config, profile=self.input_info.user_data_path
+            )
+        self.resource_blocker.attach(self.driver)
+        return self.resource_blocker
+
+    @timed()
     def twitter_login_by_token_tw(
         self, tw_token: str, tab: ChromiumTab | ChromiumPage, after_login_close=True
     ):
@@ -270,17 +684,20 @@ class HandlerBase(ABC):
         tab.run_js(js)
         tab.refresh()
 
+    @timed()
     def twitter_login_by_token(self, tw_token: str, tab, after_login_close=False):
         """
         twitter token login
         只处理页面逻辑，不管 tab 逻辑
         tab 的打开与否具体项目中处理
+        登录状态以页面是否进入 /home 为准，已登录时不再写入 cookie
         """
         tab.get("https://x.com")
         tab.wait.load_start()
         url = urlparse(tab.url)
         if url.path == "/home":
             logger.success("already login")
+            self.record_step("twitter_login")
             return True
         utc_datetime = datetime.utcnow()
         exp_date = utc_datetime + timedelta(days=365)
@@ -290,94 +707,161 @@ class HandlerBase(ABC):
         """
         tab.run_js(js)
         tab.get("https://x.com")
+        if urlparse(tab.url).path == "/home":
+            self.record_step("twitter_login")
+        else:
+            logger.error("twitter 登录失败，检查 token")
+            metrics.fail()
         if after_login_close:
             tab.close()
         return True
 
-    def twitter_click_like(self, tab: ChromiumTab | ChromiumPage):
+    @timed()
+    def twitter_click_like(
+        self,
+        tab: ChromiumTab | ChromiumPage,
+        timeout: Optional[float] = None,
+        url: Optional[str] = None,
+    ):
         """
         点赞推文
+        弹窗、点赞、已点赞 三种状态一次查询，哪个先出现按哪个处理
+        timeout: 不指定时按历史耗时自适应
+        url: 推文地址，指定时先查任务记录，未完成才打开页面
         """
         logger.info("点赞推文")
-        if self._twitter_click_modal(tab):
+        key = twitter_tweet_key(url or tab.url)
+        if self._skip_step("twitter_like", key):
+            return
+        if url:
+            tab.get(url)
+        state = self.timeouts.wait_any(
+            tab, [TW_CONFIRM, testid("like"), testid("unlike")], "twitter_like", timeout
+        )
+        if self._twitter_click_modal(tab, state):
             logger.success("like success")
+            self.record_step("twitter_like", key)
             return
-        like_btn = tab.ele("@data-testid=like")
-        if like_btn:
+        if state.visible(testid("like")):
+            tab.ele("@data-testid=like", timeout=1).click()
             logger.success("like success")
-            like_btn.click()
+            self.record_step("twitter_like", key)
             return
-        unlike_btn = tab.ele("@data-testid=unlike")
-        if unlike_btn:
+        if state.present(testid("unlike")):
             logger.success("already like!")
+            self.record_step("twitter_like", key)
             return
         logger.error("未找到点赞按钮")
+        metrics.fail()
 
-    def _twitter_click_modal(self, tab: ChromiumTab | ChromiumPage) -> bool:
+    def _twitter_click_modal(
+        self, tab: ChromiumTab | ChromiumPage, state: Optional[DomState] = None
+    ) -> bool:
         """
         twitter 任务跳转以后确认弹窗
         点赞、关注任务大多数跳转以后支持弹窗模式的点击
+        state: 已经查询过的页面状态，不传时查询一次，不等待
         """
-        btn = tab.ele("@data-testid=confirmationSheetConfirm")
-        if not btn:
+        if state is None:
+            state = probe(tab, [TW_CONFIRM])
+        if not state.visible(TW_CONFIRM):
             return False
-        btn.click()
+        tab.ele("@data-testid=confirmationSheetConfirm", timeout=1).click()
         return True
 
-    def twitter_follow_user(self, tab: ChromiumTab | ChromiumPage):
+    @timed()
+    def twitter_follow_user(
+        self,
+        tab: ChromiumTab | ChromiumPage,
+        timeout: Optional[float] = None,
+        url: Optional[str] = None,
+    ):
         """
         关注用户
+        url: 用户页面或 intent/follow 地址，指定时先查任务记录，未完成才打开页面
         """
         logger.info("关注用户")
-        if self._twitter_click_modal(tab):
-            logger.success("modal is follow success")
-        url = urlparse(tab.url)
-        if "x.com" in url.netloc:
-            if "screen_name=" in tab.url:
-                screen_name = parse_qs(url.query).get("screen_name", [])
-            else:
-                screen_name = url.path.replace("/", "")
-        elif "twitter.com" in url.netloc:
-            screen_name = url.path.replace("/", "")
-        else:
-            screen_name = None
+        screen_name = twitter_screen_name(url or tab.url)
+        if screen_name and self._skip_step("twitter_follow", screen_name):
+            return
+        if url:
+            tab.get(url)
         if not screen_name:
+            if self._twitter_click_modal(tab):
+                logger.success("modal is follow success")
+                return
             logger.error("检查页面是否为用户页面")
+            metrics.fail()
+            return
+        follow_css = f'button[aria-label*="@{screen_name}"]'
+        state = self.timeouts.wait_any(
+            tab, [TW_CONFIRM, follow_css], "twitter_follow", timeout
+        )
+        if self._twitter_click_modal(tab, state):
+            logger.success("modal is follow success")
+            self.record_step("twitter_follow", screen_name)
             return
-        screen_name = screen_name[0]
-        follow_user_btn = tab.ele(f"tag:button@@aria-label:@{screen_name}")
-        if follow_user_btn:
+        if state.present(follow_css):
+            follow_user_btn = tab.ele(
+                f"tag:button@@aria-label:@{screen_name}", timeout=1
+            )
             test_dataid = str(follow_user_btn.attr("data-testid"))
             if "unfollow" in test_dataid:
                 logger.success(f"already follow {screen_name}")
+                self.record_step("twitter_follow", screen_name)
                 return
             follow_user_btn.click()
             logger.success(f"follow {screen_name} success")
+            self.record_step("twitter_follow", screen_name)
             return
         logger.error("未找到关注按钮")
+        metrics.fail()
 
-    def twitter_retweet(self, tab: ChromiumTab | ChromiumPage):
+    @timed()
+    def twitter_retweet(
+        self,
+        tab: ChromiumTab | ChromiumPage,
+        timeout: Optional[float] = None,
+        url: Optional[str] = None,
+    ):
         """
         转发推文
+        url: 推文地址，指定时先查任务记录，未完成才打开页面
         """
         logger.info("转发推文")
-        if self._twitter_click_modal(tab):
+        key = twitter_tweet_key(url or tab.url)
+        if self._skip_step("twitter_retweet", key):
+            return
+        if url:
+            tab.get(url)
+        retweet, unretweet = testid("retweet"), testid("unretweet")
+        state = self.timeouts.wait_any(
+            tab, [TW_CONFIRM, retweet, unretweet], "twitter_retweet", timeout
+        )
+        if self._twitter_click_modal(tab, state):
             logger.success("retweet success")
+            self.record_step("twitter_retweet", key)
             return
-        retweet_btn = tab.ele("@data-testid=retweet")
-        if retweet_btn:
-            retweet_btn.click()
-            retweet_confirm_btn = tab.ele("@data-testid=retweetConfirm")
-            if retweet_confirm_btn:
-                retweet_confirm_btn.click()
+        if state.visible(retweet):
+            tab.ele("@data-testid=retweet", timeout=1).click()
+            # 点击后弹出的菜单
+            confirm = testid("retweetConfirm")
+            state = self.timeouts.wait_any(
+                tab, [confirm], "twitter_retweet_confirm", timeout
+            )
+            if state.visible(confirm):
+                tab.ele("@data-testid=retweetConfirm", timeout=1).click()
                 logger.success("retweet success")
+                self.record_step("twitter_retweet", key)
                 return
-        unretweet_btn = tab.ele("@data-testid=unretweet")
-        if unretweet_btn:
+        if state.present(unretweet):
             logger.success("already retweet!")
+            self.record_step("twitter_retweet", key)
             return
         logger.error("未找到转发按钮")
+        metrics.fail()
 
+    @timed()
     def twitter_post_tweet(self, tab: ChromiumTab | ChromiumPage, text: str = ""):
         """
         发布推文
@@ -391,34 +875,42 @@ class HandlerBase(ABC):
             )
             if not tweet_textarea:
                 logger.error("未找到发布输入框")
+                metrics.fail()
                 return
             tweet_textarea.input(text)
         tweet_btn = tab.ele("@data-testid=tweetButton")
         if not tweet_btn:
             logger.error("未找到发布按钮")
+            metrics.fail()
             return
         tweet_btn.click()
         logger.success("发布推文成功")
 
+    @timed()
     def twitter_tweet_comment(self, tab):
         logger.info("评论推文")
         comment_btn = tab.ele("@data-testid=tweetButton")
         if not comment_btn:
             logger.error("未找到评论按钮")
+            metrics.fail()
             return
         comment_btn.click()
 
+    @timed()
     def twitter_auth(self, tab: ChromiumTab | ChromiumPage):
         logger.info("授权")
         auth_btn = tab.ele("tag:button@@data-testid=OAuth_Consent_Button")
         if auth_btn:
             auth_btn.click()
-        else:
-            auth_btn = tab.ele("tag:input@@id=allow")
-            if auth_btn:
-                auth_btn.click()
+            return
+        auth_btn = tab.ele("tag:input@@id=allow")
+        if auth_btn:
+            auth_btn.click()
+            return
         logger.error("未找到授权按钮")
+        metrics.fail()
 
+    @timed()
     def dc_login_by_token(
         self, dc_token: str, tab: ChromiumTab | ChromiumPage, after_login_close=True
     ):
@@ -430,6 +922,7 @@ class HandlerBase(ABC):
         tab.get("https://discord.com/login")
         if tab.wait.url_change("https://discord.com/channels/@me", timeout=10):
             logger.success("already login")
+            self.record_step("discord_login")
             return
         js = f"""
             window.t = "{dc_token}";
@@ -439,18 +932,42 @@ class HandlerBase(ABC):
             """
         tab.run_js(js)
         tab.get("https://discord.com/channels/@me")
+        if "/channels/" in tab.url:
+            self.record_step("discord_login")
+        else:
+            logger.error("discord 登录失败，检查 token")
+            metrics.fail()
 
     def add_metamask_extension(self):
-        abspath = os.path.join(os.path.pardir, "metamask")
-        metamask_path = os.path.abspath(abspath)
-        if not os.path.exists(metamask_path):
+        """
+        加载钱包插件，查找顺序见 a9tools.extension.metamask_extension_path，
+        与离线计算插件 id 使用同一个目录
+        """
+        metamask_path = metamask_extension_path()
+        if not metamask_path:
             raise Exception(
-                f"钱包插件目录未找到，请确认插件在以下位置\n{metamask_path}"
+                "钱包插件目录未找到，请确认插件在以下位置之一\n"
+                "环境变量 A9TOOLS_METAMASK_PATH\n"
+                f"{os.path.abspath(os.path.join(os.path.pardir, 'metamask'))}\n"
+                f"{os.path.abspath(os.path.join('extensions', 'metamask'))}"
             )
-        if "extensions/metamask" in self.opt.extensions:
-            self.opt.extensions.remove("extensions/metamask")
+        # 自动加载的 extensions/metamask 与实际使用的目录不同时去掉，避免加载两个钱包
+        for path in list(self.opt.extensions):
+            if os.path.basename(os.path.normpath(path)) == "metamask" and (
+                os.path.abspath(path) != metamask_path
+            ):
+                self.opt.extensions.remove(path)
         self.add_extension(metamask_path)
 
+    def _seed_metamask_state(self) -> None:
+        info = self.extensions.get("metamask")
+        seed_state(
+            self.metamask_state_path,
+            self.input_info.user_data_path,
+            extension_id=info.id if info else None,
+        )
+
+    @timed()
     def login_by_2fa(self):
         logger.debug("通过 2fa 进行登录 ")
         if not self.input_info.twitter:
@@ -484,7 +1001,7 @@ class HandlerBase(ABC):
         login_btn.click()
         p2fa_input = self.driver.ele("tag:input@@data-testid=ocfEnterTextTextInput")
         if p2fa_input:
-            code = get_2fa_code(self.input_info.twitter.p2fa)
+            code = get_2fa_code(self.input_info.twitter.p2fa, min_remaining=5)
             if not code:
                 raise Exception("未获取到 2fa 验证码")
             logger.success(f"输入 2fa 验证码 {code}")
@@ -505,8 +1022,7 @@ class HandlerBase(ABC):
                 logger.info(f"check_bot time_out:{time_out}")
                 time_out -= 1
                 driver.wait(1)
-                tab = self.driver.get_tab(title="Just a moment...")
-                if not tab:
+                if not self.tab_watcher.find(title="Just a moment..."):
                     logger.info("not found cf verify")
                     return
                 cf_iframe = driver.get_frame(1)
@@ -0,0 +1,156 @@
+"""
+按资源类型和地址屏蔽请求
+
+通过 CDP Fetch 拦截标签页的请求，只有命中屏蔽资源类型或屏蔽地址的请求才会暂停，
+不在白名单中的直接失败(BlockedByClient)，其余继续。
+节省的请求数和估算流量按账号统计，同时计入 a9tools.metrics。
+
+    handler.init_driver()
+    handler.block_resources()  # 默认屏蔽图片、视频、字体和常见统计脚本
+"""
+import fnmatch
+import threading
+from typing import Dict, List, Optional
+
+from pydantic import BaseModel, Field
+
+from .log import logger
+from .metrics import metrics
+
+# 被屏蔽请求的估算大小(字节)，只用于统计节省的流量
+ESTIMATED_BYTES = {
+    "Image": 40_000,
+    "Media": 500_000,
+    "Font": 60_000,
+    "Stylesheet": 30_000,
+    "Script": 80_000,
+    "XHR": 5_000,
+    "Fetch": 5_000,
+    "Ping": 500,
+    "Other": 10_000,
+}
+
+
+class BlockConfig(BaseModel):
+    resource_types: List[str] = Field(
+        default=["Image", "Media", "Font"], description="屏蔽的 CDP 资源类型"
+    )
+    block_urls: List[str] = Field(
+        default=[
+            "*google-analytics.com/*",
+            "*googletagmanager.com/*",
+            "*doubleclick.net/*",
+            "*hotjar.com/*",
+            "*sentry.io/*",
+            "*segment.io/*",
+            "*mixpanel.com/*",
+        ],
+        description="屏蔽的地址(通配符)",
+    )
+    allow_urls: List[str] = Field(
+        default=[
+            "chrome-extension://*",
+            "*challenges.cloudflare.com/*",
+            "*hcaptcha.com/*",
+            "*recaptcha*",
+        ],
+        description="白名单，优先于屏蔽规则，钱包插件和验证码需要的资源",
+    )
+
+
+class BlockStats(BaseModel):
+    requests: int = Field(default=0, description="屏蔽的请求数")
+    bytes_saved: int = Field(default=0, description="估算节省的流量")
+    allowed: int = Field(default=0, description="命中规则但在白名单中放行的请求数")
+    by_type: Dict[str, int] = Field(default_factory=dict)
+
+
+class ResourceBlocker:
+    def __init__(
+        self, config: Optional[BlockConfig] = None, profile: str = ""
+    ) -> None:
+        self.config = config or BlockConfig()
+        self.profile = profile
+        self.stats = BlockStats()
+        self._lock = threading.Lock()
+        self._tabs = set()
+
+    def _patterns(self) -> List[dict]:
+        patterns = [
+            {"urlPattern": "*", "resourceType": t, "requestStage": "Request"}
+            for t in self.config.resource_types
+        ]
+        patterns += [
+            {"urlPattern": p, "requestStage": "Request"}
+            for p in self.config.block_urls
+        ]
+        return patterns
+
+    def allowed(self, url: str) -> bool:
+        return any(fnmatch.fnmatch(url, p) for p in self.config.allow_urls)
+
+    def should_block(self, url: str, resource_type: str) -> bool:
+        if self.allowed(url):
+            return False
+        if resource_type in self.config.resource_types:
+            return True
+        return any(fnmatch.fnmatch(url, p) for p in self.config.block_urls)
+
+    def attach(self, tab) -> None:
+        """
+        在标签页上开启拦截，同一个标签只处理一次
+        """
+        if tab.tab_id in self._tabs:
+            return
+        tab._driver.set_callback(
+            "Fetch.requestPaused", lambda **kw: self._on_paused(tab, **kw)
+        )
+        tab.run_cdp("Fetch.enable", patterns=self._patterns())
+        self._tabs.add(tab.tab_id)
+
+    def detach(self, tab) -> None:
+        if tab.tab_id not in self._tabs:
+            return
+        self._tabs.discard(tab.tab_id)
+        try:
+            tab.run_cdp("Fetch.disable")
+        except Exception:
+            pass
+        tab._driver.set_callback("Fetch.requestPaused", None)
+
+    def _on_paused(self, tab, **kwargs) -> None:
+        request_id = kwargs["requestId"]
+        url = kwargs.get("request", {}).get("url", "")
+        resource_type = kwargs.get("resourceType", "Other")
+        try:
+            if self.should_block(url, resource_type):
+                tab.run_cdp(
+                    "Fetch.failRequest",
+                    requestId=request_id,
+                    errorReason="BlockedByClient",
+                )
+                self._count(resource_type)
+            else:
+                tab.run_cdp("Fetch.continueRequest", requestId=request_id)
+                with self._lock:
+                    self.stats.allowed += 1
+        except Exception as e:
+            # 标签已关闭或请求已取消
+            logger.debug(f"拦截请求处理失败 {url} {e}")
+
+    def _count(self, resource_type: str) -> None:
+        size = ESTIMATED_BYTES.get(resource_type, ESTIMATED_BYTES["Other"])
+        with self._lock:
+            self.stats.requests += 1
+            self.stats.bytes_saved += size
+            self.stats.by_type[resource_type] = (
+                self.stats.by_type.get(resource_type, 0) + 1
+            )
+        metrics.inc("blocked_requests", resource_type=resource_type)
+        metrics.inc("blocked_bytes_estimate", size, resource_type=resource_type)
+
+    def summary(self) -> str:
+        return (
+            f"屏蔽请求 {self.stats.requests} 个，"
+            f"约节省 {self.stats.bytes_saved / 1024 / 1024:.1f}MB {self.stats.by_type}"
+        )
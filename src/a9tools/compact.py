@@ -0,0 +1,192 @@
+"""
+浏览器数据目录压缩
+
+清理 HTTP 缓存、Code Cache、GPUCache、Service Worker 缓存、崩溃转储等可重新生成的数据，
+保留 Cookies、Local Storage、IndexedDB 和插件数据(MetaMask 钱包、指纹插件)，
+再对目录下的 SQLite 数据库执行 VACUUM。浏览器正在运行或被 fleet 占用的目录不会处理，
+压缩期间持有 fleet 的目录租约，fleet 不会同时启动该账号。
+
+用法:
+    python -m a9tools.compact run --root profiles/ --workers 8
+"""
+import os
+import shutil
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+
+from pydantic import BaseModel, Field
+from typer import Typer
+
+from .lease import ProfileLease, browser_running
+from .log import logger
+from .registry import get_registry
+from .template import CACHE_DIRS
+
+app = Typer()
+
+# Service Worker 目录下的缓存，Database 目录中的注册信息需要保留
+SERVICE_WORKER_CACHE_DIRS = {"CacheStorage", "ScriptCache"}
+
+# 插件代码目录，不往里面找缓存
+SKIP_DIRS = {"Extensions"}
+
+SQLITE_HEADER = b"SQLite format 3\x00"
+
+
+class CompactResult(BaseModel):
+    user_data_path: str = Field(...)
+    skipped: str = Field(default="", description="跳过原因")
+    before: int = Field(default=0, description="压缩前字节数")
+    after: int = Field(default=0, description="压缩后字节数")
+    vacuumed: int = Field(default=0, description="VACUUM 的数据库数量")
+
+    @property
+    def reclaimed(self) -> int:
+        return self.before - self.after
+
+
+def _dir_size(path: str) -> int:
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.lstat(os.path.join(root, name)).st_size
+            except OSError:
+                pass
+    return total
+
+
+def _purge_caches(user_data_path: str, dry_run: bool) -> int:
+    """清理缓存，返回清理的字节数"""
+    purged = 0
+    for root, dirs, files in os.walk(user_data_path):
+        parent = os.path.basename(root)
+        for name in list(dirs):
+            if name in SKIP_DIRS:
+                dirs.remove(name)
+                continue
+            if name in CACHE_DIRS or (
+                parent == "Service Worker" and name in SERVICE_WORKER_CACHE_DIRS
+            ):
+                dirs.remove(name)
+                path = os.path.join(root, name)
+                logger.debug(f"清理 {path}")
+                purged += _dir_size(path)
+                if not dry_run:
+                    shutil.rmtree(path, ignore_errors=True)
+        for name in files:
+            if name.endswith(".dmp"):
+                path = os.path.join(root, name)
+                purged += os.lstat(path).st_size
+                if not dry_run:
+                    os.remove(path)
+    return purged
+
+
+def _is_sqlite(path: str) -> bool:
+    try:
+        with open(path, "rb") as f:
+            return f.read(16) == SQLITE_HEADER
+    except OSError:
+        return False
+
+
+def _vacuum(user_data_path: str) -> int:
+    count = 0
+    for root, dirs, files in os.walk(user_data_path):
+        dirs[:] = [d for d in dirs if d not in SKIP_DIRS]
+        for name in files:
+            if name.endswith(("-journal", "-wal", "-shm")):
+                continue
+            path = os.path.join(root, name)
+            if not _is_sqlite(path):
+                continue
+            try:
+                conn = sqlite3.connect(path, timeout=1)
+                conn.execute("VACUUM")
+                conn.close()
+                count += 1
+            except sqlite3.Error as e:
+                logger.warning(f"VACUUM 失败 {path} {e}")
+    return count
+
+
+def compact_profile(user_data_path: str, dry_run: bool = False) -> CompactResult:
+    """
+    压缩单个浏览器数据目录
+    dry_run: 只统计，不删除
+    """
+    result = CompactResult(user_data_path=user_data_path)
+    if not os.path.isdir(user_data_path):
+        result.skipped = "not found"
+        return result
+    if browser_running(user_data_path):
+        result.skipped = "running"
+        return result
+    lease = ProfileLease(user_data_path)
+    try:
+        lease.acquire()
+    except Exception:
+        result.skipped = "leased"
+        return result
+    try:
+        result.before = _dir_size(user_data_path)
+        purged = _purge_caches(user_data_path, dry_run)
+        if dry_run:
+            result.after = result.before - purged
+            return result
+        result.vacuumed = _vacuum(user_data_path)
+        result.after = _dir_size(user_data_path)
+        return result
+    finally:
+        lease.release()
+
+
+def find_profiles(root: Optional[str] = None) -> List[str]:
+    """
+    需要压缩的目录，指定 root 时取其下的子目录，否则取账号索引中的所有目录
+    """
+    if root:
+        return [
+            os.path.join(root, name)
+            for name in sorted(os.listdir(root))
+            if os.path.isdir(os.path.join(root, name, "Default"))
+        ]
+    registry = get_registry()
+    return registry.all_profiles() if registry else []
+
+
+def compact_profiles(
+    paths: List[str], workers: int = 8, dry_run: bool = False
+) -> List[CompactResult]:
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(lambda p: compact_profile(p, dry_run), paths))
+    for r in results:
+        if r.skipped:
+            logger.warning(f"跳过 {r.user_data_path} {r.skipped}")
+        else:
+            logger.info(
+                f"{r.user_data_path} 释放 {r.reclaimed / 1024 / 1024:.1f}MB "
+                f"VACUUM {r.vacuumed}"
+            )
+    total = sum(r.reclaimed for r in results)
+    logger.success(
+        f"共 {len(paths)} 个目录，释放 {total / 1024 / 1024:.1f}MB，"
+        f"耗时 {time.perf_counter() - start:.1f}s"
+    )
+    return results
+
+
+@app.command("run")
+def run(root: Optional[str] = None, workers: int = 8, dry_run: bool = False):
+    """
+    压缩 root 下(默认账号索引中)所有浏览器数据目录
+    """
+    compact_profiles(find_profiles(root), workers=workers, dry_run=dry_run)
+
+
+if __name__ == "__main__":
+    app()
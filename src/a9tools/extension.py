@@ -0,0 +1,172 @@
+"""
+离线插件信息
+
+未打包的插件 id 由 manifest 中的 key 或插件目录的绝对路径计算得到，
+不需要启动浏览器再从标签页中读取。结果按 manifest 内容和路径缓存到 A9TOOLS_HOME/extensions.json。
+"""
+import base64
+import hashlib
+import json
+import os
+import sys
+import threading
+from functools import lru_cache
+from typing import Dict, List, Optional
+
+from pydantic import BaseModel, Field
+
+from .log import logger
+from .utils import get_a9tools_home
+
+# 项目中指纹插件可能的目录名
+TOOLS_EXTENSION_NAMES = ("tools", "tools-extension")
+
+
+class ExtensionInfo(BaseModel):
+    name: str = Field(..., description="插件目录名")
+    path: str = Field(..., description="插件目录绝对路径")
+    id: str = Field(..., description="插件 id")
+    version: str = Field(default="")
+    manifest_hash: str = Field(default="")
+    pages: Dict[str, str] = Field(
+        default_factory=dict, description="页面名称 -> url"
+    )
+
+    @property
+    def base_url(self) -> str:
+        return f"chrome-extension://{self.id}/"
+
+    def url(self, page: str = "home.html") -> str:
+        return f"{self.base_url}{page.lstrip('/')}"
+
+
+def _id_from_bytes(data: bytes) -> str:
+    """chrome 插件 id: sha256 前 16 字节，十六进制 0-f 映射到 a-p"""
+    digest = hashlib.sha256(data).hexdigest()[:32]
+    return "".join(chr(ord("a") + int(c, 16)) for c in digest)
+
+
+def extension_id(path: str, manifest: Optional[dict] = None) -> str:
+    """
+    计算未打包插件的 id
+    manifest 中有 key 时由公钥决定，否则由插件目录绝对路径决定
+    """
+    if manifest is None:
+        with open(os.path.join(path, "manifest.json"), "rb") as f:
+            manifest = json.load(f)
+    key = manifest.get("key")
+    if key:
+        return _id_from_bytes(base64.b64decode(key))
+    abspath = os.path.realpath(path)
+    if sys.platform == "win32":
+        # chrome 在 windows 上会把盘符转为大写，路径按 UTF-16 计算
+        if len(abspath) > 1 and abspath[1] == ":":
+            abspath = abspath[0].upper() + abspath[1:]
+        return _id_from_bytes(abspath.encode("utf-16-le"))
+    return _id_from_bytes(abspath.encode())
+
+
+def _pages(path: str, manifest: dict) -> Dict[str, str]:
+    pages = {}
+    options = manifest.get("options_ui", {}).get("page") or manifest.get(
+        "options_page"
+    )
+    if options:
+        pages["options"] = options
+    action = manifest.get("action") or manifest.get("browser_action") or {}
+    if action.get("default_popup"):
+        pages["popup"] = action["default_popup"]
+    for name, page in manifest.get("chrome_url_overrides", {}).items():
+        pages[name] = page
+    # MetaMask 的 home.html/notification.html 等没有写在 manifest 里
+    for name in os.listdir(path):
+        if name.endswith(".html"):
+            pages.setdefault(name[: -len(".html")], name)
+    return pages
+
+
+class ExtensionRegistry:
+    def __init__(self, cache_path: Optional[str] = None) -> None:
+        self.cache_path = cache_path or os.path.join(
+            get_a9tools_home(), "extensions.json"
+        )
+        self._lock = threading.Lock()
+        self._cache: Dict[str, dict] = {}
+        if os.path.exists(self.cache_path):
+            try:
+                with open(self.cache_path, "r") as f:
+                    self._cache = json.load(f)
+            except (OSError, ValueError):
+                self._cache = {}
+
+    def _save(self) -> None:
+        tmp = f"{self.cache_path}.{os.getpid()}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(self._cache, f)
+        os.replace(tmp, self.cache_path)
+
+    def resolve(self, path: str) -> ExtensionInfo:
+        """
+        获取插件信息，manifest 和路径都没变时直接读缓存
+        """
+        abspath = os.path.realpath(path)
+        with open(os.path.join(abspath, "manifest.json"), "rb") as f:
+            raw = f.read()
+        cache_key = hashlib.sha1(abspath.encode() + b"\0" + raw).hexdigest()
+        with self._lock:
+            cached = self._cache.get(cache_key)
+            if cached:
+                return ExtensionInfo.model_validate(cached)
+            manifest = json.loads(raw)
+            info = ExtensionInfo(
+                name=os.path.basename(abspath),
+                path=abspath,
+                id=extension_id(abspath, manifest),
+                version=str(manifest.get("version", "")),
+                manifest_hash=cache_key,
+            )
+            info.pages = {
+                k: info.url(v) for k, v in _pages(abspath, manifest).items()
+            }
+            self._cache[cache_key] = info.model_dump()
+            self._save()
+        logger.info(f"插件 {info.name} {info.version} id:{info.id}")
+        return info
+
+    def resolve_all(self, paths: List[str]) -> Dict[str, ExtensionInfo]:
+        """
+        批量获取，按插件目录名索引，无法读取的插件跳过
+        """
+        result = {}
+        for path in paths:
+            try:
+                info = self.resolve(path)
+            except (OSError, ValueError) as e:
+                logger.warning(f"读取插件信息失败 {path} {e}")
+                continue
+            result[info.name] = info
+        return result
+
+
+@lru_cache(maxsize=None)
+def get_extension_registry() -> ExtensionRegistry:
+    """
+    进程内共享的插件信息
+    """
+    return ExtensionRegistry()
+
+
+def metamask_extension_path() -> Optional[str]:
+    """
+    MetaMask 插件目录，与 HandlerBase.add_metamask_extension 的查找顺序一致
+    可以通过环境变量 A9TOOLS_METAMASK_PATH 指定
+    """
+    candidates = [
+        os.environ.get("A9TOOLS_METAMASK_PATH", ""),
+        os.path.abspath(os.path.join(os.path.pardir, "metamask")),
+        os.path.abspath(os.path.join("extensions", "metamask")),
+    ]
+    for path in candidates:
+        if path and os.path.exists(os.path.join(path, "manifest.json")):
+            return path
+    return None
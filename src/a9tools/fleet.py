@@ -0,0 +1,318 @@
+"""
+批量运行多个 HandlerBase 账号
+
+用法:
+    python -m a9tools.fleet run src.handler:Handler wallets/ --workers 8
+
+每个 worker 进程独占一个调试端口，每个账号运行期间独占 user_data_path，
+按 init_driver -> run -> finish 的顺序执行，结束后输出每分钟完成的账号数。
+"""
+import importlib
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import List, Optional, Type
+
+from pydantic import BaseModel, Field
+from typer import Typer
+
+from .lease import ProfileLease
+from .log import configure_logging, logger
+from .metrics import metrics
+from .profiler import (
+    ENV as PROFILE_LAUNCH_ENV,
+    LaunchReport,
+    format_summary,
+    summarize,
+)
+from .proxy import ProxyPool
+from .utils import port_in_use
+from .warm import WarmBrowserPool
+
+app = Typer()
+
+
+class FleetResult(BaseModel):
+    path: str = Field(..., description="钱包信息文件")
+    ok: bool = Field(default=False)
+    error: str = Field(default="")
+    port: int = Field(default=0, description="使用的调试端口")
+    elapsed: float = Field(default=0, description="耗时(秒)")
+    metrics: dict = Field(default_factory=dict, description="worker 的步骤耗时统计")
+    launch: Optional[LaunchReport] = Field(
+        default=None, description="启动阶段耗时，开启 profile_launch 时记录"
+    )
+
+
+class FleetReport(BaseModel):
+    results: List[FleetResult] = Field(default_factory=list)
+    elapsed: float = Field(default=0, description="总耗时(秒)")
+
+    @property
+    def succeeded(self) -> int:
+        return sum(1 for r in self.results if r.ok)
+
+    @property
+    def failed(self) -> int:
+        return len(self.results) - self.succeeded
+
+    @property
+    def profiles_per_minute(self) -> float:
+        if self.elapsed <= 0:
+            return 0.0
+        return self.succeeded / (self.elapsed / 60)
+
+
+def load_manifest(source: str) -> List[str]:
+    """
+    获取需要运行的钱包信息文件列表
+    source: 目录(目录下所有 .json 文件)、.json 清单(路径数组)或文本清单(每行一个路径)
+    清单中的相对路径以清单所在目录为准
+    """
+    if os.path.isdir(source):
+        return [
+            os.path.join(source, name)
+            for name in sorted(os.listdir(source))
+            if name.endswith(".json")
+        ]
+    base_dir = os.path.dirname(os.path.abspath(source))
+    with open(source, "r") as f:
+        if source.endswith(".json"):
+            paths = json.load(f)
+        else:
+            paths = [line.strip() for line in f]
+    return [
+        p if os.path.isabs(p) else os.path.join(base_dir, p)
+        for p in paths
+        if p and not p.startswith("#")
+    ]
+
+
+def resolve_handler(spec: str) -> Type:
+    """
+    根据 "模块:类名" 导入 Handler
+    """
+    if ":" not in spec:
+        raise Exception(f"handler 格式错误 {spec}，应为 module:ClassName")
+    module_name, class_name = spec.split(":", 1)
+    module = importlib.import_module(module_name)
+    return getattr(module, class_name)
+
+
+# worker 进程内的端口，在进程初始化时分配，整个进程生命周期不变
+_worker_port: Optional[int] = None
+
+
+def _init_worker(
+    slots,
+    base_port: int,
+    stride: int,
+    log_dir: Optional[str],
+    profile_launch: bool = False,
+) -> None:
+    global _worker_port
+    if profile_launch:
+        # 只在 worker 进程内开启，不影响调用 run_fleet 的进程
+        os.environ[PROFILE_LAUNCH_ENV] = "1"
+    if log_dir:
+        configure_logging(log_dir)
+    slot = slots.get()
+    port = base_port + slot
+    while port_in_use(port):
+        port += stride
+    _worker_port = port
+
+
+def _run_profile(
+    handler,
+    path: str,
+    headless: bool,
+    with_metamask: bool,
+    quit_browser: bool,
+    warm_pool: Optional[WarmBrowserPool],
+    proxy_pool: Optional[ProxyPool] = None,
+) -> FleetResult:
+    """在 worker 进程中运行单个账号"""
+    start = time.perf_counter()
+    result = FleetResult(path=path, port=_worker_port or 0)
+    handler_cls = resolve_handler(handler) if isinstance(handler, str) else handler
+    try:
+        ctrl = handler_cls(path)
+        with ProfileLease(ctrl.input_info.user_data_path), ctrl.log_context():
+            ctrl.local_port = result.port
+            if warm_pool:
+                ctrl.use_warm_pool(warm_pool)
+            if proxy_pool:
+                ctrl.use_proxy_pool(proxy_pool)
+            try:
+                ctrl.init_driver(headless=headless, with_metamask=with_metamask)
+                ctrl.run()
+            finally:
+                if ctrl.launch_profiler:
+                    result.launch = ctrl.launch_profiler.report
+                ctrl.finish()
+                driver = getattr(ctrl, "driver", None)
+                if quit_browser and driver and not warm_pool:
+                    driver.quit()
+        result.ok = True
+    except Exception as e:
+        logger.exception(f"{path} 运行失败")
+        result.error = repr(e)
+    result.elapsed = time.perf_counter() - start
+    result.metrics = metrics.snapshot(reset=True)
+    return result
+
+
+def _filter_by_proxy(
+    paths: List[str], proxy_pool: ProxyPool, report: FleetReport
+) -> List[str]:
+    """
+    检查所有账号使用的代理，返回可以启动的账号，其余记为失败
+    """
+    keys = {path: proxy_pool.add_profile(path) for path in paths}
+    proxy_pool.check_all_sync(set(keys.values()))
+    runnable = []
+    for path in paths:
+        if proxy_pool.healthy(keys[path]):
+            runnable.append(path)
+            continue
+        state = proxy_pool.proxies[keys[path]]
+        error = f"代理不可用 {keys[path]} {state.last_error}".rstrip()
+        logger.error(f"{path} {error}")
+        report.results.append(FleetResult(path=path, error=error))
+    return runnable
+
+
+def run_fleet(
+    handler: str | Type,
+    paths: List[str],
+    workers: int = 4,
+    base_port: int = 9300,
+    headless: bool = False,
+    with_metamask: bool = False,
+    quit_browser: bool = True,
+    warm_pool: Optional[WarmBrowserPool] = None,
+    log_dir: Optional[str] = None,
+    metrics_path: Optional[str] = None,
+    proxy_pool: Optional[ProxyPool] = None,
+    profile_launch: bool = False,
+) -> FleetReport:
+    """
+    使用进程池批量运行
+    handler: HandlerBase 子类或 "模块:类名"
+    workers: 同时运行的浏览器数量
+    base_port: 调试端口起点，worker i 使用 base_port + i
+    warm_pool: 开启常驻浏览器，端口由 warm_pool 分配，任务结束不关闭浏览器
+    log_dir: worker 使用后台队列写日志，并按账号写入 log_dir 下的 JSON lines 文件
+    metrics_path: 汇总所有 worker 的步骤耗时，写入 Prometheus 文本文件
+    proxy_pool: 开始前并发检查所有代理，代理不可用的账号不启动
+    profile_launch: 记录每个账号启动浏览器各阶段的耗时，结束后输出汇总，见 a9tools.profiler
+    """
+    workers = max(1, min(workers, len(paths) or 1))
+    ctx = multiprocessing.get_context("spawn")
+    slots = ctx.Queue()
+    for i in range(workers):
+        slots.put(i)
+    report = FleetReport()
+    start = time.perf_counter()
+    total = len(paths)
+    if proxy_pool:
+        paths = _filter_by_proxy(paths, proxy_pool, report)
+    skipped = total - len(paths)
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=ctx,
+        initializer=_init_worker,
+        initargs=(slots, base_port, workers, log_dir, profile_launch),
+    ) as pool:
+        futures = [
+            pool.submit(
+                _run_profile,
+                handler,
+                path,
+                headless,
+                with_metamask,
+                quit_browser,
+                warm_pool,
+                proxy_pool,
+            )
+            for path in paths
+        ]
+        for future in as_completed(futures):
+            result = future.result()
+            metrics.merge(result.metrics)
+            report.results.append(result)
+            if result.ok:
+                logger.success(f"{result.path} 完成 {result.elapsed:.1f}s")
+            else:
+                logger.error(f"{result.path} 失败 {result.error}")
+    report.elapsed = time.perf_counter() - start
+    if metrics_path:
+        metrics.write_prometheus(metrics_path)
+    logger.info(
+        f"完成 {report.succeeded}/{total}，失败 {report.failed}"
+        f"(其中代理不可用未启动 {skipped})，"
+        f"耗时 {report.elapsed:.1f}s，{report.profiles_per_minute:.2f} profiles/min"
+    )
+    launches = [r.launch for r in report.results if r.launch]
+    if launches:
+        logger.info(format_summary(summarize(launches), len(launches)))
+    return report
+
+
+def _proxy_pool(target: Optional[str]) -> ProxyPool:
+    if not target:
+        return ProxyPool()
+    host, port = target.rsplit(":", 1)
+    return ProxyPool(target=(host, int(port)))
+
+
+@app.command("run")
+def run(
+    handler: str,
+    source: str,
+    workers: int = 4,
+    base_port: int = 9300,
+    headless: bool = False,
+    with_metamask: bool = False,
+    warm: bool = False,
+    warm_max_browsers: int = 8,
+    warm_max_memory_mb: int = 0,
+    log_dir: Optional[str] = None,
+    metrics_path: Optional[str] = None,
+    check_proxies: bool = False,
+    proxy_target: Optional[str] = None,
+    profile_launch: bool = False,
+):
+    """
+    批量运行 source 中的所有账号
+    """
+    paths = load_manifest(source)
+    logger.info(f"共 {len(paths)} 个账号，{workers} 个进程")
+    report = run_fleet(
+        handler,
+        paths,
+        workers=workers,
+        base_port=base_port,
+        headless=headless,
+        with_metamask=with_metamask,
+        warm_pool=WarmBrowserPool(
+            max_browsers=warm_max_browsers, max_memory_mb=warm_max_memory_mb
+        )
+        if warm
+        else None,
+        log_dir=log_dir,
+        metrics_path=metrics_path,
+        proxy_pool=(
+            _proxy_pool(proxy_target) if check_proxies else None
+        ),
+        profile_launch=profile_launch,
+    )
+    if report.failed:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    app()
@@ -0,0 +1,237 @@
+"""
+任务进度记录
+
+按 (项目, 账号, 任务, 步骤, key) 记录已经完成的步骤，批量任务中断后重新运行时，
+已完成的步骤直接跳过，不再打开页面再判断 "already follow"。
+项目为定义 Handler 的文件所在目录，不同项目的同名 Handler
+使用同一个浏览器数据目录时互不影响。
+key 用于同一步骤对不同对象执行的情况，例如推文地址、关注的用户名。
+
+数据库位置默认为 A9TOOLS_HOME/journal.db(SQLite WAL，多进程共用)，
+环境变量 A9TOOLS_JOURNAL 可以指定路径，设置为 off 则关闭。
+
+    python -m a9tools.journal status
+    python -m a9tools.journal reset --project . --task Handler --step twitter_follow
+"""
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+from functools import lru_cache
+from typing import Any, List, Optional
+
+from typer import Typer
+
+from .log import logger
+from .utils import get_a9tools_home
+
+app = Typer()
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS steps (
+    project TEXT NOT NULL,
+    profile TEXT NOT NULL,
+    task TEXT NOT NULL,
+    step TEXT NOT NULL,
+    key TEXT NOT NULL DEFAULT '',
+    result TEXT,
+    finished_at REAL,
+    PRIMARY KEY (project, profile, task, step, key)
+);
+CREATE INDEX IF NOT EXISTS idx_steps_task ON steps (project, task, step);
+"""
+
+
+def _project(path: Optional[str] = None) -> str:
+    return os.path.realpath(path or os.getcwd())
+
+
+def handler_project(cls: type) -> str:
+    """
+    定义 Handler 类的文件所在目录，交互环境等没有文件时使用当前目录
+    """
+    path = getattr(sys.modules.get(cls.__module__), "__file__", None)
+    return _project(os.path.dirname(path) if path else None)
+
+
+class TaskJournal:
+    def __init__(self, db_path: Optional[str] = None) -> None:
+        self.db_path = db_path or os.path.join(get_a9tools_home(), "journal.db")
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(
+            self.db_path, timeout=30, check_same_thread=False, isolation_level=None
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+
+    def _execute(self, sql: str, params=()) -> sqlite3.Cursor:
+        with self._lock:
+            return self._conn.execute(sql, params)
+
+    def close(self) -> None:
+        self._conn.close()
+
+    def done(
+        self,
+        profile: str,
+        task: str,
+        step: str,
+        key: str = "",
+        max_age: Optional[float] = None,
+        project: Optional[str] = None,
+    ) -> bool:
+        """
+        步骤是否已完成
+        max_age: 完成时间超过该秒数的视为未完成，例如登录状态会过期
+        project: 项目目录，默认为当前目录
+        """
+        row = self._execute(
+            "SELECT finished_at FROM steps WHERE project = ?"
+            " AND profile = ? AND task = ? AND step = ? AND key = ?",
+            (_project(project), os.path.abspath(profile), task, step, key),
+        ).fetchone()
+        if not row:
+            return False
+        return max_age is None or time.time() - row[0] <= max_age
+
+    def record(
+        self,
+        profile: str,
+        task: str,
+        step: str,
+        key: str = "",
+        result: Any = None,
+        project: Optional[str] = None,
+    ) -> None:
+        """
+        记录步骤完成，result 为可选的 JSON 数据
+        """
+        self._execute(
+            """
+            INSERT INTO steps (project, profile, task, step, key, result, finished_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (project, profile, task, step, key) DO UPDATE SET
+                result = excluded.result,
+                finished_at = excluded.finished_at
+            """,
+            (
+                _project(project),
+                os.path.abspath(profile),
+                task,
+                step,
+                key,
+                json.dumps(result) if result is not None else None,
+                time.time(),
+            ),
+        )
+
+    def completed(
+        self, profile: str, task: Optional[str] = None, project: Optional[str] = None
+    ) -> List[dict]:
+        sql = (
+            "SELECT task, step, key, finished_at FROM steps"
+            " WHERE project = ? AND profile = ?"
+        )
+        params = [_project(project), os.path.abspath(profile)]
+        if task:
+            sql += " AND task = ?"
+            params.append(task)
+        rows = self._execute(sql + " ORDER BY finished_at", params).fetchall()
+        return [
+            {"task": r[0], "step": r[1], "key": r[2], "finished_at": r[3]}
+            for r in rows
+        ]
+
+    def reset(
+        self,
+        profile: Optional[str] = None,
+        task: Optional[str] = None,
+        step: Optional[str] = None,
+        project: Optional[str] = None,
+    ) -> int:
+        """
+        删除记录，不指定条件时删除全部，返回删除的数量
+        """
+        conditions, params = [], []
+        if project:
+            conditions.append("project = ?")
+            params.append(_project(project))
+        if profile:
+            conditions.append("profile = ?")
+            params.append(os.path.abspath(profile))
+        if task:
+            conditions.append("task = ?")
+            params.append(task)
+        if step:
+            conditions.append("step = ?")
+            params.append(step)
+        sql = "DELETE FROM steps"
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        return self._execute(sql, params).rowcount
+
+    def summary(self) -> List[tuple]:
+        """
+        (项目, 任务, 步骤, 完成的账号数, 记录数)
+        """
+        return self._execute(
+            "SELECT project, task, step, COUNT(DISTINCT profile), COUNT(*) FROM steps"
+            " GROUP BY project, task, step ORDER BY project, task, step"
+        ).fetchall()
+
+
+@lru_cache(maxsize=None)
+def _journal(db_path: str) -> TaskJournal:
+    return TaskJournal(db_path)
+
+
+def get_journal() -> Optional[TaskJournal]:
+    """
+    进程内共享的任务记录，关闭或打开失败时返回 None，所有步骤照常执行
+    """
+    setting = os.environ.get("A9TOOLS_JOURNAL", "")
+    if setting.lower() == "off":
+        return None
+    db_path = setting or os.path.join(get_a9tools_home(), "journal.db")
+    try:
+        return _journal(db_path)
+    except sqlite3.Error as e:
+        logger.warning(f"打开任务记录失败 {db_path} {e}")
+        return None
+
+
+def _cli_journal() -> TaskJournal:
+    journal = get_journal()
+    if journal is None:
+        raise SystemExit("任务记录已关闭或无法打开")
+    return journal
+
+
+@app.command("status")
+def status():
+    """
+    各任务步骤的完成情况
+    """
+    for project, task, step, profiles, count in _cli_journal().summary():
+        print(f"{project}\t{task}\t{step}\t账号 {profiles}\t记录 {count}")
+
+
+@app.command("reset")
+def reset(
+    project: Optional[str] = None,
+    profile: Optional[str] = None,
+    task: Optional[str] = None,
+    step: Optional[str] = None,
+):
+    """
+    清除完成记录，下次运行时重新执行
+    """
+    count = _cli_journal().reset(profile, task, step, project)
+    logger.success(f"删除 {count} 条记录")
+
+
+if __name__ == "__main__":
+    app()
@@ -0,0 +1,101 @@
+"""
+浏览器数据目录的占用
+
+ProfileLease: fleet/compact 等运行期间独占 user_data_path 的租约(.a9tools.lock)
+browser_running: 目录是否正在被浏览器或租约占用
+"""
+import os
+import socket
+from typing import Optional
+
+from .log import logger
+from .utils import pid_alive
+
+LOCK_FILE = ".a9tools.lock"
+
+
+class ProfileLease:
+    """
+    user_data_path 租约
+    同一个浏览器数据目录同时只能被一个进程使用，否则 Chrome 会直接连到已有实例
+    """
+
+    def __init__(self, user_data_path: str) -> None:
+        self.user_data_path = user_data_path
+        self.lock_path = os.path.join(user_data_path, LOCK_FILE)
+        self._fd: Optional[int] = None
+
+    def acquire(self) -> None:
+        os.makedirs(self.user_data_path, exist_ok=True)
+        for _ in range(2):
+            try:
+                self._fd = os.open(
+                    self.lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY
+                )
+                os.write(self._fd, str(os.getpid()).encode())
+                return
+            except FileExistsError:
+                if not self._clear_stale():
+                    break
+        raise Exception(f"浏览器数据目录正在使用中 {self.user_data_path}")
+
+    def _clear_stale(self) -> bool:
+        """持有锁的进程已退出时清理锁文件"""
+        try:
+            with open(self.lock_path, "r") as f:
+                pid = int(f.read().strip() or 0)
+        except (OSError, ValueError):
+            pid = 0
+        if pid and pid_alive(pid):
+            return False
+        logger.warning(f"清理失效的目录锁 {self.lock_path}")
+        try:
+            os.remove(self.lock_path)
+        except FileNotFoundError:
+            pass
+        return True
+
+    def release(self) -> None:
+        if self._fd is None:
+            return
+        os.close(self._fd)
+        self._fd = None
+        try:
+            os.remove(self.lock_path)
+        except FileNotFoundError:
+            pass
+
+    def __enter__(self) -> "ProfileLease":
+        self.acquire()
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.release()
+
+
+def browser_running(user_data_path: str) -> bool:
+    """
+    目录是否正在被浏览器使用
+    linux/mac 上 SingletonLock 是指向 "主机名-pid" 的软链接，windows 上 lockfile 被占用时无法删除
+    """
+    lock = os.path.join(user_data_path, "SingletonLock")
+    if os.path.islink(lock):
+        target = os.readlink(lock)
+        host, _, pid = target.rpartition("-")
+        if host and host != socket.gethostname():
+            # 其他机器上的浏览器(共享存储)，无法判断，按运行中处理
+            return True
+        if pid.isdigit() and pid_alive(int(pid)):
+            return True
+    lockfile = os.path.join(user_data_path, "lockfile")
+    if os.name == "nt" and os.path.exists(lockfile):
+        try:
+            os.remove(lockfile)
+        except OSError:
+            return True
+    lease = os.path.join(user_data_path, LOCK_FILE)
+    try:
+        with open(lease, "r") as f:
+            return pid_alive(int(f.read().strip() or 0))
+    except (OSError, ValueError):
+        return False
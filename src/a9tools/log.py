@@ -1,4 +1,14 @@
+import gzip
+import hashlib
+import json
+import os
+import shutil
 import sys
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import Optional
+
 from loguru import logger
 
 # 自定义日志格式
@@ -11,7 +21,138 @@ custom_format = (
 )
 
 
+def _isatty() -> bool:
+    try:
+        return sys.stdout.isatty()
+    except (AttributeError, ValueError):
+        return False
+
+
 # 添加自定义格式的日志处理器
 logger.remove()
-logger.add(sys.stdout, format=custom_format, colorize=True)
+logger.add(sys.stdout, format=custom_format, colorize=_isatty())
 logger.opt(colors=True, exception=True)
+
+
+class ProfileLogRouter:
+    """
+    按账号(user_data_path)分文件写 JSON lines
+    作为 loguru 的 enqueue sink，在后台线程中执行，不阻塞调用方
+    """
+
+    def __init__(
+        self,
+        log_dir: str,
+        rotation_mb: float = 20,
+        compression: bool = True,
+        max_open_files: int = 64,
+    ) -> None:
+        self.log_dir = log_dir
+        self.rotation_bytes = int(rotation_mb * 1024 * 1024)
+        self.compression = compression
+        self.max_open_files = max_open_files
+        self._files: "OrderedDict[str, object]" = OrderedDict()
+        os.makedirs(log_dir, exist_ok=True)
+
+    def path_for(self, profile: str) -> str:
+        name = os.path.basename(os.path.normpath(profile)) or "profile"
+        key = hashlib.sha1(os.path.abspath(profile).encode()).hexdigest()[:8]
+        return os.path.join(self.log_dir, f"{name}-{key}.jsonl")
+
+    def _open(self, profile: str):
+        f = self._files.pop(profile, None)
+        if f is None:
+            f = open(self.path_for(profile), "a", encoding="utf-8")
+            if len(self._files) >= self.max_open_files:
+                _, oldest = self._files.popitem(last=False)
+                oldest.close()
+        self._files[profile] = f
+        return f
+
+    def _rotate(self, profile: str) -> None:
+        f = self._files.pop(profile)
+        f.close()
+        path = self.path_for(profile)
+        base = f"{path[: -len('.jsonl')]}.{datetime.now():%Y%m%d-%H%M%S-%f}"
+        rotated = f"{base}.jsonl"
+        n = 0
+        # 同一微秒(时钟精度较低的系统)内多次切分时加序号，不覆盖之前的文件
+        while os.path.exists(rotated) or os.path.exists(f"{rotated}.gz"):
+            n += 1
+            rotated = f"{base}-{n}.jsonl"
+        os.replace(path, rotated)
+        if self.compression:
+            threading.Thread(target=_gzip, args=(rotated,), daemon=True).start()
+
+    def write(self, message) -> None:
+        record = message.record
+        extra = record["extra"]
+        profile = extra.get("profile")
+        if not profile:
+            return
+        data = {
+            "time": record["time"].isoformat(),
+            "level": record["level"].name,
+            "profile": profile,
+            "task": extra.get("task", ""),
+            "step": extra.get("step", ""),
+            "message": record["message"],
+            "location": (
+                f"{record['file'].name}:{record['function']}:{record['line']}"
+            ),
+        }
+        if record["exception"]:
+            data["exception"] = repr(record["exception"].value)
+        f = self._open(profile)
+        f.write(json.dumps(data, ensure_ascii=False) + "\n")
+        f.flush()
+        if f.tell() >= self.rotation_bytes:
+            self._rotate(profile)
+
+    def stop(self) -> None:
+        for f in self._files.values():
+            f.close()
+        self._files.clear()
+
+
+def _gzip(path: str) -> None:
+    with open(path, "rb") as src, gzip.open(f"{path}.gz", "wb") as dst:
+        shutil.copyfileobj(src, dst)
+    os.remove(path)
+
+
+def configure_logging(
+    profile_log_dir: Optional[str] = None,
+    stdout: bool = True,
+    stdout_level: str = "INFO",
+    rotation_mb: float = 20,
+    compression: bool = True,
+) -> None:
+    """
+    多账号并行时的日志配置
+    所有日志通过队列交给后台线程写出，调用方只负责入队
+    profile_log_dir: 带有 profile 字段(HandlerBase.log_context)的日志另外按账号写入该目录，
+        默认 A9TOOLS_HOME/logs
+    """
+    from .utils import get_a9tools_home
+
+    logger.remove()
+    if stdout:
+        logger.add(
+            sys.stdout,
+            format=custom_format,
+            colorize=_isatty(),
+            level=stdout_level,
+            enqueue=True,
+        )
+    router = ProfileLogRouter(
+        profile_log_dir or os.path.join(get_a9tools_home(), "logs"),
+        rotation_mb=rotation_mb,
+        compression=compression,
+    )
+    logger.add(
+        router,
+        format="{message}",
+        enqueue=True,
+        filter=lambda record: "profile" in record["extra"],
+    )
@@ -1,8 +1,16 @@
+import hashlib
 import os
+import time
 from urllib.parse import urlparse
 from time import sleep
+from typing import Optional
 from .exception import WalletInfoException
+from .extension import get_extension_registry, metamask_extension_path
 from .log import logger
+from .metrics import metrics, timed
+from .probe import probe, testid
+from .registry import get_registry
+from .timeouts import get_timeouts
 from .utils import log_execution_time
 from .model import WalletInfo
 
@@ -16,7 +24,31 @@ class MetaMaskException(WalletInfoException):
         return f"{self.name} Acitons Error: {self.info}"
 
 
+# 任务记录(a9tools.journal)中的步骤名
+ONBOARDING_STEP = "metamask_onboarding"
+IMPORT_STEP = "metamask_import"
+
+
+def _wallet_key(pk: str) -> str:
+    """导入私钥的任务记录 key，不在数据库中保存私钥"""
+    return hashlib.sha256(pk.strip().encode()).hexdigest()[:16]
+
+
 class MetaMask:
+    def __init__(self, handler=None) -> None:
+        """
+        handler: HandlerBase，传入时引导和导入私钥按账号写入任务记录，
+            重新运行时跳过已完成的步骤
+        """
+        self.handler = handler
+
+    def _skip_step(self, step: str, key: str = "") -> bool:
+        return self.handler is not None and self.handler._skip_step(step, key)
+
+    def _record_step(self, step: str, key: str = "") -> None:
+        if self.handler is not None:
+            self.handler.record_step(step, key)
+
     def get_url(self):
         """
         获取插件的本地地址
@@ -34,15 +66,32 @@ class MetaMask:
         else:
             logger.debug(f"{dt_id} not found")
 
-    def click_actions(self, dt_ids: list, tab):
+    def click_actions(self, dt_ids: list, tab, timeout: Optional[float] = None):
         """
         任务链的方式点击
         dt_ids: 有序的 data_testid 列表
+        每次查询剩余所有按钮的状态，点击最靠前的可见按钮，
+        它之前没有出现的按钮视为不需要点击，不再逐个等待超时
+        timeout: 不指定时按历史耗时自适应(a9tools.timeouts)
         """
         logger.info("click create wallet btn..")
-        for act in dt_ids:
-            self.__click_by_data_testid(act, tab)
+        remaining = list(dt_ids)
+        while remaining:
+            selectors = [testid(dt_id) for dt_id in remaining]
+            state = get_timeouts().wait_any(
+                tab, selectors, "MetaMask.click_actions", timeout
+            )
+            first = state.first_visible(selectors)
+            if first is None:
+                logger.debug(f"{remaining} not found")
+                return
+            index = selectors.index(first)
+            for skipped in remaining[:index]:
+                logger.debug(f"{skipped} not found")
+            self.__click_by_data_testid(remaining[index], tab)
+            remaining = remaining[index + 1 :]
 
+    @timed()
     def setup(self, create_tag: bool, pk: str, tab):
         """
         初始化钱包
@@ -55,10 +104,30 @@ class MetaMask:
             self.import_wallet(pk, tab)
             tab.close()
 
+    @timed()
+    def setup_from_state(self, pk: str, tab, password: str = "localpwd"):
+        """
+        已写入初始数据(见 a9tools.metamask_state)的账号，解锁后只导入私钥
+        """
+        logger.info("解锁插件并导入私钥")
+        tab.get(self.get_extension_url())
+        tab.ele("@data-testid=unlock-password").input(password)
+        tab.ele("@data-testid=unlock-submit").click()
+        account, popover = testid("account-menu-icon"), testid("popover-close")
+        state = get_timeouts().wait_any(
+            tab, [popover, account], "MetaMask.setup_from_state"
+        )
+        if state.visible(popover):
+            tab.ele("@data-testid=popover-close").click(by_js=True)
+        self.import_wallet(pk, tab)
+
+    @timed()
     def init_wallet_extension(self, tab) -> None:
         """
         跳过协议，创建钱包，点击我同意
         """
+        if self._skip_step(ONBOARDING_STEP):
+            return
         logger.info(f"{tab.title}\n跳过协议，创建钱包，点击我同意")
         actions = [
             "onboarding-terms-checkbox",
@@ -67,10 +136,13 @@ class MetaMask:
         ]
         self.click_actions(actions, tab)
 
+    @timed()
     def create_extension_pwd(self, tab, password: str = "localpwd"):
         """
         输入钱包插件解锁密码
         """
+        if self._skip_step(ONBOARDING_STEP):
+            return
         logger.info("创建钱包插件解锁密码")
         tab.ele("@data-testid=create-password-new").input(password)
         tab.ele("@data-testid=create-password-confirm").input(password)
@@ -88,6 +160,7 @@ class MetaMask:
             import_btn.click()
             return
 
+    @timed()
     def into_home_page(self, tab, wallet: WalletInfo = {}) -> None:
         """
         当有本地数据的时候，进入钱包首页
@@ -98,7 +171,10 @@ class MetaMask:
         if input_box:
             self.unlock_wallet(tab, wallet=wallet)
             return
+        if self._skip_step(ONBOARDING_STEP):
+            return
         self._into_home_page(tab)
+        self._record_step(ONBOARDING_STEP)
 
     def _into_home_page(self, tab) -> None:
         """
@@ -139,10 +215,15 @@ class MetaMask:
         if btn:
             btn.click()
 
+    @timed()
     def import_wallet(self, pk: str, tab) -> None:
         """
-        导入钱包
+        导入钱包，已导入时直接关闭标签
         """
+        key = _wallet_key(pk)
+        if self._skip_step(IMPORT_STEP, key):
+            tab.close()
+            return
         # tab.get(self.get_extension_url())
         logger.info(f"refresh url: {tab.url}")
         logger.info("导入钱包")
@@ -156,12 +237,16 @@ class MetaMask:
         divs[1].ele("tag:button").click()
         tab.ele("@id=private-key-box").input(pk)
         self.__click_by_data_testid("import-account-confirm-button", tab)
+        self._record_step(IMPORT_STEP, key)
         tab.close()
 
+    @timed()
     def import_wallet_mnemonic(self, mnemonic: str, tab) -> None:
         """
         导入助记词
         """
+        if self._skip_step(ONBOARDING_STEP):
+            return
         act = [
             "onboarding-terms-checkbox",
             "onboarding-import-wallet",
@@ -175,16 +260,22 @@ class MetaMask:
             tab.ele(f"@data-testid=import-srp__srp-word-{i}").input(mnemonic_list[i])
         tab.ele("@data-testid=import-srp-confirm").click()
 
+    @timed()
     def import_wallet_git_version(self, pk: str, tab) -> None:
         """
         旧版小狐狸插件导入钱包
         """
+        key = _wallet_key(pk)
+        if self._skip_step(IMPORT_STEP, key):
+            tab.close()
+            return
         tab.get(self.get_extension_url())
         tab.wait.load_start()
         tab.get(self._get_import_wallet_url())
         logger.info(f"refresh url: {tab.url}")
         tab.ele("@id=private-key-box").input(pk)
         tab.ele("@text()=Import").click()
+        self._record_step(IMPORT_STEP, key)
         tab.close()
 
     @log_execution_time
@@ -194,38 +285,88 @@ class MetaMask:
         """
         解锁插件
         with_close: 是否关闭 tab
+        每个阶段等待页面状态变化，不固定等待，耗时记录为 MetaMask.unlock_wallet.阶段
         """
         logger.info("解锁插件")
-        tab.ele("@data-testid=unlock-password").input("localpwd")
-        tab.ele("@data-testid=unlock-submit").click()
-        if tab.wait.ele_displayed(
-            "tag:button@@data-testid=onboarding-complete-done", timeout=3
-        ):
-            tab.ele("tag:button@@data-testid=onboarding-complete-done").click()
-            tab.wait.eles_loaded("tag:button@@data-testid=pin-extension-next")
-            tab.ele("tag:button@@data-testid=pin-extension-next").click()
-            tab.wait.eles_loaded("tag:button@@data-testid=pin-extension-done")
-            tab.ele("tag:button@@data-testid=pin-extension-done").click()
-        close_btn = tab.ele("tag:button@@data-testid=popover-close")
-        if close_btn:
-            close_btn.click(by_js=True)
-        
+        done, network = testid("onboarding-complete-done"), testid("network-display")
+        with metrics.span("MetaMask.unlock_wallet.unlock"):
+            tab.ele("@data-testid=unlock-password").input("localpwd")
+            tab.ele("@data-testid=unlock-submit").click()
+            # 解锁完成后出现首页的网络按钮，没有完成引导的出现引导完成按钮
+            state = get_timeouts().wait_any(
+                tab, [done, network], "MetaMask.unlock_wallet"
+            )
+        if state.visible(done):
+            with metrics.span("MetaMask.unlock_wallet.onboarding"):
+                self.click_actions(
+                    [
+                        "onboarding-complete-done",
+                        "pin-extension-next",
+                        "pin-extension-done",
+                    ],
+                    tab,
+                )
+        with metrics.span("MetaMask.unlock_wallet.popover"):
+            self._close_popover(tab)
+
         if with_close:
-            gotItBtn = tab.ele("tag:button@@text()=Got it")
+            gotItBtn = tab.ele("tag:button@@text()=Got it", timeout=0)
             if gotItBtn:
                 gotItBtn.click()
-            hasSpan = tab.ele("tag:span@@text()=Account 1")
+            hasSpan = tab.ele("tag:span@@text()=Account 1", timeout=1)
             if hasSpan and wallet:
                 logger.info("need import private key")
                 if not wallet.mnemonic:
                     self.import_wallet(wallet.private_key, tab=tab)
                     return
-        tab.ele("tag:button@@data-testid=network-display").click()
-        tab.wait(1)
-        tab.ele("tag:div@@data-testid=Ethereum Mainnet").click()
-        tab.wait(3)
+        with metrics.span("MetaMask.unlock_wallet.switch_network"):
+            self.switch_network(tab, "Ethereum Mainnet")
         tab.close()
 
+    def _close_popover(self, tab, timeout: float = 3) -> None:
+        """
+        关闭首页的弹窗，等待弹窗消失
+        """
+        close = testid("popover-close")
+        if not probe(tab, [close]).present(close):
+            return
+        tab.ele("tag:button@@data-testid=popover-close").click(by_js=True)
+        deadline = time.perf_counter() + timeout
+        while probe(tab, [close]).present(close):
+            if time.perf_counter() >= deadline:
+                logger.debug("popover not closed")
+                return
+            sleep(0.1)
+
+    def _network_text(self, tab) -> str:
+        btn = tab.ele("tag:button@@data-testid=network-display", timeout=1)
+        return btn.text if btn else ""
+
+    def switch_network(
+        self, tab, name: str, timeout: Optional[float] = None
+    ) -> None:
+        """
+        切换网络，等待网络按钮显示新的网络名称
+        """
+        before = self._network_text(tab)
+        if name in before:
+            logger.debug(f"already on {name}")
+            return
+        tab.ele("tag:button@@data-testid=network-display").click()
+        item = testid(name)
+        state = get_timeouts().wait_any(
+            tab, [item], "MetaMask.switch_network", timeout
+        )
+        if not state.visible(item):
+            raise MetaMaskException(f"网络列表中未找到 {name}")
+        tab.ele(f"tag:div@@data-testid={name}").click()
+        deadline = time.perf_counter() + (timeout or 10)
+        while name not in self._network_text(tab):
+            if time.perf_counter() >= deadline:
+                raise MetaMaskException(f"切换网络 {name} 超时")
+            sleep(0.1)
+
+    @timed()
     def click_next(self, tab) -> None:
         """
         下一步
@@ -242,7 +383,9 @@ class MetaMask:
             old_version_next_btn.click()
             return
         logger.error("next btn not found")
+        metrics.fail()
 
+    @timed()
     def click_confirm(self, tab):
         """
         点击确认
@@ -250,6 +393,7 @@ class MetaMask:
         logger.info("点击确认")
         self.click_next(tab)
 
+    @timed()
     def click_sign(self, tab) -> None:
         """
         签名
@@ -257,6 +401,7 @@ class MetaMask:
         logger.info("点击签名")
         self.click_next(tab)
 
+    @timed()
     def click_approve(self, tab) -> None:
         """
         批准
@@ -273,17 +418,43 @@ class MetaMask:
         self.save_extension_id(tab)
         with open(f"{self.__class__.__name__}.url", "w") as f:
             f.write(tab.url)
+        registry = get_registry()
+        if registry:
+            registry.save_extension(self.__class__.__name__, url=tab.url)
 
-    def get_extension_url(self) -> str:
+    def _get_extension_id(self) -> str:
         """
-        获取本机的 url
+        获取插件 id，优先根据插件目录离线计算，其次读当前目录下的 .id 文件和索引中
+        当前项目目录的记录，都没有返回空
         """
+        path = metamask_extension_path()
+        if path:
+            return get_extension_registry().resolve(path).id
         id_path = f"{self.__class__.__name__}.id"
         if os.path.exists(id_path):
             with open(id_path, "r") as f:
-                _id = f.read()
-                return f"chrome-extension://{_id}/home.html"
-        with open(f"{self.__class__.__name__}.url", "r") as f:
+                return f.read()
+        registry = get_registry()
+        if registry:
+            info = registry.get_extension(self.__class__.__name__)
+            if info and info["extension_id"]:
+                return info["extension_id"]
+        return ""
+
+    def get_extension_url(self) -> str:
+        """
+        获取本机的 url
+        """
+        _id = self._get_extension_id()
+        if _id:
+            return f"chrome-extension://{_id}/home.html"
+        url_path = f"{self.__class__.__name__}.url"
+        registry = get_registry()
+        if registry and not os.path.exists(url_path):
+            info = registry.get_extension(self.__class__.__name__)
+            if info and info["url"]:
+                return info["url"]
+        with open(url_path, "r") as f:
             return f.read()
 
     def save_extension_id(self, tab) -> None:
@@ -293,11 +464,14 @@ class MetaMask:
         parse_url = urlparse(tab.url)
         with open(f"{self.__class__.__name__}.id", "w") as f:
             f.write(parse_url.netloc)
+        registry = get_registry()
+        if registry:
+            registry.save_extension(
+                self.__class__.__name__, extension_id=parse_url.netloc
+            )
 
     def _get_import_wallet_url(self) -> str:
-        id_path = f"{self.__class__.__name__}.id"
-        if os.path.exists(id_path):
-            with open(id_path, "r") as f:
-                _id = f.read()
-                return f"chrome-extension://{_id}/home.html#new-account/import"
+        _id = self._get_extension_id()
+        if _id:
+            return f"chrome-extension://{_id}/home.html#new-account/import"
         raise MetaMaskException(f"{self.__class__.__name__}.id not found")
@@ -0,0 +1,154 @@
+"""
+MetaMask 初始化完成后的插件数据
+
+用一个已经完成引导(密码 localpwd、没有导入任何私钥)的账号目录采集插件存储
+(Local Extension Settings、IndexedDB)，新账号启动前写入，
+打开插件只需要解锁，再导入自己的私钥，不再逐页点击引导流程。
+
+    python -m a9tools.metamask_state capture profiles/mm_src metamask_state
+    Handler(path, metamask_state_path="metamask_state")
+"""
+import json
+import os
+import shutil
+import time
+from typing import Dict, List, Optional
+
+from typer import Typer
+
+from .extension import get_extension_registry, metamask_extension_path
+from .lease import browser_running
+from .log import logger
+from .template import _copy_tree
+
+app = Typer()
+
+STATE_FILE = "state.json"
+PROFILE_DIR = "Default"
+# leveldb 运行时文件，不需要复制
+SKIP_FILES = {"LOCK", "LOG", "LOG.old"}
+
+
+def _current_extension_id() -> str:
+    path = metamask_extension_path()
+    if not path:
+        raise Exception("钱包插件目录未找到，无法确定插件 id")
+    return get_extension_registry().resolve(path).id
+
+
+def storage_dirs(extension_id: str) -> Dict[str, str]:
+    """
+    插件存储目录，名称 -> 相对 Default 的路径
+    """
+    origin = f"chrome-extension_{extension_id}_0"
+    return {
+        "local_settings": os.path.join("Local Extension Settings", extension_id),
+        "indexeddb": os.path.join("IndexedDB", f"{origin}.indexeddb.leveldb"),
+        "indexeddb_blob": os.path.join("IndexedDB", f"{origin}.indexeddb.blob"),
+    }
+
+
+def _copy_dir(src: str, dst: str) -> None:
+    if os.path.exists(dst):
+        shutil.rmtree(dst)
+    _copy_tree(src, dst)
+    for name in SKIP_FILES:
+        path = os.path.join(dst, name)
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def has_metamask_state(user_data_path: str, extension_id: Optional[str] = None) -> bool:
+    """
+    账号目录中是否已经有 MetaMask 的数据
+    """
+    extension_id = extension_id or _current_extension_id()
+    local = storage_dirs(extension_id)["local_settings"]
+    return os.path.isdir(os.path.join(user_data_path, PROFILE_DIR, local))
+
+
+def capture_state(
+    source: str, state_dir: str, extension_id: Optional[str] = None
+) -> List[str]:
+    """
+    从已完成引导的账号目录采集插件数据，source 对应的浏览器必须已经关闭
+    返回采集到的目录
+    """
+    if browser_running(source):
+        raise Exception(f"浏览器正在使用该目录，请先关闭 {source}")
+    extension_id = extension_id or _current_extension_id()
+    if os.path.exists(state_dir):
+        shutil.rmtree(state_dir)
+    captured = []
+    for name, rel in storage_dirs(extension_id).items():
+        src = os.path.join(source, PROFILE_DIR, rel)
+        if not os.path.isdir(src):
+            continue
+        _copy_dir(src, os.path.join(state_dir, name))
+        captured.append(name)
+    if "local_settings" not in captured:
+        shutil.rmtree(state_dir, ignore_errors=True)
+        raise Exception(f"{source} 中没有 MetaMask 的数据，插件 id:{extension_id}")
+    with open(os.path.join(state_dir, STATE_FILE), "w") as f:
+        json.dump(
+            {
+                "extension_id": extension_id,
+                "dirs": captured,
+                "source": os.path.abspath(source),
+                "created_at": int(time.time()),
+            },
+            f,
+            indent=2,
+        )
+    logger.success(f"采集 MetaMask 数据 {state_dir} {captured}")
+    return captured
+
+
+def seed_state(
+    state_dir: str,
+    user_data_path: str,
+    extension_id: Optional[str] = None,
+    overwrite: bool = False,
+) -> bool:
+    """
+    启动浏览器前把采集的插件数据写入账号目录
+    账号已经有 MetaMask 数据时不覆盖(除非 overwrite)，返回是否写入
+    插件 id 与采集时不同(插件目录变了)时按当前 id 重命名目录
+    """
+    with open(os.path.join(state_dir, STATE_FILE), "r") as f:
+        meta = json.load(f)
+    extension_id = extension_id or _current_extension_id()
+    if not overwrite and has_metamask_state(user_data_path, extension_id):
+        return False
+    if extension_id != meta["extension_id"]:
+        logger.warning(
+            f"插件 id 与采集时不同 {meta['extension_id']} -> {extension_id}，按当前 id 写入"
+        )
+    dirs = storage_dirs(extension_id)
+    for name in meta["dirs"]:
+        _copy_dir(
+            os.path.join(state_dir, name),
+            os.path.join(user_data_path, PROFILE_DIR, dirs[name]),
+        )
+    logger.info(f"写入 MetaMask 初始数据 {user_data_path}")
+    return True
+
+
+@app.command("capture")
+def capture(source: str, state_dir: str):
+    """
+    从已完成 MetaMask 引导的浏览器数据目录采集插件数据
+    """
+    capture_state(source, state_dir)
+
+
+@app.command("seed")
+def seed(state_dir: str, user_data_path: str, overwrite: bool = False):
+    """
+    把采集的插件数据写入浏览器数据目录
+    """
+    seed_state(state_dir, user_data_path, overwrite=overwrite)
+
+
+if __name__ == "__main__":
+    app()
@@ -0,0 +1,281 @@
+"""
+步骤耗时统计
+
+按步骤、父步骤和结果(ok/error)记录直方图，支持嵌套的步骤(span)，
+同一个步骤不论在哪个步骤中调用都使用同一个步骤名，父步骤单独作为 parent 标签，
+可以导出为 Prometheus 文本格式写入文件(node_exporter textfile)或通过 HTTP 提供。
+
+    from a9tools.metrics import metrics, timed
+
+    @timed()
+    def run(self): ...
+
+    with metrics.span("claim"):
+        if not ok:
+            metrics.fail()  # 没有抛异常的失败也记为 error
+"""
+import contextvars
+import functools
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional, Tuple
+
+DEFAULT_BUCKETS = (
+    0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300
+)
+
+
+class _Span:
+    __slots__ = ("name", "failed")
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.failed = False
+
+
+_span_stack: contextvars.ContextVar[Tuple[_Span, ...]] = contextvars.ContextVar(
+    "a9tools_span_stack", default=()
+)
+
+
+class Histogram:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets=DEFAULT_BUCKETS) -> None:
+        self.buckets = buckets
+        # 最后一个为 +Inf
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        i = 0
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                break
+        else:
+            i = len(self.buckets)
+        self.counts[i] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q: float) -> float:
+        """
+        按桶估算分位数(线性插值)
+        """
+        if not self.count:
+            return 0.0
+        target = q * self.count
+        seen = 0
+        lower = 0.0
+        for i, n in enumerate(self.counts):
+            upper = self.buckets[i] if i < len(self.buckets) else lower
+            if seen + n >= target and n:
+                return lower + (upper - lower) * (target - seen) / n
+            seen += n
+            lower = upper
+        return lower
+
+
+class Metrics:
+    def __init__(self, prefix: str = "a9tools") -> None:
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        # (步骤, 父步骤, 结果) -> 直方图
+        self.histograms: Dict[Tuple[str, str, str], Histogram] = {}
+        self.counters: Dict[Tuple[str, Tuple[Tuple[str, str], ...]], float] = {}
+
+    def observe(
+        self, step: str, seconds: float, outcome: str = "ok", parent: str = ""
+    ) -> None:
+        key = (step, parent, outcome)
+        with self._lock:
+            hist = self.histograms.get(key)
+            if hist is None:
+                hist = self.histograms[key] = Histogram()
+            hist.observe(seconds)
+
+    def inc(self, name: str, value: float = 1, **labels) -> None:
+        key = (name, tuple(sorted((k, str(v)) for k, v in labels.items())))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    @contextmanager
+    def span(self, name: str):
+        """
+        记录代码块耗时，抛出异常或调用 fail() 时结果为 error
+        嵌套时记录直接外层的步骤名为 parent
+        """
+        outer = _span_stack.get()
+        span = _Span(name)
+        token = _span_stack.set(outer + (span,))
+        start = time.perf_counter()
+        outcome = "ok"
+        try:
+            yield
+        except BaseException:
+            outcome = "error"
+            raise
+        finally:
+            _span_stack.reset(token)
+            if span.failed:
+                outcome = "error"
+            parent = outer[-1].name if outer else ""
+            self.observe(name, time.perf_counter() - start, outcome, parent)
+
+    def fail(self) -> None:
+        """
+        当前步骤失败但没有抛出异常(例如只记录日志后返回)，结果记为 error
+        """
+        stack = _span_stack.get()
+        if stack:
+            stack[-1].failed = True
+
+    def quantile(self, step: str, q: float, outcome: str = "ok") -> float:
+        """
+        步骤耗时的分位数，合并所有父步骤
+        """
+        with self._lock:
+            hists = [
+                h
+                for (s, _, o), h in self.histograms.items()
+                if s == step and o == outcome
+            ]
+            if not hists:
+                return 0.0
+            merged = Histogram(hists[0].buckets)
+            for h in hists:
+                merged.counts = [a + b for a, b in zip(merged.counts, h.counts)]
+                merged.count += h.count
+            return merged.quantile(q)
+
+    def snapshot(self, reset: bool = False) -> dict:
+        """
+        可序列化的数据，用于多进程汇总
+        """
+        with self._lock:
+            data = {
+                "histograms": [
+                    {
+                        "step": step,
+                        "parent": parent,
+                        "outcome": outcome,
+                        "buckets": list(h.buckets),
+                        "counts": list(h.counts),
+                        "sum": h.sum,
+                        "count": h.count,
+                    }
+                    for (step, parent, outcome), h in self.histograms.items()
+                ],
+                "counters": [
+                    {"name": name, "labels": dict(labels), "value": value}
+                    for (name, labels), value in self.counters.items()
+                ],
+            }
+            if reset:
+                self.histograms.clear()
+                self.counters.clear()
+        return data
+
+    def merge(self, data: dict) -> None:
+        with self._lock:
+            for item in data.get("histograms", []):
+                key = (item["step"], item.get("parent", ""), item["outcome"])
+                hist = self.histograms.get(key)
+                if hist is None:
+                    hist = self.histograms[key] = Histogram(tuple(item["buckets"]))
+                hist.counts = [a + b for a, b in zip(hist.counts, item["counts"])]
+                hist.sum += item["sum"]
+                hist.count += item["count"]
+        for item in data.get("counters", []):
+            self.inc(item["name"], item["value"], **item["labels"])
+
+    def to_prometheus(self) -> str:
+        lines = []
+        name = f"{self.prefix}_step_seconds"
+        with self._lock:
+            lines.append(f"# TYPE {name} histogram")
+            for (step, parent, outcome), h in sorted(self.histograms.items()):
+                labels = (
+                    f'step="{_escape(step)}",parent="{_escape(parent)}",'
+                    f'outcome="{outcome}"'
+                )
+                cumulative = 0
+                for bound, n in zip(list(h.buckets) + ["+Inf"], h.counts):
+                    cumulative += n
+                    lines.append(
+                        f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}'
+                    )
+                lines.append(f"{name}_sum{{{labels}}} {h.sum}")
+                lines.append(f"{name}_count{{{labels}}} {h.count}")
+            typed = set()
+            for (counter, labels), value in sorted(self.counters.items()):
+                metric = f"{self.prefix}_{counter}_total"
+                if metric not in typed:
+                    lines.append(f"# TYPE {metric} counter")
+                    typed.add(metric)
+                label_str = ",".join(f'{k}="{_escape(v)}"' for k, v in labels)
+                lines.append(f"{metric}{{{label_str}}} {value}")
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path: str) -> None:
+        """
+        写入 Prometheus 文本文件，先写临时文件再替换，避免读到一半的内容
+        """
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w") as f:
+            f.write(self.to_prometheus())
+        os.replace(tmp, path)
+
+    def serve(
+        self, port: int = 9464, host: str = "127.0.0.1"
+    ) -> ThreadingHTTPServer:
+        """
+        在后台线程提供 /metrics
+        """
+        registry = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = registry.to_prometheus().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+# 进程内共享
+metrics = Metrics()
+
+
+def timed(name: Optional[str] = None):
+    """
+    装饰器，记录函数耗时，默认步骤名为 类名.方法名
+    """
+
+    def decorator(func):
+        step = name or func.__qualname__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with metrics.span(step):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
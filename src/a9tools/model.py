@@ -1,7 +1,7 @@
 from email.policy import default
 from typing import Optional
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, field_validator
 
 
 class WalletInfo(BaseModel):
@@ -56,4 +56,17 @@ class InputInfoBase(BaseModel):
     proxy_scheme: str = Field(default="socks5")
     proxy_host: str = Field(default="127.0.0.1")
     proxy_port: int = Field(default=1080)
+    proxy_username: str = Field(default="", description="SOCKS5 用户名，只用于代理检查")
     proxy_password: str = Field(default="123456")
+
+    @field_validator("wallet", mode="before")
+    @classmethod
+    def _resolve_wallet(cls, value):
+        """
+        wallet 可以是钱包文件的引用 {"store": "...jsonl", "address"|"name": ...}
+        """
+        if isinstance(value, dict) and "store" in value:
+            from .wallet_store import resolve_wallet
+
+            return resolve_wallet(value)
+        return value
@@ -0,0 +1,73 @@
+"""
+一次执行 JS 判断一组元素的状态
+
+逐个 tab.ele() 查找时，每个不存在的元素都要等满超时时间，
+这里一次脚本返回所有选择器是否存在、是否可见，流程可以直接按页面状态分支。
+"""
+import time
+from typing import Iterable, List, Optional
+
+PROBE_JS = """
+const result = {};
+for (const sel of arguments[0]) {
+    let el = null;
+    try { el = document.querySelector(sel); } catch (e) {}
+    if (!el) { result[sel] = "absent"; continue; }
+    const style = window.getComputedStyle(el);
+    const visible = el.getClientRects().length > 0
+        && style.visibility !== "hidden" && style.display !== "none";
+    result[sel] = visible ? "visible" : "hidden";
+}
+return result;
+"""
+
+
+def testid(dt_id: str) -> str:
+    """data-testid 对应的 css 选择器"""
+    return f'[data-testid="{dt_id}"]'
+
+
+class DomState(dict):
+    """
+    选择器 -> "visible" / "hidden" / "absent"
+    """
+
+    def visible(self, selector: str) -> bool:
+        return self.get(selector) == "visible"
+
+    def present(self, selector: str) -> bool:
+        return self.get(selector, "absent") != "absent"
+
+    def first_visible(self, selectors: Iterable[str]) -> Optional[str]:
+        for selector in selectors:
+            if self.visible(selector):
+                return selector
+        return None
+
+
+def probe(tab, selectors: Iterable[str]) -> DomState:
+    """
+    查询一组 css 选择器的状态，只有一次 CDP 调用
+    页面跳转中脚本执行失败时全部按 absent 处理
+    """
+    selectors = list(selectors)
+    try:
+        result = tab.run_js(PROBE_JS, selectors) or {}
+    except Exception:
+        result = {}
+    return DomState({s: result.get(s, "absent") for s in selectors})
+
+
+def wait_any(
+    tab, selectors: Iterable[str], timeout: float = 5, interval: float = 0.1
+) -> DomState:
+    """
+    等待其中任意一个元素可见，返回当时的页面状态，超时返回最后一次的状态
+    """
+    selectors: List[str] = list(selectors)
+    deadline = time.perf_counter() + timeout
+    while True:
+        state = probe(tab, selectors)
+        if state.first_visible(selectors) or time.perf_counter() >= deadline:
+            return state
+        time.sleep(interval)
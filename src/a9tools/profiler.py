@@ -0,0 +1,206 @@
+"""
+浏览器启动阶段耗时
+
+设置环境变量 A9TOOLS_PROFILE_LAUNCH=1(或 HandlerBase 子类设置 profile_launch = True)后，
+HandlerBase 记录构造和 init_driver 每个阶段的耗时:
+
+    load_input          读取并校验钱包信息
+    clone_template      从模板复制数据目录
+    chrome_options      读取 config.ini 或生成启动项，包含 useragent/fingerprint 子阶段
+    add_extension       扫描 extensions 目录
+    check_proxy         代理检查
+    seed_metamask_state 写入 MetaMask 初始数据
+    spawn               启动 Chrome 进程并连接 CDP
+    ready               等待插件就绪(wait_browser_ready)
+    first_get           打开 start_url
+
+以及浏览器一侧的时间点(相对 spawn 开始，秒):
+
+    process_created     Chrome 进程创建(需要安装 psutil)
+    cdp_first_response  CDP 第一次响应 Target.getTargets
+    extensions_ready    所有插件的后台页面/service worker 已注册
+    tools_tab           指纹插件的 A9Tools 页面已打开
+    navigation_start    first_get 发出请求到页面开始导航
+    response_start      首字节(相对导航开始，下同)
+    dom_content_loaded
+    load
+
+init_driver 结束时输出单次启动的明细，阶段耗时同时记入 metrics 的 launch/<阶段>，
+fleet 批量运行时汇总所有账号，输出各阶段的中位数、p95 和占比。
+"""
+import os
+import statistics
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, Optional
+
+from pydantic import BaseModel, Field
+
+from .log import logger
+from .metrics import metrics
+
+ENV = "A9TOOLS_PROFILE_LAUNCH"
+
+NAVIGATION_JS = """
+const nav = performance.getEntriesByType('navigation')[0];
+if (!nav) return null;
+return {
+    time_origin: performance.timeOrigin,
+    response_start: nav.responseStart,
+    dom_content_loaded: nav.domContentLoadedEventEnd,
+    load: nav.loadEventEnd,
+};
+"""
+
+
+def profiling_enabled() -> bool:
+    return os.environ.get(ENV, "").lower() in ("1", "true", "yes", "on")
+
+
+class LaunchReport(BaseModel):
+    profile: str = Field(default="", description="浏览器数据目录")
+    reattach: bool = Field(default=False, description="是否连接的常驻浏览器")
+    phases: Dict[str, float] = Field(
+        default_factory=dict, description="阶段 -> 耗时(秒)，子阶段为 父阶段/子阶段"
+    )
+    browser: Dict[str, float] = Field(
+        default_factory=dict, description="浏览器一侧的时间点(秒)"
+    )
+
+    @property
+    def total(self) -> float:
+        """顶层阶段耗时之和"""
+        return sum(v for k, v in self.phases.items() if "/" not in k)
+
+    def format(self) -> str:
+        total = self.total or 1
+        lines = [f"启动耗时 {self.profile} 共 {self.total:.2f}s"]
+        for name, seconds in self.phases.items():
+            indent = "    " * (name.count("/") + 1)
+            share = f"{seconds / total:4.0%}" if "/" not in name else ""
+            lines.append(f"{indent}{name:<{32 - len(indent)}}{seconds:7.3f}s {share}")
+        if self.browser:
+            lines.append("    浏览器:")
+            for name, seconds in self.browser.items():
+                lines.append(f"        {name:<24}{seconds:7.3f}s")
+        return "\n".join(lines)
+
+
+class LaunchProfiler:
+    def __init__(self, profile: str = "") -> None:
+        self.report = LaunchReport(profile=profile)
+        self._stack: List[str] = []
+        # 阶段开始的时间戳(time.time())，浏览器时间点以 spawn 开始为基准
+        self._started: Dict[str, float] = {}
+
+    @contextmanager
+    def phase(self, name: str):
+        """
+        记录一个阶段的耗时，嵌套时阶段名为 父阶段/子阶段，同名阶段累加
+        """
+        self._stack.append(name)
+        key = "/".join(self._stack)
+        self._started.setdefault(key, time.time())
+        # 先占位，明细中父阶段排在子阶段前面
+        self.report.phases.setdefault(key, 0.0)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._stack.pop()
+            elapsed = time.perf_counter() - start
+            phases = self.report.phases
+            phases[key] = phases.get(key, 0.0) + elapsed
+            metrics.observe(f"launch/{key}", elapsed)
+
+    def mark(self, name: str, at: Optional[float] = None, since: str = "spawn"):
+        """
+        记录浏览器一侧的时间点，只保留第一次
+        at: 时间戳(time.time())，默认为当前时间
+        """
+        base = self._started.get(since)
+        if base is None or name in self.report.browser:
+            return
+        self.report.browser[name] = round((at or time.time()) - base, 4)
+
+    def mark_process(self, pid: Optional[int]) -> None:
+        """
+        Chrome 进程的创建时间，未安装 psutil 时跳过
+        """
+        if not pid:
+            return
+        try:
+            import psutil
+        except ImportError:
+            return
+        try:
+            created = psutil.Process(pid).create_time()
+        except psutil.Error:
+            return
+        self.mark("process_created", created)
+
+    def collect_navigation(self, tab) -> None:
+        """
+        first_get 之后读取 Navigation Timing，about:blank 等页面没有导航记录
+        """
+        try:
+            nav = tab.run_js(NAVIGATION_JS)
+        except Exception as e:
+            logger.debug(f"读取导航耗时失败 {e}")
+            return
+        if not nav:
+            return
+        self.mark("navigation_start", nav["time_origin"] / 1000, since="first_get")
+        for name in ("response_start", "dom_content_loaded", "load"):
+            if nav.get(name):
+                self.report.browser[name] = round(nav[name] / 1000, 4)
+
+    def log(self) -> None:
+        logger.info(self.report.format())
+
+
+def summarize(reports: Iterable[LaunchReport]) -> List[dict]:
+    """
+    按阶段汇总多次启动: 次数、平均、中位数、p95(秒)，以及占所有顶层阶段总耗时的比例
+    """
+    reports = list(reports)
+    samples: Dict[str, List[float]] = {}
+    for report in reports:
+        for name, seconds in report.phases.items():
+            samples.setdefault(name, []).append(seconds)
+        for name, seconds in report.browser.items():
+            samples.setdefault(f"browser:{name}", []).append(seconds)
+    grand_total = sum(r.total for r in reports) or 1
+    rows = []
+    for name, values in samples.items():
+        values.sort()
+        top_level = "/" not in name and not name.startswith("browser:")
+        rows.append(
+            {
+                "phase": name,
+                "n": len(values),
+                "mean": statistics.fmean(values),
+                "median": statistics.median(values),
+                "p95": values[min(len(values) - 1, int(0.95 * len(values)))],
+                "share": sum(values) / grand_total if top_level else None,
+            }
+        )
+    return rows
+
+
+def format_summary(rows: List[dict], profiles: int) -> str:
+    lines = [
+        f"{profiles} 个账号的启动耗时",
+        f"    {'阶段':<30}{'次数':>6}{'平均':>9}{'中位数':>9}{'p95':>9}{'占比':>7}",
+    ]
+    # 占比高的阶段排在前面，子阶段和浏览器时间点在后
+    rows = sorted(
+        rows, key=lambda r: -1 if r["share"] is None else r["share"], reverse=True
+    )
+    for row in rows:
+        share = f"{row['share']:6.0%}" if row["share"] is not None else ""
+        lines.append(
+            f"    {row['phase']:<30}{row['n']:>6}{row['mean']:>8.3f}s"
+            f"{row['median']:>8.3f}s{row['p95']:>8.3f}s {share}"
+        )
+    return "\n".join(lines)
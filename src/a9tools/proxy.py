@@ -0,0 +1,418 @@
+"""
+代理池
+
+并发检查所有账号使用的代理(TCP 连接 + SOCKS5 握手/用户名密码认证，可选 CONNECT 到目标地址)，
+按指数移动平均记录延迟和失败率，连续失败的代理隔离一段时间。
+代理要求认证但钱包信息中没有用户名时无法检查 CONNECT，结果记为未验证，不视为可用。
+启动浏览器前先确认代理可用，不再等到浏览器启动超时才发现代理已失效。
+
+    pool = ProxyPool.from_profiles(load_manifest("wallets"))
+    pool.check_all_sync()
+    handler.use_proxy_pool(pool)
+    handler.init_driver()
+
+    python -m a9tools.proxy check wallets/
+"""
+import asyncio
+import json
+import os
+import struct
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from pydantic import BaseModel, Field
+from typer import Typer
+
+from .log import logger
+from .utils import get_a9tools_home
+
+app = Typer()
+
+
+class ProxyUnverified(Exception):
+    """代理要求用户名密码认证，但没有配置，无法检查 CONNECT"""
+
+
+class ProxyState(BaseModel):
+    scheme: str = Field(default="socks5")
+    host: str
+    port: int
+    latency: Optional[float] = Field(
+        default=None, description="延迟(秒)的移动平均"
+    )
+    error_rate: float = Field(default=0.0, description="失败率的移动平均")
+    checks: int = Field(default=0)
+    failures_in_row: int = Field(default=0, description="连续失败次数")
+    quarantined_until: float = Field(default=0, description="隔离结束时间戳")
+    last_error: str = Field(default="")
+    last_check: float = Field(default=0)
+    unverified: bool = Field(
+        default=False, description="代理响应正常，但缺少认证信息，未能检查 CONNECT"
+    )
+
+    @property
+    def key(self) -> str:
+        return proxy_key(self.scheme, self.host, self.port)
+
+    @property
+    def quarantined(self) -> bool:
+        return self.quarantined_until > time.time()
+
+
+def proxy_key(scheme: str, host: str, port: int) -> str:
+    return f"{scheme}://{host}:{port}"
+
+
+def parse_proxy_key(key: str) -> Tuple[str, str, int]:
+    scheme, rest = key.split("://", 1)
+    host, port = rest.rsplit(":", 1)
+    return scheme, host, int(port)
+
+
+async def _socks5_auth(
+    reader: asyncio.StreamReader,
+    writer: asyncio.StreamWriter,
+    auth: Tuple[str, str],
+) -> None:
+    """RFC 1929 用户名密码认证"""
+    username, password = (v.encode() for v in auth)
+    writer.write(
+        bytes([1, len(username)]) + username + bytes([len(password)]) + password
+    )
+    await writer.drain()
+    _, status = await reader.readexactly(2)
+    if status != 0:
+        raise ConnectionError(f"SOCKS5 认证失败 {status}")
+
+
+async def _socks5_handshake(
+    reader: asyncio.StreamReader,
+    writer: asyncio.StreamWriter,
+    target: Optional[Tuple[str, int]],
+    auth: Optional[Tuple[str, str]] = None,
+) -> None:
+    # 支持 无认证/用户名密码 两种方式
+    writer.write(b"\x05\x02\x00\x02")
+    await writer.drain()
+    version, method = await reader.readexactly(2)
+    if version != 5 or method not in (0x00, 0x02):
+        raise ConnectionError(f"SOCKS5 握手失败 {version} {method}")
+    if method == 0x02:
+        if auth:
+            await _socks5_auth(reader, writer, auth)
+        elif target is not None:
+            raise ProxyUnverified("SOCKS5 需要用户名密码认证，未配置，未检查 CONNECT")
+        else:
+            return
+    if target is None:
+        return
+    host, port = target
+    host_bytes = host.encode()
+    writer.write(
+        b"\x05\x01\x00\x03"
+        + bytes([len(host_bytes)])
+        + host_bytes
+        + struct.pack("!H", port)
+    )
+    await writer.drain()
+    reply = await reader.readexactly(4)
+    if reply[1] != 0:
+        raise ConnectionError(f"SOCKS5 CONNECT 失败 {reply[1]}")
+
+
+async def _http_connect(
+    reader: asyncio.StreamReader,
+    writer: asyncio.StreamWriter,
+    target: Tuple[str, int],
+) -> None:
+    host, port = target
+    writer.write(
+        f"CONNECT {host}:{port} HTTP/1.1\r\nHost: {host}:{port}\r\n\r\n".encode()
+    )
+    await writer.drain()
+    status = await reader.readline()
+    if b" 200" not in status:
+        raise ConnectionError(f"HTTP CONNECT 失败 {status.strip()!r}")
+
+
+async def probe_proxy(
+    scheme: str,
+    host: str,
+    port: int,
+    timeout: float = 5,
+    target: Optional[Tuple[str, int]] = None,
+    auth: Optional[Tuple[str, str]] = None,
+) -> float:
+    """
+    检查一个代理，返回耗时(秒)，失败抛出异常
+    target: 通过代理 CONNECT 的地址，None 时 SOCKS5 只做握手(和认证)，HTTP 只检查 TCP 连接
+    auth: SOCKS5 的 (用户名, 密码)，代理要求认证而没有传入时，
+        有 target 抛出 ProxyUnverified
+    """
+    start = time.perf_counter()
+
+    async def run():
+        reader, writer = await asyncio.open_connection(host, port)
+        try:
+            if scheme.startswith("socks5"):
+                await _socks5_handshake(reader, writer, target, auth)
+            elif target is not None:
+                await _http_connect(reader, writer, target)
+        finally:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except (ConnectionError, OSError):
+                pass
+
+    await asyncio.wait_for(run(), timeout)
+    return time.perf_counter() - start
+
+
+class ProxyPool:
+    def __init__(
+        self,
+        proxies: Iterable[Tuple[str, str, int]] = (),
+        state_path: Optional[str] = None,
+        alpha: float = 0.3,
+        quarantine_after: int = 3,
+        quarantine_seconds: float = 300,
+        timeout: float = 5,
+        target: Optional[Tuple[str, int]] = None,
+    ) -> None:
+        """
+        proxies: (scheme, host, port)
+        alpha: 移动平均的权重，越大越看重最近的结果
+        quarantine_after: 连续失败多少次后隔离，隔离时间随次数翻倍
+        target: 检查时通过代理连接的地址，例如 ("x.com", 443)
+        """
+        self.state_path = state_path or os.path.join(
+            get_a9tools_home(), "proxies.json"
+        )
+        self.alpha = alpha
+        self.quarantine_after = quarantine_after
+        self.quarantine_seconds = quarantine_seconds
+        self.timeout = timeout
+        self.target = target
+        self._lock = threading.Lock()
+        # key -> (用户名, 密码)，只保存在内存中，不写入状态文件
+        self._auth: Dict[str, Tuple[str, str]] = {}
+        self.proxies: Dict[str, ProxyState] = self._load()
+        for scheme, host, port in proxies:
+            self.add(scheme, host, port)
+
+    def __getstate__(self) -> dict:
+        # 批量运行时传给 worker 进程
+        state = self.__dict__.copy()
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def _load(self) -> Dict[str, ProxyState]:
+        if not os.path.exists(self.state_path):
+            return {}
+        try:
+            with open(self.state_path, "r") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        return {k: ProxyState.model_validate(v) for k, v in data.items()}
+
+    def save(self) -> None:
+        with self._lock:
+            data = {k: v.model_dump() for k, v in self.proxies.items()}
+        tmp = f"{self.state_path}.{os.getpid()}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(data, f)
+        os.replace(tmp, self.state_path)
+
+    def add(
+        self,
+        scheme: str,
+        host: str,
+        port: int,
+        username: str = "",
+        password: str = "",
+    ) -> ProxyState:
+        """
+        username/password: SOCKS5 认证信息，没有用户名时不认证
+        """
+        key = proxy_key(scheme, host, port)
+        with self._lock:
+            if key not in self.proxies:
+                self.proxies[key] = ProxyState(scheme=scheme, host=host, port=port)
+            if username:
+                self._auth[key] = (username, password)
+            return self.proxies[key]
+
+    def add_profile(self, wallet_info_path: str) -> str:
+        """
+        添加钱包信息文件使用的代理和认证信息，返回 key
+        """
+        with open(wallet_info_path, "r") as f:
+            data = json.load(f)
+        return self.add(
+            data.get("proxy_scheme", "socks5"),
+            data.get("proxy_host", "127.0.0.1"),
+            int(data.get("proxy_port", 1080)),
+            data.get("proxy_username", ""),
+            data.get("proxy_password", ""),
+        ).key
+
+    @classmethod
+    def from_profiles(cls, wallet_info_paths: List[str], **kwargs) -> "ProxyPool":
+        """
+        从钱包信息文件中收集代理
+        """
+        pool = cls(**kwargs)
+        for path in wallet_info_paths:
+            pool.add_profile(path)
+        return pool
+
+    def record(
+        self,
+        key: str,
+        ok: bool,
+        latency: float = 0,
+        error: str = "",
+        unverified: bool = False,
+    ) -> None:
+        """
+        unverified: 代理正常响应但未能检查 CONNECT，不计为失败，也不视为可用
+        """
+        with self._lock:
+            state = self.proxies[key]
+            state.checks += 1
+            state.last_check = time.time()
+            state.error_rate += self.alpha * ((0.0 if ok else 1.0) - state.error_rate)
+            if ok:
+                state.latency = (
+                    latency
+                    if state.latency is None
+                    else state.latency + self.alpha * (latency - state.latency)
+                )
+                state.failures_in_row = 0
+                state.quarantined_until = 0
+                state.unverified = unverified
+                state.last_error = error if unverified else ""
+                return
+            state.failures_in_row += 1
+            state.last_error = error
+            if state.failures_in_row >= self.quarantine_after:
+                times = state.failures_in_row - self.quarantine_after
+                state.quarantined_until = time.time() + self.quarantine_seconds * (
+                    2 ** min(times, 6)
+                )
+        if state.quarantined:
+            logger.warning(
+                f"代理隔离 {key} 连续失败 {state.failures_in_row} 次 {error}"
+            )
+
+    async def check(self, key: str) -> bool:
+        state = self.proxies[key]
+        start = time.perf_counter()
+        try:
+            latency = await probe_proxy(
+                state.scheme,
+                state.host,
+                state.port,
+                self.timeout,
+                self.target,
+                self._auth.get(key),
+            )
+        except ProxyUnverified as e:
+            self.record(
+                key, True, time.perf_counter() - start, str(e), unverified=True
+            )
+            return False
+        except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError) as e:
+            self.record(key, False, error=repr(e))
+            return False
+        self.record(key, True, latency)
+        return True
+
+    async def check_all(
+        self, keys: Optional[Iterable[str]] = None, concurrency: int = 200
+    ) -> Dict[str, bool]:
+        """
+        并发检查，默认检查全部代理
+        """
+        keys = list(keys) if keys is not None else list(self.proxies)
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def one(key: str) -> bool:
+            async with semaphore:
+                return await self.check(key)
+
+        results = await asyncio.gather(*(one(k) for k in keys))
+        return dict(zip(keys, results))
+
+    def check_all_sync(
+        self, keys: Optional[Iterable[str]] = None, concurrency: int = 200
+    ) -> Dict[str, bool]:
+        results = asyncio.run(self.check_all(keys, concurrency))
+        self.save()
+        ok = sum(results.values())
+        logger.info(f"代理检查 可用 {ok}/{len(results)}")
+        return results
+
+    def healthy(self, key: str) -> bool:
+        state = self.proxies.get(key)
+        return bool(
+            state
+            and state.checks
+            and not state.quarantined
+            and not state.failures_in_row
+            and not state.unverified
+        )
+
+    def ensure(self, key: str) -> bool:
+        """
+        确认代理可用，没有检查过或检查结果失败时立即检查一次，隔离中的直接返回 False
+        """
+        state = self.proxies.get(key)
+        if state is None:
+            state = self.add(*parse_proxy_key(key))
+        if state.quarantined:
+            return False
+        if self.healthy(key):
+            return True
+        return self.check_all_sync([key])[key]
+
+
+@app.command("check")
+def check(source: str, target: Optional[str] = None, timeout: float = 5):
+    """
+    检查目录下所有钱包信息文件使用的代理
+    target: 通过代理连接的地址，例如 x.com:443
+    """
+    from .fleet import load_manifest
+
+    target_addr = None
+    if target:
+        host, port = target.rsplit(":", 1)
+        target_addr = (host, int(port))
+    pool = ProxyPool.from_profiles(
+        load_manifest(source), timeout=timeout, target=target_addr
+    )
+    pool.check_all_sync()
+    for state in sorted(pool.proxies.values(), key=lambda s: s.key):
+        if state.quarantined:
+            status = "隔离"
+        elif state.unverified:
+            status = "未验证"
+        else:
+            status = "可用" if pool.healthy(state.key) else "失败"
+        latency = f"{state.latency * 1000:.0f}ms" if state.latency else "-"
+        logger.info(
+            f"{state.key} {status} 延迟 {latency} "
+            f"失败率 {state.error_rate:.2f} {state.last_error}"
+        )
+
+
+if __name__ == "__main__":
+    app()
@@ -0,0 +1,323 @@
+"""
+账号浏览器数据索引
+
+把分散在每个 user_data_path 下的 config.ini、fingerprint.json、tools_extension_url
+以及当前目录下的 MetaMask.id/MetaMask.url 统一记录到一个 SQLite(WAL) 数据库，
+方便按代理、缺失插件地址等条件查询。原来的文件照常写入，数据库不可用时读文件。
+
+数据库位置默认为 A9TOOLS_HOME/registry.db，
+环境变量 A9TOOLS_REGISTRY 可以指定路径，设置为 off 则关闭。
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from functools import lru_cache
+from typing import List, Optional
+
+from typer import Typer
+
+from .log import logger
+from .utils import get_a9tools_home
+
+app = Typer()
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS profiles (
+    user_data_path TEXT PRIMARY KEY,
+    proxy_scheme TEXT,
+    proxy_host TEXT,
+    proxy_port INTEGER,
+    platform TEXT,
+    chrome_version TEXT,
+    fingerprint TEXT,
+    config_ini TEXT,
+    tools_extension_url TEXT,
+    updated_at REAL
+);
+CREATE INDEX IF NOT EXISTS idx_profiles_proxy ON profiles (proxy_host, proxy_port);
+CREATE INDEX IF NOT EXISTS idx_profiles_tools_url ON profiles (tools_extension_url);
+CREATE TABLE IF NOT EXISTS extensions (
+    project TEXT NOT NULL,
+    name TEXT NOT NULL,
+    extension_id TEXT,
+    url TEXT,
+    updated_at REAL,
+    PRIMARY KEY (project, name)
+);
+"""
+
+
+class ProfileRegistry:
+    def __init__(self, db_path: Optional[str] = None) -> None:
+        self.db_path = db_path or os.path.join(get_a9tools_home(), "registry.db")
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(
+            self.db_path, timeout=30, check_same_thread=False, isolation_level=None
+        )
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+
+    def _execute(self, sql: str, params=()) -> sqlite3.Cursor:
+        with self._lock:
+            return self._conn.execute(sql, params)
+
+    def close(self) -> None:
+        self._conn.close()
+
+    def save_profile(
+        self,
+        user_data_path: str,
+        fingerprint: dict,
+        config_ini: Optional[str] = None,
+    ) -> None:
+        """
+        写入/更新账号的指纹和启动配置，不会覆盖已保存的插件地址
+        """
+        self._execute(
+            """
+            INSERT INTO profiles (
+                user_data_path, proxy_scheme, proxy_host, proxy_port, platform,
+                chrome_version, fingerprint, config_ini, updated_at
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (user_data_path) DO UPDATE SET
+                proxy_scheme = excluded.proxy_scheme,
+                proxy_host = excluded.proxy_host,
+                proxy_port = excluded.proxy_port,
+                platform = excluded.platform,
+                chrome_version = excluded.chrome_version,
+                fingerprint = excluded.fingerprint,
+                config_ini = COALESCE(excluded.config_ini, profiles.config_ini),
+                updated_at = excluded.updated_at
+            """,
+            (
+                os.path.abspath(user_data_path),
+                fingerprint.get("proxy_scheme"),
+                fingerprint.get("proxy_host"),
+                fingerprint.get("proxy_port"),
+                fingerprint.get("platform"),
+                fingerprint.get("chrome_version"),
+                json.dumps(fingerprint),
+                config_ini,
+                time.time(),
+            ),
+        )
+
+    def get_profile(self, user_data_path: str) -> Optional[dict]:
+        row = self._execute(
+            "SELECT * FROM profiles WHERE user_data_path = ?",
+            (os.path.abspath(user_data_path),),
+        ).fetchone()
+        if not row:
+            return None
+        data = dict(row)
+        data["fingerprint"] = json.loads(data["fingerprint"] or "{}")
+        return data
+
+    def save_tools_extension_url(self, user_data_path: str, url: str) -> None:
+        self._execute(
+            """
+            INSERT INTO profiles (user_data_path, tools_extension_url, updated_at)
+            VALUES (?, ?, ?)
+            ON CONFLICT (user_data_path) DO UPDATE SET
+                tools_extension_url = excluded.tools_extension_url,
+                updated_at = excluded.updated_at
+            """,
+            (os.path.abspath(user_data_path), url, time.time()),
+        )
+
+    def get_tools_extension_url(self, user_data_path: str) -> Optional[str]:
+        row = self._execute(
+            "SELECT tools_extension_url FROM profiles WHERE user_data_path = ?",
+            (os.path.abspath(user_data_path),),
+        ).fetchone()
+        return row[0] if row else None
+
+    def profiles_by_proxy(self, host: str, port: Optional[int] = None) -> List[str]:
+        """
+        使用指定代理的账号
+        """
+        if port is None:
+            rows = self._execute(
+                "SELECT user_data_path FROM profiles WHERE proxy_host = ?", (host,)
+            )
+        else:
+            rows = self._execute(
+                "SELECT user_data_path FROM profiles"
+                " WHERE proxy_host = ? AND proxy_port = ?",
+                (host, port),
+            )
+        return [r[0] for r in rows]
+
+    def profiles_without_tools_url(self) -> List[str]:
+        """
+        还没有保存指纹插件地址的账号
+        """
+        rows = self._execute(
+            "SELECT user_data_path FROM profiles WHERE tools_extension_url IS NULL"
+        )
+        return [r[0] for r in rows]
+
+    def all_profiles(self) -> List[str]:
+        return [r[0] for r in self._execute("SELECT user_data_path FROM profiles")]
+
+    def save_extension(
+        self,
+        name: str,
+        extension_id: Optional[str] = None,
+        url: Optional[str] = None,
+        project: Optional[str] = None,
+    ) -> None:
+        """
+        保存插件 id/地址，例如 MetaMask
+        未打包插件的 id 由插件目录决定，所以按项目目录(默认当前目录)分别保存
+        """
+        self._execute(
+            """
+            INSERT INTO extensions (project, name, extension_id, url, updated_at)
+            VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT (project, name) DO UPDATE SET
+                extension_id = COALESCE(excluded.extension_id, extensions.extension_id),
+                url = COALESCE(excluded.url, extensions.url),
+                updated_at = excluded.updated_at
+            """,
+            (_project(project), name, extension_id, url, time.time()),
+        )
+
+    def get_extension(self, name: str, project: Optional[str] = None) -> Optional[dict]:
+        row = self._execute(
+            "SELECT * FROM extensions WHERE project = ? AND name = ?",
+            (_project(project), name),
+        ).fetchone()
+        return dict(row) if row else None
+
+    def import_directory(self, user_data_path: str) -> bool:
+        """
+        从账号目录下的文件导入，目录下没有 fingerprint.json 时跳过
+        """
+        fp_path = os.path.join(user_data_path, "fingerprint.json")
+        if not os.path.exists(fp_path):
+            return False
+        with open(fp_path, "r") as f:
+            fingerprint = json.load(f)
+        config_ini = None
+        ini_path = os.path.join(user_data_path, "config.ini")
+        if os.path.exists(ini_path):
+            with open(ini_path, "r") as f:
+                config_ini = f.read()
+        self.save_profile(user_data_path, fingerprint, config_ini)
+        url_path = os.path.join(user_data_path, "tools_extension_url")
+        if os.path.exists(url_path):
+            with open(url_path, "r") as f:
+                self.save_tools_extension_url(user_data_path, f.read())
+        return True
+
+    def import_directories(self, root: str) -> int:
+        """
+        一次性导入 root 下所有账号目录(root 本身及其子目录)
+        """
+        count = 0
+        candidates = [root] + [
+            os.path.join(root, name)
+            for name in os.listdir(root)
+            if os.path.isdir(os.path.join(root, name))
+        ]
+        with self._lock:
+            self._conn.execute("BEGIN")
+        try:
+            for path in candidates:
+                try:
+                    count += self.import_directory(path)
+                except (OSError, ValueError) as e:
+                    logger.error(f"导入失败 {path} {e}")
+        finally:
+            with self._lock:
+                self._conn.execute("COMMIT")
+        return count
+
+    def import_extension_files(self, directory: str = ".") -> int:
+        """
+        导入 directory 下的 *.id/*.url 插件文件，例如 MetaMask.id
+        """
+        count = 0
+        for name in os.listdir(directory):
+            base, ext = os.path.splitext(name)
+            if ext not in (".id", ".url"):
+                continue
+            with open(os.path.join(directory, name), "r") as f:
+                value = f.read().strip()
+            if ext == ".id":
+                self.save_extension(base, extension_id=value, project=directory)
+            else:
+                self.save_extension(base, url=value, project=directory)
+            count += 1
+        return count
+
+
+def _project(project: Optional[str]) -> str:
+    return os.path.realpath(project or os.getcwd())
+
+
+@lru_cache(maxsize=None)
+def _registry(db_path: str) -> ProfileRegistry:
+    return ProfileRegistry(db_path)
+
+
+def get_registry() -> Optional[ProfileRegistry]:
+    """
+    进程内共享的索引，关闭或打开失败时返回 None，调用方退回到文件
+    """
+    setting = os.environ.get("A9TOOLS_REGISTRY", "")
+    if setting.lower() == "off":
+        return None
+    db_path = setting or os.path.join(get_a9tools_home(), "registry.db")
+    try:
+        return _registry(db_path)
+    except sqlite3.Error as e:
+        logger.warning(f"打开账号索引失败 {db_path} {e}")
+        return None
+
+
+def _cli_registry() -> ProfileRegistry:
+    registry = get_registry()
+    if registry is None:
+        raise SystemExit("账号索引已关闭或无法打开")
+    return registry
+
+
+@app.command("import")
+def import_(root: str, extension_dir: str = "."):
+    """
+    导入 root 下已有的账号目录和 extension_dir 下的插件 id 文件
+    """
+    registry = _cli_registry()
+    count = registry.import_directories(root)
+    ext_count = registry.import_extension_files(extension_dir)
+    logger.success(f"导入账号 {count} 个，插件 {ext_count} 个")
+
+
+@app.command("proxy")
+def proxy(host: str, port: Optional[int] = None):
+    """
+    查询使用指定代理的账号
+    """
+    registry = _cli_registry()
+    for path in registry.profiles_by_proxy(host, port):
+        print(path)
+
+
+@app.command("missing-tools-url")
+def missing_tools_url():
+    """
+    查询没有保存指纹插件地址的账号
+    """
+    registry = _cli_registry()
+    for path in registry.profiles_without_tools_url():
+        print(path)
+
+
+if __name__ == "__main__":
+    app()
@@ -0,0 +1,225 @@
+"""
+基于 CDP Target 事件的标签页监听
+
+订阅浏览器的 Target.targetCreated/targetInfoChanged/targetDestroyed，
+新标签出现的同时唤醒等待方，不需要轮询。
+通过 page.new_tab 自己打开的标签会自动标记为已使用，wait 只返回页面触发的弹窗。
+"""
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+from .log import logger
+
+PAGE_TYPES = ("page",)
+# ChromiumPage 上保存监听的属性，重新连接常驻浏览器时 DrissionPage 返回同一个对象
+WATCHER_ATTR = "_a9tools_tab_watcher"
+
+
+class TabWatcher:
+    def __init__(self, page, lookback: float = 1.0) -> None:
+        """
+        page: ChromiumPage
+        lookback: wait 时也接受调用前 lookback 秒内打开、还未被取走的标签，
+            避免点击按钮和开始等待之间弹窗已经打开导致漏掉
+        同一个 page 只能创建一次，否则 new_tab 和事件回调会被重复包装，使用 for_page
+        """
+        if getattr(page, WATCHER_ATTR, None) is not None:
+            raise Exception("该页面已有 TabWatcher，使用 TabWatcher.for_page")
+        self.page = page
+        self.lookback = lookback
+        self._cond = threading.Condition()
+        # target_id -> targetInfo，额外记录 _created 出现时间
+        self._targets: Dict[str, dict] = {}
+        self._claimed = set()
+        # 正在执行的 page.new_tab 数量，期间新出现的标签可能是自己打开的，wait 先不取
+        self._opening = 0
+        self._wrap_new_tab()
+        self._evented = self._subscribe()
+        self._refresh(initial=True)
+        setattr(page, WATCHER_ATTR, self)
+
+    @classmethod
+    def for_page(cls, page, lookback: float = 1.0) -> "TabWatcher":
+        """
+        page 已有监听时同步一次 target 后复用，没有时创建
+        """
+        watcher = getattr(page, WATCHER_ATTR, None)
+        if watcher is None:
+            return cls(page, lookback)
+        watcher._refresh(initial=True)
+        return watcher
+
+    def _subscribe(self) -> bool:
+        """
+        在 DrissionPage 浏览器连接上追加事件回调，保留原有回调
+        不支持时退回到轮询 Target.getTargets
+        """
+        try:
+            driver = self.page.browser._driver
+            handlers = driver.event_handlers
+            for event, callback in (
+                ("Target.targetCreated", self._on_created),
+                ("Target.targetInfoChanged", self._on_changed),
+                ("Target.targetDestroyed", self._on_destroyed),
+            ):
+                driver.set_callback(event, _chain(handlers.get(event), callback))
+            self.page.browser.run_cdp("Target.setDiscoverTargets", discover=True)
+            return True
+        except Exception as e:
+            logger.warning(f"无法订阅 Target 事件，使用轮询 {e}")
+            return False
+
+    def _wrap_new_tab(self) -> None:
+        """
+        包装 page.new_tab，打开的标签直接标记为已使用
+        """
+        new_tab = self.page.new_tab
+
+        def wrapper(*args, **kwargs):
+            with self._cond:
+                self._opening += 1
+            tab = None
+            try:
+                tab = new_tab(*args, **kwargs)
+                return tab
+            finally:
+                with self._cond:
+                    if tab is not None:
+                        self._claimed.add(tab.tab_id)
+                    self._opening -= 1
+                    self._cond.notify_all()
+
+        self.page.new_tab = wrapper
+
+    def _refresh(self, initial: bool = False) -> None:
+        """
+        同步一次当前所有 target
+        """
+        infos = self.page.browser.run_cdp("Target.getTargets").get("targetInfos", [])
+        alive = set()
+        with self._cond:
+            for info in infos:
+                alive.add(info["targetId"])
+                self._update(info, created=0 if initial else time.time())
+            for target_id in list(self._targets):
+                if target_id not in alive:
+                    self._targets.pop(target_id, None)
+            self._cond.notify_all()
+
+    def _update(self, info: dict, created: float) -> None:
+        target_id = info["targetId"]
+        old = self._targets.get(target_id)
+        info = dict(info, _created=old["_created"] if old else created)
+        self._targets[target_id] = info
+
+    def _on_created(self, **kwargs) -> None:
+        with self._cond:
+            self._update(kwargs["targetInfo"], created=time.time())
+            self._cond.notify_all()
+
+    def _on_changed(self, **kwargs) -> None:
+        with self._cond:
+            self._update(kwargs["targetInfo"], created=time.time())
+            self._cond.notify_all()
+
+    def _on_destroyed(self, **kwargs) -> None:
+        with self._cond:
+            self._targets.pop(kwargs.get("targetId"), None)
+            self._claimed.discard(kwargs.get("targetId"))
+
+    @staticmethod
+    def _match(
+        info: dict,
+        url: Optional[str],
+        title: Optional[str],
+        extension_id: Optional[str],
+    ) -> bool:
+        if info.get("type") not in PAGE_TYPES:
+            return False
+        if url and url not in info.get("url", ""):
+            return False
+        if title and title not in info.get("title", ""):
+            return False
+        if extension_id and not info.get("url", "").startswith(
+            f"chrome-extension://{extension_id}/"
+        ):
+            return False
+        return True
+
+    def find(
+        self,
+        url: Optional[str] = None,
+        title: Optional[str] = None,
+        extension_id: Optional[str] = None,
+    ) -> Optional[str]:
+        """
+        在当前打开的标签中查找，返回 target id
+        """
+        if not self._evented:
+            self._refresh()
+        with self._cond:
+            for target_id, info in self._targets.items():
+                if self._match(info, url, title, extension_id):
+                    return target_id
+        return None
+
+    def claim(self, target_id: str) -> None:
+        """
+        标记为已使用，之后的 wait 不会再返回该标签，例如自己打开的标签
+        """
+        with self._cond:
+            self._claimed.add(target_id)
+
+    def wait(
+        self,
+        url: Optional[str] = None,
+        title: Optional[str] = None,
+        extension_id: Optional[str] = None,
+        timeout: float = 10,
+    ) -> Optional[str]:
+        """
+        等待符合条件的新标签，返回 target id，超时返回 None
+        url/title: 包含即可
+        extension_id: 插件页面，例如 MetaMask 的签名弹窗
+        """
+        since = time.time() - self.lookback
+        deadline = time.perf_counter() + timeout
+        with self._cond:
+            while True:
+                for target_id, info in self._targets.items():
+                    if self._opening:
+                        break
+                    if (
+                        target_id not in self._claimed
+                        and target_id != self.page.tab_id
+                        and info["_created"] >= since
+                        and self._match(info, url, title, extension_id)
+                    ):
+                        self._claimed.add(target_id)
+                        return target_id
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    return None
+                if self._evented:
+                    self._cond.wait(remaining)
+                else:
+                    self._cond.release()
+                    try:
+                        time.sleep(min(0.1, remaining))
+                        self._refresh()
+                    finally:
+                        self._cond.acquire()
+
+
+def _chain(old: Optional[Callable], new: Callable) -> Callable:
+    if not old:
+        return new
+
+    def callback(**kwargs):
+        try:
+            old(**kwargs)
+        finally:
+            new(**kwargs)
+
+    return callback
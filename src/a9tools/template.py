@@ -0,0 +1,208 @@
+"""
+模板浏览器数据目录
+
+先用一个已经完成首次启动(建好数据库、装好插件)、没有登录任何账号的目录做快照，
+新账号直接从模板复制，不再每个账号都跑一遍 Chrome 首次启动。
+复制优先使用写时复制(macOS clonefile、Linux reflink)，不支持时插件目录用硬链接，
+其余文件普通复制。复制完成后由 HandlerBase 为每个账号生成自己的 fingerprint.json/config.ini。
+"""
+import ctypes
+import ctypes.util
+import os
+import shutil
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Type
+
+from typer import Typer
+
+from .log import logger
+
+app = Typer()
+
+# 账号自己的文件，不进入模板
+PROFILE_FILES = {
+    "config.ini",
+    "fingerprint.json",
+    "tools_extension_url",
+    ".a9tools.lock",
+    "SingletonLock",
+    "SingletonSocket",
+    "SingletonCookie",
+    "lockfile",
+    "Cookies",
+    "Cookies-journal",
+    "Login Data",
+    "Login Data-journal",
+    "Login Data For Account",
+    "Login Data For Account-journal",
+    "History",
+    "History-journal",
+    "Sessions",
+    "Session Storage",
+    "Current Session",
+    "Current Tabs",
+    "Last Session",
+    "Last Tabs",
+}
+
+# 可以重新生成的缓存，模板和压缩都会跳过/清理
+CACHE_DIRS = {
+    "Cache",
+    "Code Cache",
+    "GPUCache",
+    "GrShaderCache",
+    "GraphiteDawnCache",
+    "ShaderCache",
+    "DawnCache",
+    "DawnGraphiteCache",
+    "DawnWebGPUCache",
+    "Crashpad",
+    "Crash Reports",
+    "component_crx_cache",
+    "optimization_guide_model_store",
+    "BrowserMetrics",
+}
+
+# 插件代码目录，Chrome 只读不写，可以安全地硬链接
+HARDLINK_DIRS = {"Extensions"}
+
+FICLONE = 0x40049409
+
+_clone_supported: Optional[bool] = None
+
+
+def _ignore(directory: str, names: List[str]) -> List[str]:
+    return [n for n in names if n in PROFILE_FILES or n in CACHE_DIRS]
+
+
+def snapshot_template(source: str, template: str) -> None:
+    """
+    从一个已初始化的浏览器数据目录生成模板
+    source 对应的浏览器必须已经关闭
+    """
+    if os.path.lexists(os.path.join(source, "SingletonLock")):
+        raise Exception(f"浏览器正在使用该目录，请先关闭 {source}")
+    if os.path.exists(template):
+        shutil.rmtree(template)
+    shutil.copytree(source, template, ignore=_ignore, symlinks=True)
+    logger.success(f"生成模板 {template}")
+
+
+def _clonefile_darwin(src: str, dst: str) -> bool:
+    libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+    return libc.clonefile(src.encode(), dst.encode(), 0) == 0
+
+
+def _reflink_linux(src: str, dst: str) -> bool:
+    import fcntl
+
+    with open(src, "rb") as fs, open(dst, "wb") as fd:
+        try:
+            fcntl.ioctl(fd.fileno(), FICLONE, fs.fileno())
+        except OSError:
+            return False
+    shutil.copystat(src, dst)
+    return True
+
+
+def _copy_file(src: str, dst: str, hardlink: bool) -> None:
+    global _clone_supported
+    if sys.platform.startswith("linux") and _clone_supported is not False:
+        ok = _reflink_linux(src, dst)
+        if _clone_supported is None:
+            _clone_supported = ok
+        if ok:
+            return
+        os.remove(dst)
+    if hardlink:
+        try:
+            os.link(src, dst)
+            return
+        except OSError:
+            pass
+    shutil.copy2(src, dst)
+
+
+def _copy_tree(src: str, dst: str, hardlink: bool = False) -> None:
+    os.makedirs(dst, exist_ok=True)
+    for entry in os.scandir(src):
+        target = os.path.join(dst, entry.name)
+        if entry.is_symlink():
+            os.symlink(os.readlink(entry.path), target)
+        elif entry.is_dir():
+            _copy_tree(entry.path, target, hardlink or entry.name in HARDLINK_DIRS)
+        else:
+            _copy_file(entry.path, target, hardlink)
+
+
+def clone_template(template: str, user_data_path: str) -> None:
+    """
+    从模板复制出新的浏览器数据目录，user_data_path 必须不存在或为空
+    """
+    if os.path.isdir(user_data_path) and os.listdir(user_data_path):
+        raise Exception(f"浏览器数据目录不为空 {user_data_path}")
+    if os.path.isdir(user_data_path):
+        os.rmdir(user_data_path)
+    parent = os.path.dirname(os.path.abspath(user_data_path))
+    os.makedirs(parent, exist_ok=True)
+    # macOS APFS 上 clonefile 可以一次克隆整个目录
+    if sys.platform == "darwin":
+        try:
+            if _clonefile_darwin(template, user_data_path):
+                return
+        except (OSError, AttributeError):
+            pass
+    _copy_tree(template, user_data_path)
+
+
+def create_profiles(
+    handler_cls: Type,
+    wallet_info_paths: List[str],
+    template: str,
+    workers: int = 8,
+) -> int:
+    """
+    批量从模板创建账号目录并生成各自的指纹和启动配置，不启动浏览器
+    """
+
+    def create(path: str) -> bool:
+        try:
+            handler = handler_cls(path, template_path=template)
+            handler.finish()
+            return True
+        except Exception as e:
+            logger.error(f"创建失败 {path} {e}")
+            return False
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        count = sum(pool.map(create, wallet_info_paths))
+    logger.success(
+        f"创建 {count}/{len(wallet_info_paths)} 个账号，"
+        f"耗时 {time.perf_counter() - start:.1f}s"
+    )
+    return count
+
+
+@app.command("snapshot")
+def snapshot(source: str, template: str):
+    """
+    从已初始化的浏览器数据目录生成模板
+    """
+    snapshot_template(source, template)
+
+
+@app.command("create")
+def create(handler: str, source: str, template: str, workers: int = 8):
+    """
+    为 source 中的所有账号从模板创建浏览器数据目录
+    """
+    from .fleet import load_manifest, resolve_handler
+
+    create_profiles(resolve_handler(handler), load_manifest(source), template, workers)
+
+
+if __name__ == "__main__":
+    app()
@@ -0,0 +1,301 @@
+"""
+按历史耗时自适应的元素等待时间
+
+按 (网站, 步骤, 选择器) 记录元素出现所需的时间，等待时间取高分位数乘以余量，
+经常出现的元素很快就能判定不存在，不再统一等满 5 秒。未出现的次数单独记录，不计入耗时:
+偶尔未出现(页面变慢)时等待时间放宽一档，经常不出现的可选元素保持原来的等待时间。
+数据保存在 A9TOOLS_HOME/timeouts.json，多个进程同时运行时保存前先合并文件中已有的数据。
+
+整个流程可以再加一个总的截止时间，超过以后等待直接失败:
+
+    with flow_deadline(120):
+        handler.twitter_click_like(tab)
+"""
+import atexit
+import contextvars
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Tuple
+from urllib.parse import urlparse
+
+from .exception import AirDropException
+from .log import logger
+from .probe import DomState, wait_any
+from .utils import get_a9tools_home
+
+_deadline: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar(
+    "a9tools_flow_deadline", default=None
+)
+
+
+class FlowTimeout(AirDropException):
+    def __init__(self, info: str):
+        super().__init__("FlowTimeout")
+        self.info = info
+
+    def __repr__(self):
+        return f"{self.name}: {self.info}"
+
+
+@contextmanager
+def flow_deadline(seconds: float):
+    """
+    整个流程的截止时间，嵌套时取更早的一个
+    """
+    deadline = time.perf_counter() + seconds
+    current = _deadline.get()
+    if current is not None:
+        deadline = min(deadline, current)
+    token = _deadline.set(deadline)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def remaining_time() -> Optional[float]:
+    """流程剩余时间，没有设置截止时间返回 None"""
+    deadline = _deadline.get()
+    if deadline is None:
+        return None
+    return deadline - time.perf_counter()
+
+
+def _site(tab) -> str:
+    try:
+        return urlparse(tab.url).netloc
+    except Exception:
+        return ""
+
+
+class AdaptiveTimeouts:
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        quantile: float = 0.95,
+        margin: float = 1.5,
+        default: float = 5,
+        min_timeout: float = 0.5,
+        max_timeout: float = 30,
+        min_samples: int = 5,
+        max_samples: int = 200,
+        miss_window: int = 20,
+        widen_below: float = 0.5,
+    ) -> None:
+        """
+        quantile/margin: 等待时间 = 耗时分位数 * margin
+        min_samples: 样本数不足时使用 default
+        max_samples: 每个选择器只保留最近的样本
+        miss_window: 按最近多少次等待计算未出现的比例
+        widen_below: 未出现的比例大于 0 且低于该值时，等待时间放宽为 2 倍
+        """
+        self.path = path or os.path.join(get_a9tools_home(), "timeouts.json")
+        self.quantile = quantile
+        self.margin = margin
+        self.default = default
+        self.min_timeout = min_timeout
+        self.max_timeout = max_timeout
+        self.min_samples = min_samples
+        self.max_samples = max_samples
+        self.miss_window = miss_window
+        self.widen_below = widen_below
+        self._lock = threading.Lock()
+        data = self._read()
+        # 出现的耗时(秒)
+        self.samples: Dict[str, List[float]] = data["samples"]
+        # 最近的等待结果，1 表示未出现
+        self.outcomes: Dict[str, List[int]] = data["outcomes"]
+        # 本进程新增、还没有保存的数据
+        self._pending: Dict[str, List[float]] = {}
+        self._pending_outcomes: Dict[str, List[int]] = {}
+
+    @staticmethod
+    def key(site: str, step: str, selector: str) -> str:
+        return f"{site}|{step}|{selector}"
+
+    def _read(self) -> dict:
+        data = {}
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, "r") as f:
+                    data = json.load(f)
+            except (OSError, ValueError):
+                pass
+        return {
+            "samples": data.get("samples", {}),
+            "outcomes": data.get("outcomes", {}),
+        }
+
+    def _outcome(self, key: str, missed: bool) -> None:
+        outcomes = self.outcomes.setdefault(key, [])
+        outcomes.append(int(missed))
+        del outcomes[: -self.miss_window]
+        self._pending_outcomes.setdefault(key, []).append(int(missed))
+
+    def record(self, site: str, step: str, selector: str, seconds: float) -> None:
+        """
+        记录一次元素出现的耗时
+        """
+        key = self.key(site, step, selector)
+        with self._lock:
+            samples = self.samples.setdefault(key, [])
+            samples.append(round(seconds, 3))
+            del samples[: -self.max_samples]
+            self._pending.setdefault(key, []).append(round(seconds, 3))
+            self._outcome(key, False)
+
+    def record_miss(self, site: str, step: str, selector: str) -> None:
+        """
+        记录一次等满等待时间仍未出现，只计入未出现的比例，不作为耗时样本
+        """
+        with self._lock:
+            self._outcome(self.key(site, step, selector), True)
+
+    def miss_rate(self, site: str, step: str, selector: str) -> float:
+        """最近 miss_window 次等待中未出现的比例"""
+        with self._lock:
+            outcomes = self.outcomes.get(self.key(site, step, selector), [])
+            return sum(outcomes) / len(outcomes) if outcomes else 0.0
+
+    def _learned(self, site: str, step: str, selector: str) -> float:
+        """
+        按历史耗时得到的等待时间，不考虑流程剩余时间
+        样本不足时使用 default；偶尔未出现时放宽为分位数的 2 倍，只放宽这一档，
+        经常不出现的元素仍按出现时的耗时快速判定
+        """
+        rate = self.miss_rate(site, step, selector)
+        with self._lock:
+            samples = self.samples.get(self.key(site, step, selector), [])
+            if len(samples) < self.min_samples:
+                value = self.default
+            else:
+                ordered = sorted(samples)
+                index = min(len(ordered) - 1, int(self.quantile * len(ordered)))
+                value = ordered[index] * self.margin
+                if 0 < rate < self.widen_below:
+                    value *= 2
+        return min(max(value, self.min_timeout), self.max_timeout)
+
+    @staticmethod
+    def _bounded(value: float, step: str, selector) -> float:
+        remaining = remaining_time()
+        if remaining is not None:
+            if remaining <= 0:
+                raise FlowTimeout(f"流程超时 {step} {selector}")
+            value = min(value, remaining)
+        return value
+
+    def timeout(self, site: str, step: str, selector: str) -> float:
+        """
+        该选择器的等待时间，会被流程剩余时间截断
+        """
+        return self._bounded(self._learned(site, step, selector), step, selector)
+
+    def wait_any(
+        self,
+        tab,
+        selectors: Iterable[str],
+        step: str,
+        timeout: Optional[float] = None,
+    ) -> DomState:
+        """
+        同 a9tools.probe.wait_any，等待时间取各选择器中最长的一个，
+        并记录第一个出现的元素的耗时
+        """
+        selectors = list(selectors)
+        site = _site(tab)
+        learned = None
+        if timeout is None:
+            learned = max(self._learned(site, step, s) for s in selectors)
+            timeout = self._bounded(learned, step, selectors)
+        start = time.perf_counter()
+        state = wait_any(tab, selectors, timeout)
+        first = state.first_visible(selectors)
+        if first:
+            self.record(site, step, first, time.perf_counter() - start)
+            return state
+        logger.debug(f"{step} 等待 {timeout:.1f}s 未出现 {selectors}")
+        self._record_misses(site, step, selectors, learned, timeout)
+        return state
+
+    def _record_misses(
+        self,
+        site: str,
+        step: str,
+        selectors: List[str],
+        learned: Optional[float],
+        timeout: float,
+    ) -> None:
+        """
+        调用方指定的等待时间、被流程剩余时间截断的等待不代表页面耗时，不记录
+        """
+        if learned is None or timeout < learned:
+            return
+        for selector in selectors:
+            self.record_miss(site, step, selector)
+
+    def ele(self, tab, locator: str, step: str, timeout: Optional[float] = None):
+        """
+        tab.ele 的自适应版本，未找到时返回 DrissionPage 的 NoneElement
+        """
+        site = _site(tab)
+        learned = None
+        if timeout is None:
+            learned = self._learned(site, step, locator)
+            timeout = self._bounded(learned, step, locator)
+        start = time.perf_counter()
+        ele = tab.ele(locator, timeout=timeout)
+        if ele:
+            self.record(site, step, locator, time.perf_counter() - start)
+        else:
+            self._record_misses(site, step, [locator], learned, timeout)
+        return ele
+
+    def save(self) -> None:
+        """
+        合并文件中其他进程写入的样本后保存
+        """
+        with self._lock:
+            if not self._pending and not self._pending_outcomes:
+                return
+            data = self._read()
+            samples, outcomes = data["samples"], data["outcomes"]
+            for key, values in self._pending.items():
+                samples[key] = (samples.get(key, []) + values)[-self.max_samples :]
+            for key, values in self._pending_outcomes.items():
+                outcomes[key] = (outcomes.get(key, []) + values)[-self.miss_window :]
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            tmp = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp, "w") as f:
+                json.dump(data, f)
+            os.replace(tmp, self.path)
+            self.samples = samples
+            self.outcomes = outcomes
+            self._pending.clear()
+            self._pending_outcomes.clear()
+
+    def stats(self) -> List[Tuple[str, int, float]]:
+        """
+        (key, 样本数, 当前等待时间)
+        """
+        result = []
+        for key in sorted(self.samples):
+            site, step, selector = key.split("|", 2)
+            result.append(
+                (key, len(self.samples[key]), self.timeout(site, step, selector))
+            )
+        return result
+
+
+@lru_cache(maxsize=None)
+def get_timeouts() -> AdaptiveTimeouts:
+    """
+    进程内共享，退出时自动保存
+    """
+    timeouts = AdaptiveTimeouts()
+    atexit.register(timeouts.save)
+    return timeouts
@@ -0,0 +1,172 @@
+"""
+user agent 目录
+
+fake_useragent 每次构造 UserAgent 都会重新读取并过滤整个数据集，
+这里进程内只过滤一次，之后按系统/版本分组随机取，可选保存到本地索引文件，
+下个进程直接读取过滤好的结果。
+"""
+import json
+import os
+import random
+from collections import defaultdict
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+from .log import logger
+from .utils import get_a9tools_home
+
+# 与 fake_useragent 一致，数据集中 windows 的 os 字段为 win10/win7
+OS_REPLACEMENTS = {"windows": ["win10", "win7"]}
+
+DEFAULT_BROWSERS = ("chrome",)
+DEFAULT_OS = ("macos", "windows")
+DEFAULT_MIN_VERSION = 120
+
+
+def _source_version() -> str:
+    try:
+        from importlib.metadata import version
+
+        return version("fake-useragent")
+    except Exception:
+        return ""
+
+
+class UserAgentCatalog:
+    def __init__(self, entries: List[dict], meta: Optional[dict] = None) -> None:
+        """
+        entries: fake_useragent 格式的数据 {"useragent", "version", "os", ...}
+        """
+        if not entries:
+            raise Exception("user agent 目录为空")
+        self.entries = entries
+        self.meta = meta or {}
+        self._by_os: Dict[str, List[dict]] = defaultdict(list)
+        self._by_key: Dict[Tuple[str, int], List[dict]] = defaultdict(list)
+        for entry in entries:
+            os_name = entry.get("os", "")
+            self._by_os[os_name].append(entry)
+            self._by_key[(os_name, int(float(entry.get("version", 0))))].append(
+                entry
+            )
+
+    @classmethod
+    def build(
+        cls,
+        browsers=DEFAULT_BROWSERS,
+        os_list=DEFAULT_OS,
+        min_version: float = DEFAULT_MIN_VERSION,
+    ) -> "UserAgentCatalog":
+        """
+        从 fake_useragent 的数据集过滤
+        """
+        from fake_useragent.utils import load
+
+        os_names = set()
+        for name in os_list:
+            os_names.update(OS_REPLACEMENTS.get(name, [name]))
+        entries = [
+            {
+                "useragent": item["useragent"],
+                "version": item["version"],
+                "os": item["os"],
+                "browser": item["browser"],
+            }
+            for item in load()
+            if item.get("browser") in browsers
+            and item.get("os") in os_names
+            and float(item.get("version", 0)) >= min_version
+        ]
+        meta = {
+            "browsers": sorted(browsers),
+            "os": sorted(os_list),
+            "min_version": min_version,
+            "source_version": _source_version(),
+        }
+        logger.info(f"user agent 目录 {len(entries)} 条")
+        return cls(entries, meta)
+
+    def save(self, path: str) -> None:
+        """
+        保存为按 os|主版本号 分组的索引文件
+        """
+        index = {
+            f"{os_name}|{version}": [e["useragent"] for e in items]
+            for (os_name, version), items in self._by_key.items()
+        }
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w") as f:
+            json.dump({"meta": self.meta, "index": index}, f, separators=(",", ":"))
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: str) -> "UserAgentCatalog":
+        with open(path, "r") as f:
+            data = json.load(f)
+        entries = []
+        for key, agents in data["index"].items():
+            os_name, version = key.split("|")
+            entries.extend(
+                {"useragent": ua, "version": float(version), "os": os_name}
+                for ua in agents
+            )
+        return cls(entries, data.get("meta"))
+
+    def random(
+        self, os_name: Optional[str] = None, version: Optional[int] = None
+    ) -> dict:
+        """
+        随机取一条，格式与 UserAgent.getRandom 相同
+        os_name: macos/windows，不传则从全部中取
+        version: 主版本号
+        """
+        if os_name is None and version is None:
+            return random.choice(self.entries)
+        if os_name:
+            os_names = OS_REPLACEMENTS.get(os_name, [os_name])
+        else:
+            os_names = list(self._by_os)
+        if version is None:
+            pools = [self._by_os[name] for name in os_names if self._by_os.get(name)]
+        else:
+            pools = [
+                self._by_key[(name, version)]
+                for name in os_names
+                if self._by_key.get((name, version))
+            ]
+        if not pools:
+            raise Exception(f"没有符合条件的 user agent {os_name} {version}")
+        # 先按数量加权选分组，组内直接随机，保持与整体均匀随机一致
+        pool = random.choices(pools, weights=[len(p) for p in pools])[0]
+        return random.choice(pool)
+
+
+@lru_cache(maxsize=None)
+def get_catalog(
+    browsers=DEFAULT_BROWSERS,
+    os_list=DEFAULT_OS,
+    min_version: float = DEFAULT_MIN_VERSION,
+    persist: bool = True,
+) -> UserAgentCatalog:
+    """
+    进程内共享的 user agent 目录
+    persist: 读取/保存 A9TOOLS_HOME/useragents.json，数据集版本或过滤条件变化时重新生成
+    """
+    meta = {
+        "browsers": sorted(browsers),
+        "os": sorted(os_list),
+        "min_version": min_version,
+        "source_version": _source_version(),
+    }
+    path = os.path.join(get_a9tools_home(), "useragents.json")
+    if persist and os.path.exists(path):
+        try:
+            catalog = UserAgentCatalog.load(path)
+            if catalog.meta == meta:
+                return catalog
+        except Exception as e:
+            logger.warning(f"user agent 索引读取失败，重新生成 {e}")
+    catalog = UserAgentCatalog.build(browsers, os_list, min_version)
+    if persist:
+        catalog.save(path)
+    return catalog
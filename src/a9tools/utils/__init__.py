@@ -0,0 +1,83 @@
+import functools
+import os
+import socket
+import time
+
+from ..log import logger
+
+
+def get_2fa_code(key: str, min_remaining: float = 0) -> str:
+    """
+    获取 2fa 验证码，本地计算，不再请求 2fa.zone
+    min_remaining: 剩余有效时间不足该秒数时等待下一个验证码
+    """
+    from .totp import get_totp_code
+
+    try:
+        return get_totp_code(key, min_remaining)
+    except (ValueError, TypeError) as e:
+        logger.error(f"2fa 密钥格式错误 {e}")
+        return ""
+
+
+def log_execution_time(func):
+    """
+    打印函数耗时，同时记录到 a9tools.metrics
+    """
+    from ..metrics import metrics
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        start_time = time.time()
+        logger.info(f"Starting {func.__name__}()")
+        with metrics.span(func.__qualname__):
+            result = func(*args, **kwargs)
+        end_time = time.time()
+        execution_time = end_time - start_time
+        logger.info(f"Finished {func.__name__}()")
+        logger.info(f"Execution time: {execution_time:.2f} seconds")
+        return result
+
+    return wrapper
+
+
+def pid_alive(pid: int) -> bool:
+    """
+    判断进程是否存活
+    windows 上 os.kill 会直接结束进程，只能借助 psutil，没有安装时按存活处理
+    """
+    if pid <= 0:
+        return False
+    if os.name == "nt":
+        try:
+            import psutil
+        except ImportError:
+            return True
+        return psutil.pid_exists(pid)
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def port_in_use(port: int, host: str = "127.0.0.1") -> bool:
+    """
+    端口是否已被监听
+    """
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.settimeout(0.5)
+        return s.connect_ex((host, port)) == 0
+
+
+def get_a9tools_home() -> str:
+    """
+    a9tools 全局数据目录，可以通过环境变量 A9TOOLS_HOME 修改
+    """
+    home = os.environ.get("A9TOOLS_HOME") or os.path.join(
+        os.path.expanduser("~"), ".a9tools"
+    )
+    os.makedirs(home, exist_ok=True)
+    return home
@@ -1,10 +1,20 @@
 import json
+import multiprocessing
 import os
+from typing import Literal, Optional
+
 from eth_account import Account
-from eth_account.hdaccount import generate_mnemonic
+from eth_account.hdaccount import (
+    generate_mnemonic,
+    key_from_seed,
+    seed_from_mnemonic,
+)
 
 Account.enable_unaudited_hdwallet_features()
 
+# 进程池每次处理的账号数，每批提交的任务数为 CHUNK_SIZE * 进程数 * 4
+CHUNK_SIZE = 64
+
 
 def generate_accountdddddd(num=50, default_name="auto_wallet.json"):
     wallet_path = os.path.join("wallet", default_name)
@@ -30,6 +40,101 @@ def generate_accountdddddd(num=50, default_name="auto_wallet.json"):
         json.dump(wallets, f)
 
 
+ETH_PATH = "m/44'/60'/0'/0/{}"
+
+
+def _wallet_info(name: str, private_key, mnemonic: str, path: str = "") -> dict:
+    public_key = private_key.public_key
+    info = dict(
+        name=name,
+        private_key=str(private_key),
+        public_key=str(public_key),
+        address=str(public_key.to_checksum_address()),
+        mnemonic=mnemonic,
+    )
+    if path:
+        info["path"] = path
+    return info
+
+
+def _independent_account(args) -> dict:
+    """进程池中执行，每个账号单独的助记词"""
+    index, name_prefix = args
+    mnemonic = generate_mnemonic(num_words=12, lang="english")
+    account = Account.from_mnemonic(mnemonic)
+    return _wallet_info(f"{name_prefix}{index}", account._key_obj, mnemonic)
+
+
+def _resume(output: str) -> int:
+    """
+    已生成的账号数量，末尾写了一半的行直接截掉
+    """
+    if not os.path.exists(output):
+        return 0
+    with open(output, "rb+") as f:
+        data = f.read()
+        end = data.rfind(b"\n") + 1
+        if end != len(data):
+            f.truncate(end)
+    return data[:end].count(b"\n")
+
+
+def _first_mnemonic(output: str) -> str:
+    with open(output, "r") as f:
+        return json.loads(f.readline()).get("mnemonic", "")
+
+
+def generate_accounts_bulk(
+    num: int,
+    output: str = os.path.join("wallet", "auto_wallet.jsonl"),
+    mode: Literal["independent", "hd"] = "independent",
+    mnemonic: Optional[str] = None,
+    workers: Optional[int] = None,
+    name_prefix: str = "AutoAccount",
+) -> int:
+    """
+    批量生成钱包，每个账号一行 JSON 追加写入 output，内存占用不随数量增长
+    中断后再次执行会从已写入的数量继续
+    mode:
+        independent: 每个账号单独的助记词，使用进程池并行
+        hd: 所有账号由同一个助记词按 m/44'/60'/0'/0/i 派生，只计算一次种子
+    mnemonic: hd 模式使用的助记词，不传则新生成，续跑时读取文件第一行
+    返回本次生成的数量
+    """
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    start = _resume(output)
+    if start >= num:
+        return 0
+    written = 0
+    with open(output, "a") as f:
+        if mode == "hd":
+            if not mnemonic:
+                mnemonic = _first_mnemonic(output) if start else generate_seed_12()
+            seed = seed_from_mnemonic(mnemonic, "")
+            for i in range(start, num):
+                path = ETH_PATH.format(i)
+                account = Account.from_key(key_from_seed(seed, path))
+                info = _wallet_info(
+                    f"{name_prefix}{i}", account._key_obj, mnemonic, path
+                )
+                f.write(json.dumps(info) + "\n")
+                written += 1
+        else:
+            workers = workers or os.cpu_count() or 1
+            batch = CHUNK_SIZE * workers * 4
+            with multiprocessing.Pool(workers) as pool:
+                # 分批提交，队列中等待的任务和未写入的结果不随 num 增长
+                for offset in range(start, num, batch):
+                    end = min(offset + batch, num)
+                    args = [(i, name_prefix) for i in range(offset, end)]
+                    for info in pool.imap(
+                        _independent_account, args, chunksize=CHUNK_SIZE
+                    ):
+                        f.write(json.dumps(info) + "\n")
+                        written += 1
+    return written
+
+
 def evm_generate_account():
     seed = generate_mnemonic(num_words=12, lang="english")
     # logger.info(f"seed: {seed}")
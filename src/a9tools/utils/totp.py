@@ -0,0 +1,72 @@
+"""
+本地计算 RFC 6238 TOTP 验证码，代替请求 2fa.zone
+"""
+import base64
+import hashlib
+import hmac
+import struct
+import time
+from functools import lru_cache
+from typing import Dict, Iterable, Optional
+
+PERIOD = 30
+DIGITS = 6
+
+
+@lru_cache(maxsize=4096)
+def decode_secret(key: str) -> bytes:
+    """
+    解码 base32 密钥，忽略空格、大小写，补齐 =
+    """
+    key = key.replace(" ", "").replace("-", "").upper().rstrip("=")
+    key += "=" * (-len(key) % 8)
+    return base64.b32decode(key)
+
+
+@lru_cache(maxsize=4096)
+def _hotp(key: str, counter: int, digits: int) -> str:
+    # 同一个密钥同一个 30 秒窗口内只计算一次
+    digest = hmac.new(decode_secret(key), struct.pack(">Q", counter), hashlib.sha1)
+    digest = digest.digest()
+    offset = digest[-1] & 0x0F
+    code = struct.unpack(">I", digest[offset : offset + 4])[0] & 0x7FFFFFFF
+    return str(code % 10**digits).zfill(digits)
+
+
+def totp(key: str, at: Optional[float] = None, digits: int = DIGITS) -> str:
+    """
+    计算 at 时刻(默认当前)的验证码
+    """
+    at = time.time() if at is None else at
+    return _hotp(key, int(at // PERIOD), digits)
+
+
+def remaining_seconds(at: Optional[float] = None) -> float:
+    """
+    当前验证码剩余有效时间
+    """
+    at = time.time() if at is None else at
+    return PERIOD - at % PERIOD
+
+
+def _wait_window(min_remaining: float) -> None:
+    remaining = remaining_seconds()
+    if remaining < min_remaining:
+        time.sleep(remaining)
+
+
+def get_totp_code(key: str, min_remaining: float = 0) -> str:
+    """
+    min_remaining: 剩余有效时间不足该秒数时，等到下一个窗口再生成，避免输入时过期
+    """
+    _wait_window(min_remaining)
+    return totp(key)
+
+
+def get_totp_codes(keys: Iterable[str], min_remaining: float = 0) -> Dict[str, str]:
+    """
+    批量生成，所有验证码来自同一个窗口
+    """
+    _wait_window(min_remaining)
+    now = time.time()
+    return {key: totp(key, now) for key in keys}
@@ -0,0 +1,200 @@
+"""
+带索引的钱包文件
+
+钱包数据为 JSONL(每行一个钱包，generate_accounts_bulk 的输出格式)，
+旁边的 <文件>.idx 是 SQLite 索引，记录每行的偏移和地址、名称，
+按地址/名称查找只读一行，不需要加载整个文件。文件追加后自动补充索引，
+多个进程同时补充索引时通过 SQLite 写事务排队，不会重复写入。
+
+钱包信息文件中 wallet 可以直接引用:
+    {"wallet": {"store": "wallet/auto_wallet.jsonl", "address": "0x..."}, ...}
+"""
+import json
+import os
+import sqlite3
+import threading
+from functools import lru_cache
+from typing import Iterator, Optional
+
+from .model import WalletInfo
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS wallets (
+    row INTEGER PRIMARY KEY,
+    offset INTEGER NOT NULL,
+    address TEXT,
+    name TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_wallets_address ON wallets (address);
+CREATE INDEX IF NOT EXISTS idx_wallets_name ON wallets (name);
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER);
+"""
+
+
+class WalletStore:
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.index_path = f"{path}.idx"
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(
+            self.index_path, timeout=30, check_same_thread=False, isolation_level=None
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+        if not os.path.exists(path):
+            open(path, "a").close()
+        self.refresh()
+
+    def _indexed_bytes(self) -> int:
+        row = self._conn.execute(
+            "SELECT value FROM meta WHERE key = 'indexed_bytes'"
+        ).fetchone()
+        return row[0] if row else 0
+
+    def refresh(self) -> int:
+        """
+        为文件新增的行建立索引，文件被改写(变小)时重建，返回新增的行数
+        """
+        with self._lock:
+            # 先取得写锁再读取索引进度，其他进程同时补充索引时在这里等待
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                added = self._index_new_lines()
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+            return added
+
+    def _index_new_lines(self) -> int:
+        indexed = self._indexed_bytes()
+        if os.path.getsize(self.path) < indexed:
+            self._conn.execute("DELETE FROM wallets")
+            indexed = 0
+        row = self._conn.execute("SELECT COUNT(*) FROM wallets").fetchone()[0]
+        added = []
+        with open(self.path, "rb") as f:
+            f.seek(indexed)
+            offset = indexed
+            for line in f:
+                # 写了一半的行等下次补全以后再索引
+                if not line.endswith(b"\n"):
+                    break
+                if line.strip():
+                    data = json.loads(line)
+                    added.append(
+                        (
+                            row,
+                            offset,
+                            data.get("address", "").lower(),
+                            data.get("name", ""),
+                        )
+                    )
+                    row += 1
+                offset += len(line)
+        self._conn.executemany(
+            "INSERT INTO wallets (row, offset, address, name) VALUES (?, ?, ?, ?)",
+            added,
+        )
+        self._conn.execute(
+            "INSERT OR REPLACE INTO meta (key, value) VALUES ('indexed_bytes', ?)",
+            (offset,),
+        )
+        return len(added)
+
+    def _read(self, offset: int) -> WalletInfo:
+        with open(self.path, "rb") as f:
+            f.seek(offset)
+            return WalletInfo.model_validate(json.loads(f.readline()))
+
+    def _lookup(self, column: str, value: str) -> Optional[WalletInfo]:
+        sql = f"SELECT offset FROM wallets WHERE {column} = ? LIMIT 1"
+        with self._lock:
+            row = self._conn.execute(sql, (value,)).fetchone()
+        if not row:
+            # 可能是索引之后新写入的
+            if not self.refresh():
+                return None
+            with self._lock:
+                row = self._conn.execute(sql, (value,)).fetchone()
+            if not row:
+                return None
+        return self._read(row[0])
+
+    def get_by_address(self, address: str) -> Optional[WalletInfo]:
+        return self._lookup("address", address.lower())
+
+    def get_by_name(self, name: str) -> Optional[WalletInfo]:
+        return self._lookup("name", name)
+
+    def get(self, row: int) -> Optional[WalletInfo]:
+        """按行号(从 0 开始)获取"""
+        return self._lookup("row", row)
+
+    def iter_range(
+        self, start: int = 0, stop: Optional[int] = None
+    ) -> Iterator[WalletInfo]:
+        """
+        按行号顺序遍历 [start, stop)
+        """
+        sql = "SELECT offset FROM wallets WHERE row >= ?"
+        params = [start]
+        if stop is not None:
+            sql += " AND row < ?"
+            params.append(stop)
+        with self._lock:
+            rows = self._conn.execute(sql + " ORDER BY row", params)
+            offsets = [r[0] for r in rows]
+        with open(self.path, "rb") as f:
+            for offset in offsets:
+                f.seek(offset)
+                yield WalletInfo.model_validate(json.loads(f.readline()))
+
+    def append(self, wallet: WalletInfo | dict) -> None:
+        data = wallet.model_dump() if isinstance(wallet, WalletInfo) else wallet
+        with open(self.path, "a") as f:
+            f.write(json.dumps(data) + "\n")
+        self.refresh()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM wallets").fetchone()[0]
+
+    @classmethod
+    def from_json_array(cls, json_path: str, path: str) -> "WalletStore":
+        """
+        把 a9tools.utils.evm.generate_accountdddddd 生成的 JSON 数组文件
+        (默认 wallet/auto_wallet.json) 转换为 JSONL，
+        新生成的钱包可以直接用 generate_accounts_bulk 写入 JSONL
+        path 已存在时抛出 FileExistsError，避免重复导入
+        """
+        with open(json_path, "r") as f:
+            wallets = json.load(f)
+        with open(path, "x") as f:
+            for wallet in wallets:
+                f.write(json.dumps(wallet) + "\n")
+        return cls(path)
+
+
+@lru_cache(maxsize=None)
+def open_store(path: str) -> WalletStore:
+    """
+    进程内共享同一个文件的 WalletStore
+    """
+    return WalletStore(os.path.abspath(path))
+
+
+def resolve_wallet(ref: dict) -> WalletInfo:
+    """
+    解析钱包引用 {"store": 文件, "address"|"name": ...}
+    """
+    store = open_store(ref["store"])
+    if ref.get("address"):
+        wallet = store.get_by_address(ref["address"])
+    elif ref.get("name"):
+        wallet = store.get_by_name(ref["name"])
+    else:
+        raise ValueError("钱包引用需要 address 或 name")
+    if wallet is None:
+        raise ValueError(f"钱包文件中未找到 {ref}")
+    return wallet
@@ -0,0 +1,347 @@
+"""
+常驻浏览器缓存
+
+开启后 finish 不再关闭浏览器，同一个 user_data_path 下次 init_driver 时
+直接通过调试端口重新连接，省掉冷启动、加载插件、钱包 service worker 启动的时间。
+空闲的浏览器按最近使用时间(LRU)淘汰，可限制数量和总内存。
+
+每个常驻浏览器在 A9TOOLS_HOME/warm 下保存一个状态文件，多个进程可以共用。
+新浏览器的调试端口通过 port-<端口>.lock 文件(O_CREAT|O_EXCL)原子占用，
+多个 worker 同时启动时不会分到同一个端口。同一个 user_data_path 同样通过
+<目录哈希>.lock 文件占用，其他存活的进程正在使用时不会重复连接同一个浏览器。
+"""
+import hashlib
+import json
+import os
+import signal
+import time
+from itertools import count
+from typing import List, Optional
+
+from pydantic import BaseModel, Field
+from typer import Typer
+
+from .log import logger
+from .utils import get_a9tools_home, pid_alive, port_in_use
+
+app = Typer()
+
+
+class WarmBrowser(BaseModel):
+    user_data_path: str = Field(..., description="用户数据目录")
+    port: int = Field(..., description="调试端口")
+    pid: int = Field(default=0, description="浏览器进程 id")
+    last_used: float = Field(default=0, description="最后使用时间")
+    in_use: bool = Field(default=False, description="是否正在被任务使用")
+    owner: int = Field(default=0, description="正在使用的进程 id")
+
+
+class WarmBrowserPool:
+    def __init__(
+        self,
+        state_dir: Optional[str] = None,
+        max_browsers: int = 8,
+        max_memory_mb: int = 0,
+        base_port: int = 9500,
+    ) -> None:
+        """
+        state_dir: 状态文件目录，默认 A9TOOLS_HOME/warm
+        max_browsers: 最多保留的空闲浏览器数量
+        max_memory_mb: 所有常驻浏览器的内存上限，0 表示不限制，需要安装 psutil
+        base_port: 常驻浏览器调试端口起点
+        """
+        self.state_dir = state_dir or os.path.join(get_a9tools_home(), "warm")
+        self.max_browsers = max_browsers
+        self.max_memory_mb = max_memory_mb
+        self.base_port = base_port
+        os.makedirs(self.state_dir, exist_ok=True)
+
+    def _key(self, user_data_path: str) -> str:
+        return hashlib.sha1(os.path.abspath(user_data_path).encode()).hexdigest()
+
+    def _state_path(self, user_data_path: str) -> str:
+        return os.path.join(self.state_dir, f"{self._key(user_data_path)}.json")
+
+    def _claim_lock(self, user_data_path: str) -> str:
+        return os.path.join(self.state_dir, f"{self._key(user_data_path)}.lock")
+
+    def _load(self, user_data_path: str) -> Optional[WarmBrowser]:
+        try:
+            with open(self._state_path(user_data_path), "r") as f:
+                return WarmBrowser.model_validate(json.load(f))
+        except (OSError, ValueError):
+            return None
+
+    def _save(self, browser: WarmBrowser) -> None:
+        path = self._state_path(browser.user_data_path)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w") as f:
+            f.write(browser.model_dump_json())
+        os.replace(tmp, path)
+
+    def _remove(self, browser: WarmBrowser) -> None:
+        try:
+            os.remove(self._state_path(browser.user_data_path))
+        except FileNotFoundError:
+            pass
+        self.release_port(browser.port)
+
+    def _port_lock(self, port: int) -> str:
+        return os.path.join(self.state_dir, f"port-{port}.lock")
+
+    @staticmethod
+    def _lock_owner(path: str) -> Optional[int]:
+        """
+        锁文件中的进程 id，锁不存在返回 None，正在写入等读不到时返回 -1
+        """
+        try:
+            with open(path, "r") as f:
+                return int(f.read().strip())
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError):
+            return -1
+
+    @staticmethod
+    def _unlock(path: str) -> None:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def _lock(self, path: str, stale) -> bool:
+        """
+        O_CREAT|O_EXCL 创建锁文件并写入当前进程 id，stale(owner) 为 True 时回收旧锁
+        """
+        for _ in range(2):
+            try:
+                fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except FileExistsError:
+                owner = self._lock_owner(path)
+                if owner is not None and not stale(owner):
+                    return False
+                self._unlock(path)
+                continue
+            with os.fdopen(fd, "w") as f:
+                f.write(str(os.getpid()))
+            return True
+        return False
+
+    def reserve_port(self, port: int) -> bool:
+        """
+        原子地占用端口，端口已被监听或被其他进程占用时返回 False
+        占用端口的进程已退出且端口没有被监听时回收
+        """
+        if port_in_use(port):
+            return False
+        return self._lock(
+            self._port_lock(port),
+            lambda pid: pid > 0 and not pid_alive(pid) and not port_in_use(port),
+        )
+
+    def release_port(self, port: int) -> None:
+        self._unlock(self._port_lock(port))
+
+    def _claim(self, user_data_path: str, timeout: float) -> None:
+        """
+        占用 user_data_path，其他存活进程正在使用时等待 timeout 秒，仍未释放抛出异常
+        """
+        path = self._claim_lock(user_data_path)
+        deadline = time.perf_counter() + timeout
+        while not self._lock(path, lambda pid: pid > 0 and not pid_alive(pid)):
+            if time.perf_counter() >= deadline:
+                owner = self._lock_owner(path)
+                raise Exception(f"常驻浏览器正在被进程 {owner} 使用 {user_data_path}")
+            time.sleep(0.2)
+
+    @staticmethod
+    def _idle(browser: WarmBrowser) -> bool:
+        """未被使用，或使用它的进程已经退出"""
+        if not browser.in_use:
+            return True
+        return bool(browser.owner) and not pid_alive(browser.owner)
+
+    @staticmethod
+    def _alive(browser: WarmBrowser) -> bool:
+        if browser.pid and not pid_alive(browser.pid):
+            return False
+        return port_in_use(browser.port)
+
+    def browsers(self) -> List[WarmBrowser]:
+        """
+        所有存活的常驻浏览器，已退出的顺便清理
+        """
+        result = []
+        for name in os.listdir(self.state_dir):
+            if not name.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(self.state_dir, name), "r") as f:
+                    browser = WarmBrowser.model_validate(json.load(f))
+            except (OSError, ValueError):
+                continue
+            if self._alive(browser):
+                result.append(browser)
+            else:
+                self._remove(browser)
+        return result
+
+    def acquire(
+        self, user_data_path: str, timeout: float = 0
+    ) -> Optional[WarmBrowser]:
+        """
+        占用该目录并获取存活的浏览器，没有返回 None，由调用方启动后 register，
+        启动失败时调用 abandon。其他存活进程(或同一进程的其他 Handler)正在使用时
+        等待 timeout 秒，仍未释放抛出异常
+        """
+        self._claim(user_data_path, timeout)
+        browser = self._load(user_data_path)
+        if browser is None:
+            return None
+        if not self._alive(browser):
+            self._remove(browser)
+            return None
+        browser.in_use = True
+        browser.owner = os.getpid()
+        browser.last_used = time.time()
+        self._save(browser)
+        logger.info(f"复用常驻浏览器 {browser.port} {user_data_path}")
+        return browser
+
+    def allocate_port(self, preferred: Optional[int] = None) -> int:
+        """
+        为新浏览器占用一个端口，优先使用 preferred(fleet 分配给 worker 的端口)，
+        被占用时从 base_port 开始向上查找。浏览器关闭时释放
+        """
+        if preferred and self.reserve_port(preferred):
+            return preferred
+        for port in count(self.base_port):
+            if self.reserve_port(port):
+                return port
+
+    def register(self, user_data_path: str, port: int, pid: int) -> None:
+        """
+        记录新启动的浏览器
+        """
+        self._save(
+            WarmBrowser(
+                user_data_path=user_data_path,
+                port=port,
+                pid=pid,
+                last_used=time.time(),
+                in_use=True,
+                owner=os.getpid(),
+            )
+        )
+
+    def abandon(self, user_data_path: str, port: Optional[int] = None) -> None:
+        """
+        acquire 之后启动或连接失败，释放新分配的端口和目录占用，
+        已经 register 的浏览器端口随浏览器关闭时释放
+        """
+        browser = self._load(user_data_path)
+        if port is not None and not (browser and browser.port == port):
+            self.release_port(port)
+        claim = self._claim_lock(user_data_path)
+        if self._lock_owner(claim) == os.getpid():
+            self._unlock(claim)
+
+    def release(self, user_data_path: str) -> None:
+        """
+        任务结束，浏览器转为空闲，然后按限制淘汰
+        只处理当前进程占用的目录，acquire 失败后调用不会影响正在使用的进程
+        """
+        claim = self._claim_lock(user_data_path)
+        if self._lock_owner(claim) == os.getpid():
+            browser = self._load(user_data_path)
+            if browser and browser.owner == os.getpid():
+                browser.in_use = False
+                browser.owner = 0
+                browser.last_used = time.time()
+                self._save(browser)
+            self._unlock(claim)
+        self.evict()
+
+    def evict(self) -> None:
+        """
+        按 LRU 淘汰空闲浏览器，直到满足数量和内存限制
+        """
+        idle = sorted(
+            (b for b in self.browsers() if self._idle(b)), key=lambda b: b.last_used
+        )
+        while len(idle) > self.max_browsers:
+            self.close(idle.pop(0))
+        if not self.max_memory_mb:
+            return
+        try:
+            import psutil
+        except ImportError:
+            logger.warning("未安装 psutil，无法按内存淘汰常驻浏览器")
+            return
+        usage = {b.pid: _memory_mb(psutil, b.pid) for b in self.browsers()}
+        total = sum(usage.values())
+        while idle and total > self.max_memory_mb:
+            browser = idle.pop(0)
+            total -= usage.get(browser.pid, 0)
+            self.close(browser)
+
+    def close(self, browser: WarmBrowser) -> None:
+        """
+        关闭常驻浏览器
+        """
+        logger.info(f"关闭常驻浏览器 {browser.port} {browser.user_data_path}")
+        self._remove(browser)
+        if not browser.pid or not pid_alive(browser.pid):
+            return
+        try:
+            if os.name == "nt":
+                import psutil
+
+                psutil.Process(browser.pid).terminate()
+            else:
+                os.kill(browser.pid, signal.SIGTERM)
+        except Exception as e:
+            logger.error(f"关闭浏览器失败 {browser.pid} {e}")
+
+    def close_all(self) -> None:
+        for browser in self.browsers():
+            self.close(browser)
+
+
+def _memory_mb(psutil, pid: int) -> float:
+    """浏览器主进程和所有子进程(渲染、插件等)的内存"""
+    try:
+        proc = psutil.Process(pid)
+        procs = [proc] + proc.children(recursive=True)
+    except psutil.Error:
+        return 0
+    total = 0
+    for p in procs:
+        try:
+            total += p.memory_info().rss
+        except psutil.Error:
+            pass
+    return total / 1024 / 1024
+
+
+@app.command("status")
+def status():
+    """
+    查看常驻浏览器
+    """
+    now = time.time()
+    for b in WarmBrowserPool().browsers():
+        state = f"in use by {b.owner}" if b.in_use else f"idle {now - b.last_used:.0f}s"
+        logger.info(f"{b.port} pid:{b.pid} {state} {b.user_data_path}")
+
+
+@app.command("close")
+def close():
+    """
+    关闭所有常驻浏览器
+    """
+    WarmBrowserPool().close_all()
+
+
+if __name__ == "__main__":
+    app()
@@ -0,0 +1,247 @@
+"""
+a9tools.proxy 的检查和代理池逻辑，使用本机的 SOCKS5/HTTP 代理替身，不访问外网
+"""
+import asyncio
+import json
+import os
+import socket
+import struct
+import tempfile
+import unittest
+
+from a9tools.proxy import ProxyPool, ProxyUnverified, probe_proxy, proxy_key
+
+AUTH = ("user", "secret")
+
+
+async def _socks5_server(method: int = 0x00, reply: int = 0x00, auth=AUTH):
+    """
+    method: 握手选择的认证方式，0x02 为用户名密码，0xFF 表示拒绝
+    reply: CONNECT 的结果，0 表示成功
+    auth: method 为 0x02 时接受的 (用户名, 密码)
+    """
+
+    async def handle(reader, writer):
+        try:
+            header = await reader.readexactly(2)
+            await reader.readexactly(header[1])
+            writer.write(bytes([5, method]))
+            await writer.drain()
+            if method == 0x02:
+                _, ulen = await reader.readexactly(2)
+                username = (await reader.readexactly(ulen)).decode()
+                plen = (await reader.readexactly(1))[0]
+                password = (await reader.readexactly(plen)).decode()
+                ok = (username, password) == auth
+                writer.write(bytes([1, 0 if ok else 1]))
+                await writer.drain()
+                if not ok:
+                    return
+            elif method != 0x00:
+                return
+            request = await reader.readexactly(5)
+            await reader.readexactly(request[4] + 2)
+            bound = b"\x00" * 4 + struct.pack("!H", 0)
+            writer.write(bytes([5, reply, 0, 1]) + bound)
+            await writer.drain()
+        except asyncio.IncompleteReadError:
+            pass
+        finally:
+            writer.close()
+
+    return await asyncio.start_server(handle, "127.0.0.1", 0)
+
+
+async def _http_server(status: str):
+    async def handle(reader, writer):
+        await reader.readuntil(b"\r\n\r\n")
+        writer.write(f"HTTP/1.1 {status}\r\n\r\n".encode())
+        await writer.drain()
+        writer.close()
+
+    return await asyncio.start_server(handle, "127.0.0.1", 0)
+
+
+def _port(server) -> int:
+    return server.sockets[0].getsockname()[1]
+
+
+def _closed_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+class ProbeProxyTest(unittest.IsolatedAsyncioTestCase):
+    async def test_socks5_handshake(self):
+        server = await _socks5_server()
+        async with server:
+            latency = await probe_proxy("socks5", "127.0.0.1", _port(server))
+        self.assertGreaterEqual(latency, 0)
+
+    async def test_socks5_connect_target(self):
+        server = await _socks5_server()
+        async with server:
+            await probe_proxy(
+                "socks5", "127.0.0.1", _port(server), target=("x.com", 443)
+            )
+
+    async def test_socks5_rejected(self):
+        server = await _socks5_server(method=0xFF)
+        async with server:
+            with self.assertRaises(ConnectionError):
+                await probe_proxy("socks5", "127.0.0.1", _port(server))
+
+    async def test_socks5_connect_refused(self):
+        server = await _socks5_server(reply=0x05)
+        async with server:
+            with self.assertRaises(ConnectionError):
+                await probe_proxy(
+                    "socks5", "127.0.0.1", _port(server), target=("x.com", 443)
+                )
+
+    async def test_socks5_auth_connect(self):
+        server = await _socks5_server(method=0x02)
+        async with server:
+            await probe_proxy(
+                "socks5",
+                "127.0.0.1",
+                _port(server),
+                target=("x.com", 443),
+                auth=AUTH,
+            )
+            with self.assertRaises(ConnectionError):
+                await probe_proxy(
+                    "socks5",
+                    "127.0.0.1",
+                    _port(server),
+                    target=("x.com", 443),
+                    auth=("user", "wrong"),
+                )
+
+    async def test_socks5_auth_without_credentials(self):
+        server = await _socks5_server(method=0x02)
+        async with server:
+            # 只握手时代理正常响应即可
+            await probe_proxy("socks5", "127.0.0.1", _port(server))
+            with self.assertRaises(ProxyUnverified):
+                await probe_proxy(
+                    "socks5", "127.0.0.1", _port(server), target=("x.com", 443)
+                )
+
+    async def test_http_connect(self):
+        ok = await _http_server("200 Connection established")
+        denied = await _http_server("403 Forbidden")
+        async with ok, denied:
+            await probe_proxy("http", "127.0.0.1", _port(ok), target=("x.com", 443))
+            with self.assertRaises(ConnectionError):
+                await probe_proxy(
+                    "http", "127.0.0.1", _port(denied), target=("x.com", 443)
+                )
+
+    async def test_closed_port(self):
+        with self.assertRaises(OSError):
+            await probe_proxy("socks5", "127.0.0.1", _closed_port(), timeout=1)
+
+
+class ProxyPoolTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        fd, self.state_path = tempfile.mkstemp(suffix=".json")
+        os.close(fd)
+        os.remove(self.state_path)
+
+    def tearDown(self):
+        if os.path.exists(self.state_path):
+            os.remove(self.state_path)
+
+    def pool(self, proxies=(), **kwargs) -> ProxyPool:
+        kwargs.setdefault("timeout", 1)
+        return ProxyPool(proxies, state_path=self.state_path, **kwargs)
+
+    async def test_check_all(self):
+        server = await _socks5_server()
+        dead_port = _closed_port()
+        alive = proxy_key("socks5", "127.0.0.1", _port(server))
+        dead = proxy_key("socks5", "127.0.0.1", dead_port)
+        async with server:
+            pool = self.pool(
+                [
+                    ("socks5", "127.0.0.1", _port(server)),
+                    ("socks5", "127.0.0.1", dead_port),
+                ]
+            )
+            results = await pool.check_all()
+        self.assertEqual(results, {alive: True, dead: False})
+        self.assertTrue(pool.healthy(alive))
+        self.assertFalse(pool.healthy(dead))
+
+    async def test_check_authenticated_proxy(self):
+        server = await _socks5_server(method=0x02)
+        port = _port(server)
+        async with server:
+            pool = self.pool(target=("x.com", 443))
+            key = pool.add("socks5", "127.0.0.1", port).key
+            self.assertFalse(await pool.check(key))
+            state = pool.proxies[key]
+            self.assertTrue(state.unverified)
+            self.assertFalse(state.quarantined)
+            self.assertEqual(state.failures_in_row, 0)
+            self.assertFalse(pool.healthy(key))
+            pool.add("socks5", "127.0.0.1", port, *AUTH)
+            self.assertTrue(await pool.check(key))
+            self.assertTrue(pool.healthy(key))
+
+    async def test_profile_credentials_not_saved(self):
+        fd, profile = tempfile.mkstemp(suffix=".json")
+        with os.fdopen(fd, "w") as f:
+            json.dump(
+                {
+                    "proxy_host": "127.0.0.1",
+                    "proxy_port": 1,
+                    "proxy_username": AUTH[0],
+                    "proxy_password": AUTH[1],
+                },
+                f,
+            )
+        try:
+            pool = self.pool()
+            key = pool.add_profile(profile)
+        finally:
+            os.remove(profile)
+        self.assertEqual(key, proxy_key("socks5", "127.0.0.1", 1))
+        self.assertEqual(pool._auth[key], AUTH)
+        pool.save()
+        with open(self.state_path, "r") as f:
+            self.assertNotIn(AUTH[1], f.read())
+
+    def test_quarantine_doubles(self):
+        pool = self.pool(quarantine_after=2, quarantine_seconds=100)
+        key = pool.add("socks5", "127.0.0.1", 1).key
+        pool.record(key, False, error="refused")
+        self.assertFalse(pool.proxies[key].quarantined)
+        pool.record(key, False, error="refused")
+        first = pool.proxies[key].quarantined_until
+        self.assertTrue(pool.proxies[key].quarantined)
+        pool.record(key, False, error="refused")
+        self.assertGreater(pool.proxies[key].quarantined_until - first, 90)
+        pool.record(key, True, latency=0.1)
+        self.assertTrue(pool.healthy(key))
+
+    def test_state_persisted(self):
+        pool = self.pool()
+        key = pool.add("socks5", "127.0.0.1", 1).key
+        pool.record(key, True, latency=0.2)
+        pool.save()
+        loaded = self.pool()
+        self.assertTrue(loaded.healthy(key))
+        self.assertAlmostEqual(loaded.proxies[key].latency, 0.2)
+
+    def test_ensure_checks_unknown_proxy(self):
+        pool = self.pool()
+        key = proxy_key("socks5", "127.0.0.1", _closed_port())
+        self.assertFalse(pool.ensure(key))
+        self.assertEqual(pool.proxies[key].failures_in_row, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
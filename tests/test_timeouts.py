@@ -0,0 +1,89 @@
+"""
+a9tools.timeouts 的等待时间计算，不需要浏览器
+"""
+import os
+import tempfile
+import unittest
+
+from a9tools.timeouts import AdaptiveTimeouts
+
+SITE, STEP, SELECTOR = "x.com", "like", "@data-testid=like"
+
+
+class AdaptiveTimeoutsTest(unittest.TestCase):
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp(suffix=".json")
+        os.close(fd)
+        os.remove(self.path)
+
+    def tearDown(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    def timeouts(self) -> AdaptiveTimeouts:
+        return AdaptiveTimeouts(path=self.path)
+
+    def wait(self, timeouts: AdaptiveTimeouts, appears_after) -> float:
+        """
+        模拟一次自适应等待，appears_after 为 None 表示元素不出现
+        """
+        timeout = timeouts.timeout(SITE, STEP, SELECTOR)
+        if appears_after is not None and appears_after <= timeout:
+            timeouts.record(SITE, STEP, SELECTOR, appears_after)
+        else:
+            timeouts.record_miss(SITE, STEP, SELECTOR)
+        return timeout
+
+    def test_default_until_enough_samples(self):
+        timeouts = self.timeouts()
+        for _ in range(4):
+            timeouts.record(SITE, STEP, SELECTOR, 0.4)
+        self.assertEqual(timeouts.timeout(SITE, STEP, SELECTOR), 5)
+        timeouts.record(SITE, STEP, SELECTOR, 0.4)
+        self.assertAlmostEqual(timeouts.timeout(SITE, STEP, SELECTOR), 0.6)
+
+    def test_absent_element_never_grows(self):
+        timeouts = self.timeouts()
+        waits = [self.wait(timeouts, None) for _ in range(50)]
+        self.assertEqual(set(waits), {5})
+
+    def test_mostly_absent_element_fails_fast(self):
+        timeouts = self.timeouts()
+        for _ in range(5):
+            timeouts.record(SITE, STEP, SELECTOR, 0.4)
+        # 可选的弹窗，大部分时候不出现
+        waits = [
+            self.wait(timeouts, 0.4 if i % 10 == 0 else None) for i in range(100)
+        ]
+        self.assertLessEqual(max(waits[20:]), 0.6 + 1e-9)
+        self.assertEqual(timeouts.samples[timeouts.key(SITE, STEP, SELECTOR)][-1], 0.4)
+
+    def test_slow_page_widens_and_recovers(self):
+        timeouts = self.timeouts()
+        for _ in range(50):
+            timeouts.record(SITE, STEP, SELECTOR, 0.4)
+        # 页面变慢，0.9 秒才出现
+        waits = [self.wait(timeouts, 0.9) for _ in range(30)]
+        self.assertAlmostEqual(waits[0], 0.6)
+        # 只比等到的耗时放宽一档，不会一直变长
+        self.assertAlmostEqual(waits[1], 1.2)
+        self.assertLessEqual(max(waits), 0.9 * 1.5 * 2 + 1e-9)
+        self.assertEqual(timeouts.miss_rate(SITE, STEP, SELECTOR), 0)
+        # 未出现的记录移出窗口后，按新的耗时分位数等待
+        self.assertAlmostEqual(timeouts.timeout(SITE, STEP, SELECTOR), 1.35)
+
+    def test_save_merges_processes(self):
+        first, second = self.timeouts(), self.timeouts()
+        first.record(SITE, STEP, SELECTOR, 0.4)
+        second.record_miss(SITE, STEP, SELECTOR)
+        first.save()
+        second.save()
+        loaded = self.timeouts()
+        key = loaded.key(SITE, STEP, SELECTOR)
+        self.assertEqual(loaded.samples[key], [0.4])
+        self.assertEqual(loaded.outcomes[key], [0, 1])
+        self.assertAlmostEqual(loaded.miss_rate(SITE, STEP, SELECTOR), 0.5)
+
+
+if __name__ == "__main__":
+    unittest.main()